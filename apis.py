@@ -4,11 +4,16 @@ Exports for music platform specific API interfaces
 `platform_apis`: `Dict[str, PlatformApi]`
 - A dictionary mapping the music platform's name (in lowercase) to it's API instance
 
+`cached_platform_apis`: `Dict[str, CachedPlatformApi]`
+- `platform_apis` wrapped in a `CachedPlatformApi`, sharing one in-memory cache
+
 `ALL_PLATFORMS`: `List[str]`
 - The list of all supported music platforms, obtained from `platform_apis.keys()`
 '''
 from typing import Dict
+from backend import colls
 from backend.api import YouTubeApi, SpotifyApi, SoundCloudApi, PlatformApi
+from backend.cached_api import CachedPlatformApi, cache_all, track_lookup
 import keys
 
 platform_apis: Dict[str, PlatformApi] = {
@@ -19,9 +24,14 @@ platform_apis: Dict[str, PlatformApi] = {
         client_id=keys.SPOTIFY_CLIENT_ID,
         client_secret=keys.SPOTIFY_CLIENT_SECRET
     ),
-    'SOUNDCLOUD': SoundCloudApi()
+    # tracks already in the Track table are not fetched again
+    'SOUNDCLOUD': SoundCloudApi(
+        track_lookup=track_lookup(colls, 'SOUNDCLOUD')
+    )
 }
 
+cached_platform_apis: Dict[str, CachedPlatformApi] = cache_all(platform_apis, colls)
+
 # ALL_PLATFORMS = list(map(platform_apis.keys(), lambda x: x.lower()))
 ALL_PLATFORMS = ('youtube', 'spotify', 'soundcloud')
 '''The list of all supported music platforms, obtained from `platform_apis.keys()`'''
@@ -1,42 +1,47 @@
-import sqlite3
-from typing import TypedDict
+import os
+from typing import TypedDict, Union
 from .storage import *
+from .connection import get_pool, StorageProfile, STORAGE_PROFILES, DEFAULT_PROFILE
+from .migrations import migrate, MIGRATIONS
 
 
-class __DbInitialiser:
-    is_created = False
+def create_database(db_path: str = DB_PATH, profile: Union[StorageProfile, str] = DEFAULT_PROFILE):
+    '''
+    Creates the database `db_path` with tables from `schema.sql` if they don't already exist,
+    and migrates it to the latest schema version (see `backend.migrations`)
 
-    @classmethod
-    def create_database(cls, db_path: str = DB_PATH):
-        if cls.is_created:
-            return
-
-        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f, sqlite3.connect(db_path) as conn:
-            cur = conn.cursor()
-            cur.executescript(f.read())
-            conn.commit()
-            cls.is_created = True
-
-
-def create_database(db_path: str = DB_PATH):
-    '''Creates the database `db_path` with tables from `schema.sql` if they don't already exist'''
-    __DbInitialiser.create_database(db_path)
+    Params
+    ------
+    `profile`
+    - The `StorageProfile`, or the name of one of the `STORAGE_PROFILES`
+      (`"durable"`, `"balanced"`, `"fast"`), applied to every connection to `db_path`
+    '''
+    get_pool(db_path).set_profile(profile)
+    migrate(db_path)
 
 
 def clear_database(db_path: str = DB_PATH):
     '''Clears the entire database file'''
+    # pooled connections would otherwise keep using the truncated file
+    get_pool(db_path).close_all()
     with open(db_path, 'wb') as _:
         pass
+    # a leftover write-ahead log would be replayed into the cleared database
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
 
 
 class CollectionDict(TypedDict):
     Playlist: PlaylistCollection
     PlaylistTracks: PlaylistTracksCollection
     Track: TrackCollection
+    PlaylistPayload: PlaylistPayloadCollection
 
 
 colls: CollectionDict = {
     'Playlist': PlaylistCollection(),
     'PlaylistTracks': PlaylistTracksCollection(),
     'Track': TrackCollection(),
+    'PlaylistPayload': PlaylistPayloadCollection(),
 }
@@ -1,4 +1,5 @@
 from .youtube import YouTubeApi
 from .spotify import SpotifyApi
 from .soundcloud import SoundCloudApi
-from .base import Playlist, PlaylistInfo, Track, PlatformApi
\ No newline at end of file
+from .base import Playlist, PlaylistInfo, Track, PlatformApi, IncompletePlaylistError
+from .track_table import TrackTable, tracks_nbytes
@@ -0,0 +1,180 @@
+'''
+Adaptive rate and concurrency limiting of requests to an upstream API.
+
+All threads sending requests to the API share one `AdaptiveLimiter`, so when the API starts
+throttling (e.g. `403`/`429`), every thread backs off at once instead of each one retrying on
+its own schedule.
+'''
+import random
+import threading
+import time
+from typing import Dict
+
+THROTTLE_STATUSES = (403, 429)
+
+
+class AdaptiveLimiter:
+    '''
+    A token bucket limiting the rate of requests, and an AIMD (additive increase,
+    multiplicative decrease) limit on the number of requests in flight.
+
+    ```
+    limiter.acquire()
+    try:
+        res = session.get(url)
+    except requests.RequestException:
+        limiter.release(failed=True)
+        raise
+    limiter.release(throttled=res.status_code in THROTTLE_STATUSES)
+    ```
+
+    Each successful request raises the concurrency limit by `1 / concurrency` (so by ~1 per
+    round of requests) up to `max_concurrency`. A throttled request multiplies it by
+    `decrease_factor` and pauses every thread for the `retry_delay` of the current run of
+    throttled requests. Throttled requests which were in flight together (within `cooldown_secs`)
+    only decrease the limit once. Requests which failed without a response change neither.
+
+    Attributes
+    ------
+    `stats`
+    - `requests`: the number of requests sent
+    - `throttled`: the number of requests throttled by the API
+    - `failed`: the number of requests which failed without a response
+    - `decreases`: the number of times the concurrency limit was decreased
+    - `waits`: the number of requests which had to wait for a token, a slot or a pause
+    '''
+
+    def __init__(
+        self,
+        rate: float = 20,
+        burst: int = 10,
+        initial_concurrency: float = 8,
+        min_concurrency: float = 1,
+        max_concurrency: float = 16,
+        decrease_factor: float = 0.5,
+        base_delay_secs: float = 0.5,
+        max_delay_secs: float = 30,
+        cooldown_secs: float = 1,
+    ) -> None:
+        '''
+        Params
+        ------
+        `rate`
+        - The maximum number of requests per second on average
+        `burst`
+        - The maximum number of requests sent at once after being idle
+        `initial_concurrency`, `min_concurrency`, `max_concurrency`
+        - The initial, minimum and maximum number of requests in flight
+        `decrease_factor`
+        - The concurrency limit is multiplied by this when a request is throttled
+        `base_delay_secs`, `max_delay_secs`
+        - The bounds of the exponential backoff of `retry_delay`
+        '''
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.base_delay_secs = base_delay_secs
+        self.max_delay_secs = max_delay_secs
+        self.cooldown_secs = cooldown_secs
+        self.stats: Dict[str, int] = {
+            'requests': 0, 'throttled': 0, 'failed': 0, 'decreases': 0, 'waits': 0,
+        }
+
+        self._concurrency = float(initial_concurrency)
+        self._in_flight = 0
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float('-inf')
+        # consecutive decreases without a successful request, for the exponential backoff
+        self._throttle_streak = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _wait_secs(self, now: float) -> float:
+        '''The seconds to wait before a request can be sent, or `0` if it can be sent now'''
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= max(1, int(self._concurrency)):
+            # woken by release()
+            return self.max_delay_secs
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0
+
+    def acquire(self) -> None:
+        '''Blocks until a request can be sent, then takes a token and a concurrency slot'''
+        with self._cond:
+            waited = False
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait_secs = self._wait_secs(now)
+                if wait_secs <= 0:
+                    break
+                waited = True
+                self._cond.wait(wait_secs)
+
+            self._tokens -= 1
+            self._in_flight += 1
+            self.stats['requests'] += 1
+            if waited:
+                self.stats['waits'] += 1
+
+    def release(self, throttled: bool = False, failed: bool = False) -> None:
+        '''
+        Gives back the concurrency slot taken by `acquire`
+
+        Params
+        ------
+        `throttled`
+        - Whether the API throttled the request (e.g. responded with `403` or `429`)
+        `failed`
+        - Whether the request failed without a response (e.g. timed out), which says nothing
+          about whether the API is throttling
+        '''
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if failed:
+                self.stats['failed'] += 1
+            elif not throttled:
+                self._throttle_streak = 0
+                self._concurrency = min(
+                    self.max_concurrency, self._concurrency + 1 / max(1, self._concurrency))
+            else:
+                self.stats['throttled'] += 1
+                if now - self._last_decrease >= self.cooldown_secs:
+                    self._last_decrease = now
+                    self._throttle_streak += 1
+                    self.stats['decreases'] += 1
+                    self._concurrency = max(
+                        self.min_concurrency, self._concurrency * self.decrease_factor)
+                self._paused_until = max(
+                    self._paused_until, now + self.retry_delay(self._throttle_streak))
+            self._cond.notify_all()
+
+    def retry_delay(self, attempt: int) -> float:
+        '''
+        Returns
+        ------
+        The jittered, exponentially increasing seconds to wait before the `attempt`th retry of
+        a request, so throttled requests are not all retried at the same time
+        '''
+        # "equal jitter" https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        cap = min(self.max_delay_secs, self.base_delay_secs * 2 ** max(0, attempt - 1))
+        return random.uniform(cap / 2, cap)
+
+    def limiter_stats(self) -> Dict[str, float]:
+        '''Returns the `stats`, the current concurrency limit and the requests in flight'''
+        with self._cond:
+            stats = dict(self.stats)
+            stats['concurrency'] = round(self._concurrency, 2)
+            stats['in_flight'] = self._in_flight
+            stats['paused_secs'] = round(max(0.0, self._paused_until - time.monotonic()), 2)
+        return stats
@@ -1,5 +1,8 @@
-from typing import Any, List, Optional, TypedDict, Union
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple, TypedDict, Union
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 class Track(TypedDict):
@@ -60,11 +63,135 @@ class Playlist(PlaylistInfo):
         'thumbnail': str,
         'length': str,
         'etag': str,
-        'tracks': List[Track],
+        'tracks': Sequence[Track],
     }
     ```
+    `tracks` is a `TrackTable` when returned by a `PlatformApi`
     '''
-    tracks: List[Track]
+    tracks: Sequence[Track]
+
+
+def retry_policy(
+    total: int = 3,
+    backoff_factor: float = 0.5,
+    status_forcelist: Tuple[int, ...] = (429, 500, 502, 503, 504),
+    allowed_methods: Tuple[str, ...] = ('GET', 'HEAD'),
+) -> Retry:
+    '''
+    Params
+    ------
+    `total`
+    - The maximum number of retries of a request
+    `backoff_factor`
+    - Retries wait `backoff_factor * 2 ** (retry - 1)` seconds, or as long as the response's
+      `Retry-After` header says
+    `status_forcelist`
+    - The response statuses which are retried
+    `allowed_methods`
+    - The request methods which are retried
+
+    Returns
+    ------
+    The `Retry` policy of a `Transport`. Once the retries are used up, the last response is
+    returned instead of raising an error
+    '''
+    return Retry(
+        total=total,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=allowed_methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+class Transport:
+    '''
+    A long-lived `requests.Session` of one platform, so that connections (and their TLS
+    sessions) are kept alive and reused between requests, including requests made by
+    different threads.
+
+    Attributes
+    ------
+    `name`
+    - The name of the transport e.g. the platform
+    `session`
+    - The `requests.Session` sending the requests
+    `timeout`
+    - The default `(connect, read)` timeout in seconds of a request
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        pool_maxsize: int = 10,
+        retry: Optional[Retry] = None,
+        timeout: Tuple[float, float] = (5, 30),
+    ) -> None:
+        '''
+        Params
+        ------
+        `pool_maxsize`
+        - The maximum number of connections kept alive per host. Should be at least the number
+          of threads sending requests to the host at once
+        `retry`
+        - The retry policy. `retry_policy()` if `None`
+        '''
+        self.name = name
+        self.timeout = timeout
+        self.adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry_policy() if retry is None else retry,
+        )
+        self.session = requests.Session()
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._requests = 0
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        '''Sends the request with the `session`, with the default `timeout` if none is given'''
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests += 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def connection_stats(self) -> Dict[str, int]:
+        '''
+        Returns
+        ------
+        - `requests`: the number of requests sent, excluding retries
+        - `connections`: the number of connections opened to the hosts currently pooled
+        - `reused`: the number of requests (including retries) to the hosts currently pooled
+          sent on an already open connection
+        '''
+        pools = self.adapter.poolmanager.pools
+        connections = 0
+        pool_requests = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+
+        with self._lock:
+            sent = self._requests
+        return {
+            'requests': sent,
+            'connections': connections,
+            'reused': max(0, pool_requests - connections),
+        }
+
+
+class IncompletePlaylistError(Exception):
+    '''Raised by the iterator of `PlatformApi.iter_track_pages` if a page could not be fetched'''
 
 
 class PlatformApi:
@@ -78,6 +205,9 @@ class PlatformApi:
     - The music platform in uppercase. supported platforms are:
         - `"YOUTUBE", "PLAYLIST", "SPOTIFY"`
 
+    `transport`
+    - The `Transport` to send the platform's requests with
+
     Methods
     ------
     `playlist(self, playlist_id)`
@@ -86,10 +216,14 @@ class PlatformApi:
 
     `playlist_info(self, playlist_id)`
     Returns the `Playlist` info without the `tracks` or `length`
+
+    `iter_track_pages(self, playlist_id, playlist_info)`
+    - Gets the tracks of the playlist page by page, as they are fetched
     '''
 
-    def __init__(self, platform: str) -> None:
+    def __init__(self, platform: str, transport: Optional[Transport] = None) -> None:
         self.platform = platform
+        self.transport = Transport(platform) if transport is None else transport
 
     def resolve_playlist_id(self, playlist_id: str) -> str:
         return playlist_id.strip()
@@ -109,6 +243,26 @@ class PlatformApi:
         '''
         raise NotImplementedError()
 
+    def iter_track_pages(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None
+    ) -> Union[Iterator[Sequence[Track]], None]:
+        '''
+        Gets the tracks of the playlist one page at a time, so the first tracks can be used
+        before the rest are fetched. Platforms which do not page their playlists return every
+        track as one page
+
+        Returns
+        ------
+        `None` if the playlist is not found, otherwise an iterator of the pages of `Track`s in
+        order. The iterator raises `IncompletePlaylistError` if a later page cannot be fetched
+        '''
+        playlist = self.playlist(playlist_id, playlist_info)
+        if playlist is None:
+            return None
+        return iter([playlist['tracks']])
+
 
 def try_json(response: requests.Response) -> Union[Any, None]:
     '''
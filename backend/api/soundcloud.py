@@ -1,10 +1,12 @@
 # https://stackoverflow.com/questions/30964214/how-to-get-each-track-of-a-playlist-with-the-soundcloud-api
 
-from typing import List, Optional, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 import re
-import time
 import json
+import threading
+import time
 import concurrent.futures
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import requests
 from .base import (
@@ -12,7 +14,11 @@ from .base import (
     Playlist,
     PlaylistInfo,
     Track,
+    Transport,
+    retry_policy,
 )
+from .adaptive_limiter import THROTTLE_STATUSES, AdaptiveLimiter
+from .track_table import TrackTable
 
 
 class SoundCloudV2TrackData:
@@ -61,9 +67,8 @@ def fetch_tracks_parallel(
     track_ids: List[str],
     client_id: str,
     group_size: int = 50,
-    threads: int = 8,
-    session: Optional[requests.Session] = None,
-    retry_sleep_secs: int = 2,
+    limiter: Optional[AdaptiveLimiter] = None,
+    transport: Optional[Transport] = None,
     max_retries: int = 5,
 ) -> List[Track]:
     '''
@@ -79,19 +84,23 @@ def fetch_tracks_parallel(
     - The size of each group of track ids. Each group will be fetched on separate threads
       (default `50`)
 
-    `threads`
-    - The number of threads to use (default `8`)
+    `limiter`
+    - The `AdaptiveLimiter` shared by all requests to api-v2, which limits how many groups are
+      fetched at once. A new limiter if `None`
 
-    `session`
-    - The optional `Session` object to be used for GET requests.
-      See https://requests.readthedocs.io/en/latest/user/advanced/
-
-    `retry_sleep_secs`
-    - The number of seconds to wait before retrying a failed request
+    `transport`
+    - The optional `Transport` to send the GET requests with
 
     `max_retries`
     - The maximum number of retries of the failed request
+
+    Returns
+    ------
+    The tracks fetched, in the order of the `track_ids`
     '''
+    if limiter is None:
+        limiter = AdaptiveLimiter()
+
     # split track ids into groups
     groups = []
     idx = 0
@@ -100,26 +109,25 @@ def fetch_tracks_parallel(
         groups.append(group)
         idx += group_size
 
-    all_tracks = []
+    group_tracks: List[List[Track]] = [[] for _ in groups]
 
-    # fetch each group of tracks on diff threads
+    # fetch each group of tracks on diff threads. the limiter decides how many are in flight
     # https://medium.com/geekculture/python-how-to-send-100k-requests-quickly-b4ef9495620d
+    threads = max(1, min(len(groups), int(limiter.max_concurrency)))
     with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
-        future_to_url = (
+        future_to_idx = {
             executor.submit(
                 fetch_tracks,
                 group,
                 client_id,
-                session,
-                retry_sleep_secs,
-                max_retries
-            ) for group in groups
-        )
-        for future in concurrent.futures.as_completed(future_to_url):
+                transport,
+                max_retries,
+                limiter,
+            ): i for i, group in enumerate(groups)
+        }
+        for future in concurrent.futures.as_completed(future_to_idx):
             try:
-                # concat the results in order of track position
-                tracks = future.result()
-                all_tracks.extend(tracks)
+                group_tracks[future_to_idx[future]] = future.result()
             except concurrent.futures.CancelledError as err:
                 print(f'Future was cancelled: {err}')
             except concurrent.futures.TimeoutError as err:
@@ -127,15 +135,19 @@ def fetch_tracks_parallel(
             except Exception as err:  # pylint: disable=broad-except
                 print(f'An error occurred fetching tracks: {err}')
 
+    # concat the results in order of track position
+    all_tracks = []
+    for tracks in group_tracks:
+        all_tracks.extend(tracks)
     return all_tracks
 
 
 def fetch_tracks(
     track_ids: List[str],
     client_id: str,
-    session: Optional[requests.Session] = None,
-    retry_sleep_secs: int = 2,
+    transport: Optional[Transport] = None,
     max_retries: int = 5,
+    limiter: Optional[AdaptiveLimiter] = None,
 ) -> List[Track]:
     '''
     Warning
@@ -152,20 +164,21 @@ def fetch_tracks(
     `client_id`
     - The client id obtained for the API call
 
-    `session`
-    - The optional `Session` object to be used for GET requests.
-      See https://requests.readthedocs.io/en/latest/user/advanced/
-
-    `retry_sleep_secs`
-    - The number of seconds to wait before retrying a failed request
+    `transport`
+    - The optional `Transport` to send the GET requests with
 
     `max_retries`
     - The maximum number of retries of the failed request
+
+    `limiter`
+    - The `AdaptiveLimiter` each request (and retry) waits for. A new limiter if `None`
     '''
-    if session is None:
+    if transport is None:
         get = requests.get
     else:
-        get = session.get
+        get = transport.get
+    if limiter is None:
+        limiter = AdaptiveLimiter()
 
     ids = ','.join(track_ids)
     endpoint = f'https://api-v2.soundcloud.com/tracks?ids={ids}&client_id={client_id}'
@@ -188,28 +201,28 @@ def fetch_tracks(
         # 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
         'User-Agent': 'Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)',
     }
-    res = get(endpoint, timeout=30, headers=headers)
-
-    if not res.ok:
-        # Error 403 forbidden occurs when too many requests are sent per unit time
-        # (perhaps DoS protection). Retry after 5s. Max 3 retries
-        retries = 0
-        success = False
-
-        while retries < max_retries and not success:
-            print(f'retrying (sleeping {retry_sleep_secs}s)')
-            time.sleep(retry_sleep_secs)
-            print(f'retrying (number {retries+1})\n\t{endpoint}')
-
+    # Error 403 forbidden occurs when too many requests are sent per unit time
+    # (perhaps DoS protection). The limiter pauses every request to api-v2 for a jittered,
+    # exponentially increasing delay, and the request is retried once the pause is over
+    retries = 0
+    while True:
+        limiter.acquire()
+        try:
             res = get(endpoint, timeout=30, headers=headers)
-            if not res.ok:
-                retries += 1
-            else:
-                success = True
+        except Exception:
+            limiter.release(failed=True)
+            raise
+        throttled = res.status_code in THROTTLE_STATUSES
+        limiter.release(throttled=throttled)
+
+        if res.ok or not throttled or retries >= max_retries:
+            break
+        retries += 1
+        print(f'retrying (number {retries})\n\t{endpoint}')
 
-        if not success:
-            print(f'Error {endpoint}', res.status_code, res.text, res.json())
-            return []
+    if not res.ok:
+        print(f'Error {endpoint}', res.status_code, res.text)
+        return []
 
     result = None
     try:
@@ -229,9 +242,121 @@ def fetch_tracks(
     return tracks
 
 
+class HydrationCache:
+    '''
+    Caches the playlist data parsed from the `__sc_hydration` of each soundcloud.com playlist
+    page for `ttl_secs`, so resolving a playlist, fetching its info and fetching its tracks in
+    one request download and parse the page once.
+
+    Concurrent `get`s of the same URL wait for the first one to download the page instead of
+    downloading it too. The least recently added URLs are dropped once there are more than
+    `max_entries`
+
+    Attributes
+    ------
+    `stats`
+    - `hits`: pages not downloaded again
+    - `misses`: pages downloaded and parsed
+    '''
+
+    def __init__(self, ttl_secs: float = 30, max_entries: int = 256) -> None:
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        # url -> (expires_at, playlist_data)
+        self._entries: 'OrderedDict[str, Tuple[float, dict]]' = OrderedDict()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _get_entry(self, url: str) -> Optional[dict]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[url]
+            return None
+        return entry[1]
+
+    def get(self, url: str, fetch: Callable[[], Optional[dict]]) -> Optional[dict]:
+        '''
+        Params
+        ------
+        `url`
+        - The URL of the playlist page
+        `fetch`
+        - Downloads and parses the page, returning the playlist data or `None` if it could not
+          be fetched. `None` is not cached
+
+        Returns
+        ------
+        The cached playlist data, or the result of `fetch` if there is none
+        '''
+        with self._lock:
+            playlist_data = self._get_entry(url)
+            if playlist_data is not None:
+                self.stats['hits'] += 1
+                return playlist_data
+            url_lock = self._url_locks.setdefault(url, threading.Lock())
+
+        with url_lock:
+            # another thread may have fetched the page while waiting
+            with self._lock:
+                playlist_data = self._get_entry(url)
+                if playlist_data is not None:
+                    self.stats['hits'] += 1
+                    return playlist_data
+
+            try:
+                playlist_data = fetch()
+                if playlist_data is not None:
+                    self.put(url, playlist_data)
+            finally:
+                with self._lock:
+                    self.stats['misses'] += 1
+                    self._url_locks.pop(url, None)
+            return playlist_data
+
+    def put(self, url: str, playlist_data: dict):
+        '''Caches the `playlist_data` of the page at `url` for `ttl_secs`'''
+        with self._lock:
+            self._entries[url] = (time.monotonic() + self.ttl_secs, playlist_data)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def cache_stats(self) -> Dict[str, int]:
+        '''Returns a copy of the `stats` and the number of pages cached'''
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class SoundCloudApi(PlatformApi):
-    def __init__(self) -> None:
-        super().__init__(platform='SOUNDCLOUD')
+    def __init__(self, track_lookup: Optional[Callable[[List[str]], Dict[str, Track]]] = None) -> None:
+        '''
+        Params
+        ------
+        `track_lookup`
+        - Finds the already known `Track` of each of a list of track IDs, returning the tracks
+          found by track ID (e.g. from the `Track` table). Only tracks which are not prerendered
+          and not found are fetched from api-v2. Every track is fetched if `None`
+        '''
+        self.track_lookup = track_lookup
+        # resolve_playlist_id, playlist_info and playlist share one download of each page
+        self.hydration_cache = HydrationCache()
+        # throttled api-v2 requests (403/429) are left to the limiter instead of being retried
+        # by the transport, so that every thread backs off together
+        self.limiter = AdaptiveLimiter()
+        super().__init__(platform='SOUNDCLOUD', transport=Transport(
+            'SOUNDCLOUD',
+            # enough connections for every thread of fetch_tracks_parallel
+            pool_maxsize=int(self.limiter.max_concurrency),
+            retry=retry_policy(status_forcelist=(500, 502, 503, 504)),
+        ))
         self._client_id_expiry: datetime = datetime.min
         self._client_id: str = ''
         self._client_id = self.get_client_id()
@@ -243,7 +368,7 @@ class SoundCloudApi(PlatformApi):
             return self._client_id
 
         scripts_re = r'<script crossorigin src=\"(.+)\"><\/script>'
-        res = requests.get('https://soundcloud.com', timeout=2)
+        res = self.transport.get('https://soundcloud.com', timeout=2)
         if not res.ok:
             return ''
 
@@ -255,7 +380,7 @@ class SoundCloudApi(PlatformApi):
         # https://github.com/zackradisic/soundcloud-api/blob/master/clientid.go
         # script exposing the client_id is the last script
         script_url = script_urls[-1]
-        res = requests.get(script_url, timeout=2)
+        res = self.transport.get(script_url, timeout=2)
         if not res.ok:
             return ''
 
@@ -294,6 +419,80 @@ class SoundCloudApi(PlatformApi):
         playlist_data = sc_hydration[idx_playlist].get('data')
         return playlist_data
 
+    def _playlist_url(self, playlist_id: str) -> str:
+        if not playlist_id.startswith('/'):
+            return f'https://soundcloud.com/{playlist_id}'
+        return f'https://soundcloud.com{playlist_id}'
+
+    def _playlist_data(self, playlist_id: str) -> Union[dict, None]:
+        '''
+        Returns
+        ------
+        The playlist data of the `__sc_hydration` of the playlist's page, from the
+        `hydration_cache` if the page was fetched in the last `ttl_secs`, or `None` if the
+        playlist is private, not found or could not be parsed
+        '''
+        url = self._playlist_url(playlist_id)
+
+        def fetch() -> Union[dict, None]:
+            response = self.transport.get(url, timeout=5)
+            # playlist private or not found
+            if not response.ok:
+                return None
+
+            # parse the HTML for window.__sc_hydration
+            playlist_data = self.__parse_hydration(response.content.decode('utf-8'))
+
+            # validate playlist data parsed
+            if playlist_data is None or not isinstance(playlist_data, dict):
+                print(
+                    '[SoundCloudApi] no field / unusable field `data` in hydration object: ',
+                    json.dumps(playlist_data, indent=2)
+                )
+                return None
+
+            # get track list from playlist data
+            track_data_list = playlist_data.get('tracks')
+            if track_data_list is None or not isinstance(track_data_list, list):
+                print('[SoundCloudApi] No track data for this playlist could be parsed')
+                return None
+
+            return playlist_data
+
+        playlist_data = self.hydration_cache.get(url, fetch)
+        # also cache the page by its canonical url, which it is requested by after resolving
+        if playlist_data is not None and isinstance(playlist_data.get('url'), str):
+            canonical_url = self._playlist_url(playlist_data['url'])
+            if canonical_url != url:
+                self.hydration_cache.put(canonical_url, playlist_data)
+        return playlist_data
+
+    def _info_from(self, playlist_data: dict) -> PlaylistInfo:
+        '''Extracts the `PlaylistInfo` from the parsed `playlist_data`'''
+        # standardised url is used as the playlist ID
+        playlist_id = playlist_data.get('url')
+        title = playlist_data.get('title')
+        thumbnail = playlist_data.get('artwork_url')
+        last_modified = playlist_data.get('last_modified')
+        playlist_length = playlist_data.get('track_count', len(playlist_data['tracks']))
+        description = playlist_data.get('description')
+        owner_data = playlist_data.get('user')
+        if owner_data is not None:
+            owner = owner_data.get('username', '')
+        else:
+            owner = ''
+
+        return PlaylistInfo(
+            platform=self.platform,
+            playlist_id=playlist_id,
+            title=title,
+            owner=owner,
+            description=description,
+            thumbnail=thumbnail,
+            etag=last_modified,
+            length=playlist_length,
+        )
+
     def resolve_playlist_id(self, playlist_id: str) -> str:
         '''
         Resolves the playlist_id (playlist request path) into the canonical
@@ -329,134 +528,55 @@ class SoundCloudApi(PlatformApi):
           `self.playlist_info()` and append the result to the returned `Playlist`.
         ...
         '''
-        # prepare url endpoint
-        if not playlist_id.startswith('/'):
-            url = f'https://soundcloud.com/{playlist_id}'
-        else:
-            url = f'https://soundcloud.com{playlist_id}'
-
-        s = requests.Session()
-        response = s.get(url, timeout=5)
-        # playlist private or not found
-        if not response.ok:
-            return None
-
-        # parse the HTML for window.__sc_hydration
-        playlist_data = self.__parse_hydration(response.content.decode('utf-8'))
-
-        # validate playlist data parsed
-        if playlist_data is None or not isinstance(playlist_data, dict):
-            print(
-                '[SoundCloudApi] no field / unusable field `data` in hydration object: ',
-                json.dumps(playlist_data, indent=2)
-            )
-            return None
-
-        # get track list from playlist data
-        track_data_list = playlist_data.get('tracks')
-        if track_data_list is None or not isinstance(track_data_list, list):
-            print('[SoundCloudApi] No track data for this playlist could be parsed')
+        playlist_data = self._playlist_data(playlist_id)
+        if playlist_data is None:
             return None
 
+        track_data_list = playlist_data['tracks']
         # extract playlist info from parsed playlist data
         if not playlist_info:
-            # standardised url is used as the playlist ID
-            playlist_id = playlist_data.get('url')
-            title = playlist_data.get('title')
-            thumbnail = playlist_data.get('artwork_url')
-            last_modified = playlist_data.get('last_modified')
-            playlist_length = playlist_data.get('track_count', len(track_data_list))
-            description = playlist_data.get('description')
-            owner_data = playlist_data.get('user')
-            if owner_data is not None:
-                owner = owner_data.get('username', '')
-            else:
-                owner = ''
-
-            playlist_info = PlaylistInfo(
-                platform=self.platform,
-                playlist_id=playlist_id,
-                title=title,
-                owner=owner,
-                description=description,
-                thumbnail=thumbnail,
-                etag=last_modified,
-                length=playlist_length,
-            )
-
-        all_tracks: List[Track] = []
+            playlist_info = self._info_from(playlist_data)
+
+        # the prerendered or known track at each position, or the track ID to fetch
+        slots: List[Union[Track, str]] = []
         remaining_track_ids = []
 
         # extract prerendered track data
         for track_data in track_data_list:
             extracted_track_data = SoundCloudV2TrackData(track_data)
             if extracted_track_data.has_required_track_info():
-                track = extracted_track_data.into_track()
-                all_tracks.append(track)
+                slots.append(extracted_track_data.into_track())
             else:
+                slots.append(extracted_track_data.track_id)
                 remaining_track_ids.append(extracted_track_data.track_id)
 
-        # fetch remaining (non-prerendered) tracks in parallel
+        # only fetch the remaining (non-prerendered) tracks which are not already known
+        known_tracks: Dict[str, Track] = {}
+        if len(remaining_track_ids) > 0 and self.track_lookup is not None:
+            known_tracks = self.track_lookup(remaining_track_ids)
+            remaining_track_ids = [
+                track_id for track_id in remaining_track_ids if track_id not in known_tracks]
+
+        # fetch the rest in parallel
         if len(remaining_track_ids) > 0:
             tracks = fetch_tracks_parallel(
-                remaining_track_ids, client_id=self.get_client_id(), session=s)
-            all_tracks.extend(tracks)
+                remaining_track_ids, client_id=self.get_client_id(), limiter=self.limiter, transport=self.transport)
+            for track in tracks:
+                known_tracks[track['track_id']] = track
+
+        # tracks which could not be fetched (e.g. deleted tracks) are left out
+        all_tracks = TrackTable(self.platform)
+        for slot in slots:
+            track = known_tracks.get(slot) if isinstance(slot, str) else slot
+            if track is not None:
+                all_tracks.append(track)
 
         playlist = Playlist(**playlist_info, tracks=all_tracks)
         return playlist
 
-    def playlist_info(self, playlist_id: str) -> Union[str, None]:
-        # prepare url endpoint
-        if not playlist_id.startswith('/'):
-            url = f'https://soundcloud.com/{playlist_id}'
-        else:
-            url = f'https://soundcloud.com{playlist_id}'
-
-        response = requests.get(url, timeout=5)
-
-        # playlist private or not found
-        if not response.ok:
-            return None
-
-        # parse the HTML for window.__sc_hydration
-        playlist_data = self.__parse_hydration(response.text)
-
-        # validate playlist data parsed
-        if playlist_data is None or not isinstance(playlist_data, dict):
-            print(
-                '[SoundCloudApi] no field / unusable field `data` in hydration object: ',
-                json.dumps(playlist_data, indent=2)
-            )
-            return None
-
-        # get track list from playlist data
-        track_data_list = playlist_data.get('tracks')
-        if track_data_list is None or not isinstance(track_data_list, list):
-            print('[SoundCloudApi] No track data for this playlist could be parsed')
+    def playlist_info(self, playlist_id: str) -> Union[PlaylistInfo, None]:
+        playlist_data = self._playlist_data(playlist_id)
+        if playlist_data is None:
             return None
 
-        # extract playlist info from parsed playlist data
-        # standardised url is used as the playlist ID
-        playlist_id = playlist_data.get('url')
-        title = playlist_data.get('title')
-        thumbnail = playlist_data.get('artwork_url')
-        last_modified = playlist_data.get('last_modified')
-        playlist_length = playlist_data.get('track_count', len(track_data_list))
-        description = playlist_data.get('description')
-        owner_data = playlist_data.get('user')
-        if owner_data is not None:
-            owner = owner_data.get('username', '')
-        else:
-            owner = ''
-
-        playlist_info = PlaylistInfo(
-            platform=self.platform,
-            playlist_id=playlist_id,
-            title=title,
-            owner=owner,
-            description=description,
-            thumbnail=thumbnail,
-            etag=last_modified,
-            length=playlist_length,
-        )
-        return playlist_info
+        return self._info_from(playlist_data)
@@ -5,13 +5,23 @@ https://developer.spotify.com/documentation/web-api/reference/#/operations/get-p
 '''
 
 from typing import List, Optional, Union
-from .base import PlatformApi, Playlist, PlaylistInfo, Track, try_json
+from .base import PlatformApi, Playlist, PlaylistInfo, Track, Transport, try_json
+from .track_table import TrackTable
 import requests
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import time
 from enum import Enum
 
+API_URL = 'https://api.spotify.com/v1'
+# the maximum page sizes of the playlist and album tracks endpoints
+PLAYLIST_PAGE_LIMIT = 100
+ALBUM_PAGE_LIMIT = 50
+# the maximum number of pages of a playlist fetched at once
+PAGE_WORKERS = 8
+# only the fields read by `SpotifyApi.__extract_tracks_from`
+PLAYLIST_TRACK_FIELDS = 'total,items(track(id,name,duration_ms,artists(name),album(images(url))))'
+
 
 def validate_id(spotify_id: str) -> bool:
     # is base 62 without whitespace (is alphanumeric)
@@ -37,9 +47,10 @@ class ResponseStatus(Enum):
 
 
 class SpotifyCredentialManager:
-    def __init__(self, client_id: str, client_secret: str) -> None:
+    def __init__(self, client_id: str, client_secret: str, transport: Transport) -> None:
         self._client_id = client_id
         self._client_secret = client_secret
+        self._transport = transport
         self._token = ''
         self._token_expiry = datetime.min
 
@@ -53,7 +64,7 @@ class SpotifyCredentialManager:
         auth_b64_bytes = base64.b64encode(auth_bytes)
         auth_b64 = auth_b64_bytes.decode('ascii')
 
-        res = requests.post(
+        res = self._transport.post(
             'https://accounts.spotify.com/api/token',
             headers={
                 'Authorization': 'Basic ' + auth_b64
@@ -86,8 +97,9 @@ class SpotifyCredentialManager:
 
 class SpotifyApi(PlatformApi):
     def __init__(self, client_id: str, client_secret: str) -> None:
-        super().__init__(platform='SPOTIFY')
-        self.credentials = SpotifyCredentialManager(client_id, client_secret)
+        # enough connections for every page fetched at once
+        super().__init__(platform='SPOTIFY', transport=Transport('SPOTIFY', pool_maxsize=PAGE_WORKERS + 2))
+        self.credentials = SpotifyCredentialManager(client_id, client_secret, self.transport)
         # self.client_id = client_id
         # self.client_secret = client_secret
         self.cached_token = None
@@ -105,7 +117,7 @@ class SpotifyApi(PlatformApi):
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json'
         }
-        res = requests.get(endpoint, headers=headers, timeout=30)
+        res = self.transport.get(endpoint, headers=headers, timeout=30)
         return res
 
     def __extract_tracks_from(self, items: List[dict], is_album: bool = False, album_cover_url: str = '') -> List[Track]:
@@ -116,13 +128,19 @@ class SpotifyApi(PlatformApi):
                 track_data = item
                 thumbnail = album_cover_url
             else:
-                track_data = item.get('track', {})
+                track_data = item.get('track')
+                # track is null for tracks which are no longer available
+                if not isinstance(track_data, dict):
+                    continue
                 # track thumbnail is its album art
-                album = track_data.get('album', {})
+                album = track_data.get('album') or {}
                 images = album.get('images', [])
                 thumbnail = _extract_thumbnail(images)
 
             track_id = track_data.get('id')
+            # e.g. local files, which cannot be played
+            if track_id is None:
+                continue
             duration_secs = track_data.get('duration_ms', -1000) // 1000
             artists = track_data.get('artists', [])
             owner_names = ', '.join(map(lambda x: x.get('name', ''), artists))
@@ -153,10 +171,9 @@ class SpotifyApi(PlatformApi):
 
         debug_info = '[SpotifyApi.playlist()]'
 
-        limit = 50
-
-        url = f'https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit={limit}'
-        res = self.__fetch_endpoint(url)
+        url = f'{API_URL}/playlists/{playlist_id}/tracks'\
+            f'?limit={PLAYLIST_PAGE_LIMIT}&fields={PLAYLIST_TRACK_FIELDS}'
+        res = self.__fetch_endpoint(f'{url}&offset=0')
         status = self.__handle_status_codes(res)
         if status == ResponseStatus.UNRECOVERABLE:
             return None
@@ -170,31 +187,68 @@ class SpotifyApi(PlatformApi):
             print(f'{debug_info} Response body contained invalid or unexpected JSON: {result}')
             return None
 
-        items = result.get('items')
-        tracks = self.__extract_tracks_from(items)
+        pages = self.__fetch_pages(url, result, PLAYLIST_PAGE_LIMIT, debug_info)
+        if pages is None:
+            return None
 
-        encountered_unexpected_error = False
-        url = result.get('next')
+        tracks = TrackTable(self.platform)
+        for items in pages:
+            tracks.extend(self.__extract_tracks_from(items))
 
-        while url and not encountered_unexpected_error:
-            res = self.__fetch_endpoint(url)
-            status = self.__handle_status_codes(res)
-            if status != ResponseStatus.OK:
-                encountered_unexpected_error = True
+        if not playlist_info:
+            playlist_info = self.playlist_info(playlist_id)
+
+        return Playlist(**playlist_info, tracks=tracks)
+
+    def __fetch_pages(
+        self,
+        url: str,
+        first_page: dict,
+        limit: int,
+        debug_info: str,
+    ) -> Union[List[List[dict]], None]:
+        '''
+        Fetches the pages after the `first_page` concurrently, by their offsets computed from
+        the `total` in the `first_page`
+
+        Params
+        ------
+        `url`
+        - The endpoint of the pages, without the `offset` query param
+        `first_page`
+        - The JSON of the page at offset 0
+        `limit`
+        - The number of items in each page
+
+        Returns
+        ------
+        The `items` of every page, in order, or `None` if a page could not be fetched
+        '''
+        first_items = first_page.get('items') or []
+        total = first_page.get('total', len(first_items))
+        offsets = range(limit, total, limit)
+        if len(offsets) == 0:
+            return [first_items]
+
+        def fetch_page(offset: int) -> Union[List[dict], None]:
+            res = self.__fetch_endpoint(f'{url}&offset={offset}')
+            if self.__handle_status_codes(res) != ResponseStatus.OK:
+                return None
 
             result = try_json(res)
             if not result or not isinstance(result, dict):
                 print(f'{debug_info} Response body contained invalid or unexpected JSON: {result}')
-                encountered_unexpected_error = True
-
-            items = result.get('items')
-            tracks.extend(self.__extract_tracks_from(items))
-            url = result.get('next')
+                return None
+            return result.get('items') or []
 
-        if not playlist_info:
-            playlist_info = self.playlist_info(playlist_id)
+        # map returns the pages in order of offset, whatever order they are fetched in
+        with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, len(offsets))) as executor:
+            pages = list(executor.map(fetch_page, offsets))
 
-        return Playlist(**playlist_info, tracks=tracks)
+        if None in pages:
+            print(f'{debug_info} Error fetching a page of {url}')
+            return None
+        return [first_items, *pages]
 
     def __handle_status_codes(self, res: requests.Response, __max_retries=3, __retries=0) -> int:
         if __retries >= __max_retries:
@@ -225,13 +279,10 @@ class SpotifyApi(PlatformApi):
             return ResponseStatus.UNRECOVERABLE
 
         if res.status_code == 429:
-            # Too many requests
-            retry_after = res.headers.get('Retry-After', 15)
-            print(f'Rate limit exceeded (too many requests). Retrying in {retry_after}s...')
-            time.sleep(retry_after)
-            res = self.__fetch_endpoint(url)
-            # recursively handle the response up to the specified number of __max_retries
-            return self.__handle_status_codes(res, __max_retries, __retries+1)
+            # Too many requests. The transport's retry policy already retried the request,
+            # respecting Retry-After
+            print('Rate limit exceeded (too many requests) after retrying')
+            return ResponseStatus.UNRECOVERABLE
 
         if res.status_code == 404:
             # not found
@@ -265,7 +316,7 @@ class SpotifyApi(PlatformApi):
             return None
 
         debug_info = '[SpotifyApi.playlist_info()]'
-        url = f'https://api.spotify.com/v1/playlists/{playlist_id}'
+        url = f'{API_URL}/playlists/{playlist_id}'
         res = self.__fetch_endpoint(url)
 
         status = self.__handle_status_codes(res)
@@ -314,11 +365,11 @@ class SpotifyApi(PlatformApi):
 
         thumbnail = album_info['thumbnail']
 
-        debug_info = '[SpotifyApi.playlist()]'
-        limit = 50
+        debug_info = '[SpotifyApi.album()]'
 
-        url = f'https://api.spotify.com/v1/albums/{album_id}/tracks?limit={limit}'
-        res = self.__fetch_endpoint(url)
+        # the album tracks endpoint does not support a fields projection
+        url = f'{API_URL}/albums/{album_id}/tracks?limit={ALBUM_PAGE_LIMIT}'
+        res = self.__fetch_endpoint(f'{url}&offset=0')
         status = self.__handle_status_codes(res)
         if status != ResponseStatus.OK:
             return None
@@ -328,26 +379,13 @@ class SpotifyApi(PlatformApi):
             print(f'{debug_info} Response body contained invalid or unexpected JSON: {result}')
             return None
 
-        items = result.get('items')
-        tracks = self.__extract_tracks_from(items, is_album=True, album_cover_url=thumbnail)
-
-        encountered_unexpected_error = False
-        url = result.get('next')
-
-        while url and not encountered_unexpected_error:
-            res = self.__fetch_endpoint(url)
-            status = self.__handle_status_codes(res)
-            if status != ResponseStatus.OK:
-                encountered_unexpected_error = True
-
-            result = try_json(res)
-            if not result or not isinstance(result, dict):
-                print(f'{debug_info} Response body contained invalid or unexpected JSON: {result}')
-                encountered_unexpected_error = True
+        pages = self.__fetch_pages(url, result, ALBUM_PAGE_LIMIT, debug_info)
+        if pages is None:
+            return None
 
-            items = result.get('items')
+        tracks = TrackTable(self.platform)
+        for items in pages:
             tracks.extend(self.__extract_tracks_from(items, is_album=True, album_cover_url=thumbnail))
-            url = result.get('next')
 
         return Playlist(**album_info, tracks=tracks)
 
@@ -361,7 +399,7 @@ class SpotifyApi(PlatformApi):
             return None
 
         debug_info = '[SpotifyApi.album_info()]'
-        url = f'https://api.spotify.com/v1/albums/{album_id}'
+        url = f'{API_URL}/albums/{album_id}'
         res = self.__fetch_endpoint(url)
 
         status = self.__handle_status_codes(res)
@@ -0,0 +1,147 @@
+import sys
+from array import array
+from typing import Iterable, Iterator, List, Sequence, Union, overload
+from .base import Track
+
+# `array` cannot store `None`, so a missing duration is stored as the smallest int64
+_NO_DURATION = -(2 ** 63)
+
+
+class TrackTable(Sequence[Track]):
+    '''
+    A compact, column-oriented list of the `Track`s of one platform.
+
+    Each field is stored in its own list instead of one `dict` per track. The platform is stored
+    once, durations are packed into an `array`, and owners and thumbnails are interned so tracks
+    by the same artist or from the same album share one string. Indexing or iterating builds the
+    `Track` dicts on demand.
+
+    Attributes
+    ------
+    `platform`
+    - The platform of every track in the table
+    '''
+    __slots__ = ('platform', '_track_ids', '_titles', '_owners', '_thumbnails', '_durations')
+
+    def __init__(self, platform: str, tracks: Iterable[Track] = ()) -> None:
+        self.platform = sys.intern(platform)
+        self._track_ids: List[str] = []
+        self._titles: List[str] = []
+        self._owners: List[str] = []
+        self._thumbnails: List[str] = []
+        self._durations = array('q')
+        self.extend(tracks)
+
+    def append(self, track: Track):
+        '''Appends the `track` to the end of the table'''
+        owner = track['owner']
+        thumbnail = track['thumbnail']
+        duration_seconds = track['duration_seconds']
+        self._track_ids.append(track['track_id'])
+        self._titles.append(track['title'])
+        self._owners.append(sys.intern(owner) if isinstance(owner, str) else owner)
+        self._thumbnails.append(sys.intern(thumbnail) if isinstance(thumbnail, str) else thumbnail)
+        self._durations.append(_NO_DURATION if duration_seconds is None else duration_seconds)
+
+    def extend(self, tracks: Iterable[Track]):
+        '''Appends each of the `tracks` to the end of the table'''
+        if isinstance(tracks, TrackTable) and tracks.platform == self.platform:
+            self._track_ids.extend(tracks._track_ids)
+            self._titles.extend(tracks._titles)
+            self._owners.extend(tracks._owners)
+            self._thumbnails.extend(tracks._thumbnails)
+            self._durations.extend(tracks._durations)
+            return
+
+        for track in tracks:
+            self.append(track)
+
+    @property
+    def track_ids(self) -> List[str]:
+        '''The IDs of the tracks, in order. Must not be modified'''
+        return self._track_ids
+
+    def _track(self, i: int) -> Track:
+        duration_seconds = self._durations[i]
+        return Track(
+            track_id=self._track_ids[i],
+            platform=self.platform,
+            title=self._titles[i],
+            owner=self._owners[i],
+            thumbnail=self._thumbnails[i],
+            duration_seconds=None if duration_seconds == _NO_DURATION else duration_seconds,
+        )
+
+    @overload
+    def __getitem__(self, i: int) -> Track: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> 'TrackTable': ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Track, 'TrackTable']:
+        if isinstance(i, slice):
+            table = TrackTable(self.platform)
+            table._track_ids = self._track_ids[i]
+            table._titles = self._titles[i]
+            table._owners = self._owners[i]
+            table._thumbnails = self._thumbnails[i]
+            table._durations = self._durations[i]
+            return table
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('TrackTable index out of range')
+        return self._track(i)
+
+    def __iter__(self) -> Iterator[Track]:
+        for i in range(len(self._track_ids)):
+            yield self._track(i)
+
+    def __len__(self) -> int:
+        return len(self._track_ids)
+
+    def to_list(self) -> List[Track]:
+        '''Returns the tracks as a list of `Track` dicts'''
+        return list(self)
+
+    def nbytes(self) -> int:
+        '''
+        Returns
+        ------
+        The approximate number of bytes used by the table. Interned strings shared between
+        tracks are counted once
+        '''
+        size = sys.getsizeof(self._durations)
+        seen = set()
+        for column in (self._track_ids, self._titles, self._owners, self._thumbnails):
+            size += sys.getsizeof(column)
+            for value in column:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    size += sys.getsizeof(value)
+        return size
+
+    def __repr__(self) -> str:
+        return f'TrackTable({self.platform}, length={len(self)})'
+
+
+def tracks_nbytes(tracks: Sequence[Track]) -> int:
+    '''
+    Returns
+    ------
+    The approximate number of bytes used by `tracks`, whether a `TrackTable` or a list of
+    `Track` dicts, for comparing the two
+    '''
+    if isinstance(tracks, TrackTable):
+        return tracks.nbytes()
+
+    size = sys.getsizeof(tracks)
+    seen = set()
+    for track in tracks:
+        size += sys.getsizeof(track)
+        for value in track.values():
+            if id(value) not in seen:
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+    return size
@@ -7,9 +7,13 @@ https://stackoverflow.com/a/65281317
 https://developers.google.com/youtube/v3/docs/playlists/list
 '''
 
-from typing import List, Optional, Union
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 import requests
-from .base import PlatformApi, Playlist, PlaylistInfo, Track, try_json
+from .base import IncompletePlaylistError, PlatformApi, Playlist, PlaylistInfo, Track, Transport, try_json
+from .track_table import TrackTable
+from debug_utils import print_red
 
 
 def choose_thumbnail(all_thumbnails: dict, priority: Optional[List[str]] = None) -> str:
@@ -27,6 +31,91 @@ def choose_thumbnail(all_thumbnails: dict, priority: Optional[List[str]] = None)
     return ''
 
 
+class ConditionalCache:
+    '''
+    Caches the parsed JSON response of each URL with the response's etag, and sends the etag in
+    an `If-None-Match` header the next time the URL is requested. A `304 Not Modified` response
+    has no body, so the cached value is used instead.
+
+    Only the parsed value is kept (e.g. the `Track`s of a page) instead of the response body.
+    The least recently used URLs are dropped once there are more than `max_entries`
+
+    Attributes
+    ------
+    `stats`
+    - `hits`: `304 Not Modified` responses
+    - `misses`: `200 OK` responses
+    '''
+
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max_entries
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+        self._entries: 'OrderedDict[str, Tuple[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        transport: Transport,
+        url: str,
+        parse: Callable[[Any], Any],
+    ) -> Tuple[Any, requests.Response]:
+        '''
+        Params
+        ------
+        `transport`
+        - The `Transport` to send the request with, with its default timeout
+        `url`
+        - The URL to `GET`
+        `parse`
+        - Converts the JSON response into the value to return and cache
+
+        Returns
+        ------
+        The parsed value, or `None` if the request failed or the response was not JSON, and the
+        response
+        '''
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+
+        headers = {} if entry is None else {'If-None-Match': entry[0]}
+        response = transport.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.stats['hits'] += 1
+            return entry[1], response
+
+        if not response.ok:
+            return None, response
+
+        result = try_json(response)
+        if result is None:
+            return None, response
+
+        value = parse(result)
+        etag = response.headers.get('ETag', result.get('etag'))
+        with self._lock:
+            self.stats['misses'] += 1
+            if etag is not None:
+                self._entries[url] = (etag, value)
+                self._entries.move_to_end(url)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value, response
+
+    def cache_stats(self) -> Dict[str, int]:
+        '''Returns a copy of the `stats` and the number of URLs cached'''
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class YouTubeApi(PlatformApi):
     def __init__(self, api_key: str) -> None:
         '''
@@ -38,6 +127,8 @@ class YouTubeApi(PlatformApi):
         '''
         super().__init__(platform='YOUTUBE')
         self.api_key = api_key
+        # playlist infos and pages of playlist items, revalidated with If-None-Match
+        self.conditional_cache = ConditionalCache()
 
     def _extract_track_from(self, item: dict) -> Track:
         all_thumbnails = item['snippet']['thumbnails']
@@ -63,52 +154,70 @@ class YouTubeApi(PlatformApi):
             tracks.append(self._extract_track_from(item))
         return tracks
 
+    def _parse_page(self, result: dict) -> Tuple[TrackTable, Optional[str]]:
+        '''Returns the tracks and the `nextPageToken` of a page of playlist items'''
+        tracks = TrackTable(self.platform, self._extract_tracks_from(result['items']))
+        return tracks, result.get('nextPageToken')
+
     def playlist(
         self,
         playlist_id: str,
         playlist_info: Optional[PlaylistInfo] = None
     ) -> Union[Playlist, None]:
+        pages = self.iter_track_pages(playlist_id)
+        if pages is None:
+            return None
+
+        tracks = TrackTable(self.platform)
+        try:
+            for page_tracks in pages:
+                tracks.extend(page_tracks)
+        except IncompletePlaylistError as err:
+            print_red(f'[YouTubeApi.playlist()] {err}')
+            return None
+
+        if playlist_info is None:
+            playlist_info = self.playlist_info(playlist_id)
+
+        return Playlist(**playlist_info, tracks=tracks)
+
+    def iter_track_pages(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None
+    ) -> Union[Iterator[TrackTable], None]:
+        '''
+        Fetches the first page of (up to 50) playlist items, and the next page each time the
+        previous page has been iterated over
+        '''
         # https://developers.google.com/youtube/v3/docs/playlistItems/list#usage
         playlist_id = playlist_id.strip()
         url = 'https://www.googleapis.com/youtube/v3/playlistItems'\
             f'?part=snippet&maxResults=50&playlistId={playlist_id}&key={self.api_key}'
 
-        s = requests.Session()
-        response = s.get(url, timeout=30)
+        # each page is requested with the etag of the page last time, so unchanged pages are
+        # not sent again
+        page, response = self.conditional_cache.get(self.transport, url, self._parse_page)
 
-        if not response.ok:
+        if page is None:
             print(f'Error fetching playlist items for playlist {playlist_id}: {response.reason}')
             return None
 
-        result = try_json(response)
-        if result is None:
-            return None
-
-        next_page_token = result.get('nextPageToken')
-        tracks: List[Track] = []
-
-        items = result['items']
-        tracks.extend(self._extract_tracks_from(items))
-
-        while next_page_token:
-            response = s.get(f'{url}&pageToken={next_page_token}', timeout=30)
-            if not response.ok:
-                print(
-                    f'Error fetching playlist items for playlist {playlist_id}: {response.reason}')
-                return None
+        def iter_pages(page: Tuple[TrackTable, Optional[str]]) -> Iterator[TrackTable]:
+            page_tracks, next_page_token = page
+            yield page_tracks
 
-            result = try_json(response)
-            if result is None:
-                return None
+            while next_page_token:
+                page, response = self.conditional_cache.get(
+                    self.transport, f'{url}&pageToken={next_page_token}', self._parse_page)
+                if page is None:
+                    raise IncompletePlaylistError(
+                        f'Error fetching playlist items for playlist {playlist_id}: {response.reason}')
 
-            items = result['items']
-            tracks.extend(self._extract_tracks_from(items))
-            next_page_token = result.get('nextPageToken')
-
-        if playlist_info is None:
-            playlist_info = self.playlist_info(playlist_id)
+                page_tracks, next_page_token = page
+                yield page_tracks
 
-        return Playlist(**playlist_info, tracks=tracks)
+        return iter_pages(page)
 
     def playlist_info(self, playlist_id: str) -> Union[PlaylistInfo, None]:
         '''
@@ -121,13 +230,10 @@ class YouTubeApi(PlatformApi):
         playlist_id = playlist_id.strip()
         url = 'https://www.googleapis.com/youtube/v3/playlists'\
             f'?part=snippet,contentDetails&id={playlist_id}&key={self.api_key}'
-        response = requests.get(url, timeout=30)  # timeout 30 seconds
-        if not response.ok:
-            print(f'Error fetching etag for playlist {playlist_id}: {response.reason}')
-            return None
-
-        result = try_json(response)
+        # a 304 Not Modified response reuses the last result
+        result, response = self.conditional_cache.get(self.transport, url, lambda result: result)
         if result is None:
+            print(f'Error fetching etag for playlist {playlist_id}: {response.reason}')
             return None
 
         # https://developers.google.com/youtube/v3/docs/playlists#resource
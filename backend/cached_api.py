@@ -0,0 +1,843 @@
+'''
+A read-through cache in front of the platform APIs.
+
+`CachedPlatformApi` wraps a `PlatformApi` with two cache tiers:
+- L1: an in-process `LruCache` of whole playlists, bounded by an approximate byte budget
+- L2: the SQLite cache (`colls`)
+
+A playlist is only served from cache if its etag matches the upstream etag. The serialized,
+gzip compressed response body of each cached playlist is also kept in both tiers (see
+`cached_payload`), so a cache hit does not need to rebuild the playlist at all.
+
+How often the cached etag is checked against the upstream etag is set by each platform's
+`FreshnessPolicy`.
+'''
+import itertools
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+from .api import PlatformApi, Playlist, PlaylistInfo, Track, TrackTable
+from .storage_result import Ok, Err, Result
+from .single_flight import SingleFlight
+from . import CollectionDict
+from debug_utils import print_blue, print_green, print_red
+
+
+def track_from_record(record) -> Track:
+    '''Converts a record of `PlaylistTracksCollection.find` into a `Track`'''
+    return Track(
+        track_id=record['TrackID'],
+        platform=record['TrackPlatform'],
+        title=record['TrackTitle'],
+        owner=record['TrackOwner'],
+        thumbnail=record['TrackThumbnail'],
+        duration_seconds=record['DurationSeconds'],
+    )
+
+
+def info_from_record(record, platform: str) -> PlaylistInfo:
+    '''Converts a record of `PlaylistCollection.find` into a `PlaylistInfo`'''
+    return PlaylistInfo(
+        platform=platform,
+        playlist_id=record['PlaylistID'],
+        title=record['Title'],
+        owner=record['Owner'],
+        description=record['Description'],
+        thumbnail=record['Thumbnail'],
+        etag=record['Etag'],
+        length=record['Length'],
+    )
+
+
+def track_record_from(track: Track, platform: str) -> dict:
+    '''Converts a `Track` into a record of `TrackCollection`'''
+    return {
+        'TrackID': track['track_id'],
+        'Platform': platform,
+        'Title': track['title'],
+        'Owner': track['owner'],
+        'Thumbnail': track['thumbnail'],
+        'DurationSeconds': track['duration_seconds'],
+    }
+
+
+def track_lookup(colls: CollectionDict, platform: str) -> Callable[[List[str]], Dict[str, Track]]:
+    '''
+    Returns
+    ------
+    A function which finds the cached `Track` of each of a list of track IDs of the `platform` in
+    one query, returning the tracks found by track ID. Nothing is found if the query fails
+    '''
+    def lookup(track_ids: List[str]) -> Dict[str, Track]:
+        result = colls['Track'].find_many([(track_id, platform) for track_id in track_ids])
+        if not result.ok:
+            print_red(f'[CachedPlatformApi] Error looking up {len(track_ids)} tracks: {result.err()}')
+            return {}
+
+        return {
+            record['TrackID']: Track(
+                track_id=record['TrackID'],
+                platform=platform,
+                title=record['Title'],
+                owner=record['Owner'],
+                thumbnail=record['Thumbnail'],
+                duration_seconds=record['DurationSeconds'],
+            ) for record in result.value
+        }
+
+    return lookup
+
+
+def iter_chunks(tracks: Iterable[Track], size: int) -> Iterator[List[Track]]:
+    '''Yields the `tracks` in lists of `size` tracks'''
+    tracks = iter(tracks)
+    while True:
+        chunk = list(itertools.islice(tracks, size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def playlist_nbytes(playlist: Playlist) -> int:
+    '''The approximate number of bytes used by the `playlist`'''
+    size = sys.getsizeof(playlist)
+    for key, value in playlist.items():
+        if key != 'tracks':
+            size += sys.getsizeof(value)
+
+    tracks = playlist['tracks']
+    if isinstance(tracks, TrackTable):
+        size += tracks.nbytes()
+    return size
+
+
+class LruCache:
+    '''
+    A thread-safe least recently used cache bounded by the total size of its values
+
+    Attributes
+    ------
+    `max_bytes`
+    - The maximum total size of the cached values. The least recently used values are evicted
+      to stay under it
+    `max_entry_bytes`
+    - Values larger than this are not cached
+    '''
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: Optional[int] = None) -> None:
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes // 4 if max_entry_bytes is None else max_entry_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        '''Returns the value cached for `key`, or `None` if not cached'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> bool:
+        '''
+        Caches the `value` of size `nbytes` for `key`, replacing any value already cached
+
+        Returns
+        ------
+        `True` if the value was cached, `False` if it is larger than `max_entry_bytes`
+        '''
+        if nbytes > self.max_entry_bytes:
+            self.discard(key)
+            return False
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.nbytes -= old_entry[1]
+
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+        return True
+
+    def discard(self, key: Hashable):
+        '''Removes the value cached for `key`, if any'''
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FreshnessPolicy:
+    '''
+    How long a cached playlist is served without checking its etag against the upstream etag
+
+    Attributes
+    ------
+    `ttl_secs`
+    - For `ttl_secs` after the etag was validated, the cached playlist is served as is
+    `max_age_secs`
+    - Until `max_age_secs` after the etag was validated, the cached (stale) playlist is served
+      while the etag is revalidated in the background. After `max_age_secs`, the etag is
+      revalidated before the playlist is served
+    '''
+
+    def __init__(self, ttl_secs: float, max_age_secs: float) -> None:
+        self.ttl_secs = ttl_secs
+        self.max_age_secs = max(ttl_secs, max_age_secs)
+
+    def __repr__(self) -> str:
+        return f'FreshnessPolicy(ttl_secs={self.ttl_secs}, max_age_secs={self.max_age_secs})'
+
+
+# revalidating a SoundCloud playlist scrapes the playlist's page, so it is done less often
+FRESHNESS_POLICIES: Dict[str, FreshnessPolicy] = {
+    'YOUTUBE': FreshnessPolicy(ttl_secs=60, max_age_secs=60 * 60),
+    'SPOTIFY': FreshnessPolicy(ttl_secs=60, max_age_secs=60 * 60),
+    'SOUNDCLOUD': FreshnessPolicy(ttl_secs=5 * 60, max_age_secs=6 * 60 * 60),
+}
+DEFAULT_FRESHNESS_POLICY = FreshnessPolicy(ttl_secs=60, max_age_secs=60 * 60)
+# the maximum number of resolved playlist IDs remembered by each CachedPlatformApi
+MAX_RESOLVED_IDS = 4096
+
+
+class CachedPlatformApi(PlatformApi):
+    '''
+    # CachedPlatformApi
+    ### A `PlatformApi` that serves playlists from the L1 (memory) or L2 (SQLite) cache when
+    ### their etag is unchanged, and caches playlists fetched from the wrapped API
+
+    Playlists without an etag (e.g. Spotify albums) are always fetched from the wrapped API.
+
+    Attributes
+    ------
+    `api`
+    - The wrapped `PlatformApi`
+    `colls`
+    - The SQLite (L2) collections
+    `l1`
+    - The in-memory (L1) `LruCache`, shared by all platforms. Keyed by `(platform, playlist_id)`
+      and holding `(etag, Playlist)`, so only the latest version of each playlist is kept.
+      Payloads are keyed by `(platform, playlist_id, 'payload')` and hold `(etag, body)`
+    `policy`
+    - The `FreshnessPolicy` of the cached playlists
+    `stats`
+    - Hit/miss counters of each tier, the number of upstream calls, the number of upstream
+      calls saved by waiting for an identical call in flight (`shared_*`), and how many cached
+      playlists were fresh, stale (revalidated in the background) or expired (revalidated
+      before being served), and how many playlist IDs were resolved without the wrapped API
+    '''
+
+    # revalidates stale playlists in the background, shared by all platforms
+    _revalidator = ThreadPoolExecutor(max_workers=4, thread_name_prefix='revalidate')
+
+    def __init__(
+        self,
+        api: PlatformApi,
+        colls: CollectionDict,
+        l1: LruCache,
+        policy: Optional[FreshnessPolicy] = None,
+    ) -> None:
+        super().__init__(platform=api.platform, transport=api.transport)
+        self.api = api
+        self.colls = colls
+        self.l1 = l1
+        if policy is None:
+            policy = FRESHNESS_POLICIES.get(api.platform, DEFAULT_FRESHNESS_POLICY)
+        self.policy = policy
+        self.stats: Dict[str, int] = {
+            'l1_hits': 0,
+            'l1_misses': 0,
+            'l2_hits': 0,
+            'l2_misses': 0,
+            'upstream_playlist': 0,
+            'upstream_playlist_info': 0,
+            'shared_playlist': 0,
+            'shared_playlist_info': 0,
+            'payload_hits': 0,
+            'payload_misses': 0,
+            'fresh': 0,
+            'stale': 0,
+            'expired': 0,
+            'resolve_hits': 0,
+            'resolve_misses': 0,
+        }
+        self._stats_lock = threading.Lock()
+        # the resolved ID and when it was resolved, by requested playlist ID
+        self._resolved: 'OrderedDict[str, Tuple[str, float]]' = OrderedDict()
+        self._resolved_lock = threading.Lock()
+        # concurrent requests for the same playlist wait for one upstream call
+        self._flight = SingleFlight()
+        self._revalidating = set()
+
+    def _count(self, stat: str):
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    def _record(self, playlist_id: str) -> dict:
+        return {'PlaylistID': playlist_id, 'Platform': self.platform}
+
+    def resolve_playlist_id(self, playlist_id: str) -> str:
+        '''
+        Resolves the `playlist_id` with the wrapped API, unless it was resolved less than the
+        `policy`'s `max_age_secs` ago or is already the ID of a cached playlist, as resolving
+        may fetch the playlist (e.g. SoundCloud)
+        '''
+        now = time.time()
+        with self._resolved_lock:
+            entry = self._resolved.get(playlist_id)
+        if entry is not None and now - entry[1] <= self.policy.max_age_secs:
+            self._count('resolve_hits')
+            return entry[0]
+
+        # cached playlists are stored by their resolved ID
+        res = self.cached_info(playlist_id)
+        if res.ok and res.value is not None:
+            self._count('resolve_hits')
+            return playlist_id
+
+        self._count('resolve_misses')
+        resolved_id = self.api.resolve_playlist_id(playlist_id)
+        # an ID which resolves to itself may not have been found, so is resolved again next time
+        if resolved_id != playlist_id:
+            with self._resolved_lock:
+                self._resolved[playlist_id] = (resolved_id, now)
+                self._resolved.move_to_end(playlist_id)
+                while len(self._resolved) > MAX_RESOLVED_IDS:
+                    self._resolved.popitem(last=False)
+        return resolved_id
+
+    def upstream_playlist_info(self, playlist_id: str) -> Union[PlaylistInfo, None]:
+        '''
+        Fetches the `PlaylistInfo` from the wrapped API, bypassing the cache. Concurrent calls
+        for the same playlist share one upstream call
+        '''
+        def fetch():
+            self._count('upstream_playlist_info')
+            print_blue(f'[CachedPlatformApi] ({self.platform}) Fetching playlist_info(playlist_id={playlist_id})')
+            return self.api.playlist_info(playlist_id)
+
+        playlist_info, shared = self._flight.do(('playlist_info', playlist_id), fetch)
+        if shared:
+            self._count('shared_playlist_info')
+        # followers get their own copy, as callers may modify the PlaylistInfo
+        return None if playlist_info is None else PlaylistInfo(**playlist_info)
+
+    def cached_info(self, playlist_id: str) -> Result:
+        '''
+        Returns
+        ------
+        - `Ok(record: sqlite3.Row)` with the cached Playlist record
+        - `Ok(None)` if the playlist is not cached
+        - `Err(error)` if the cache could not be read
+        '''
+        res = self.colls['Playlist'].find(self._record(playlist_id))
+        if not res.ok:
+            return res
+        if len(res.value) == 0:
+            return Ok(None)
+        return Ok(res.value[0])
+
+    def playlist_info(self, playlist_id: str) -> Union[PlaylistInfo, None]:
+        '''
+        Returns the `PlaylistInfo` of the cached playlist according to the `policy`:
+        - fresh: the cached info
+        - stale: the cached info, and revalidates the playlist in the background
+        - expired, or cached without an etag: the upstream info (see `revalidate`)
+
+        Fetches the info from the wrapped API if the playlist is not cached. Playlist records
+        are only cached together with their tracks, so the fetched info is not cached
+        '''
+        res = self.cached_info(playlist_id)
+        if not res.ok:
+            print_red(f'[CachedPlatformApi] Error fetching cached playlist {playlist_id}: {res.err()}')
+        if not res.ok or res.value is None:
+            self._count('l2_misses')
+            return self.upstream_playlist_info(playlist_id)
+
+        cached_record = res.value
+        self._count('l2_hits')
+        validated_at = cached_record['ValidatedAt']
+        age = float('inf') if validated_at is None else time.time() - validated_at
+
+        if cached_record['Etag'] is None or age > self.policy.max_age_secs:
+            self._count('expired')
+            return self.revalidate(playlist_id)
+
+        if age > self.policy.ttl_secs:
+            self._count('stale')
+            self.revalidate_in_background(playlist_id, cached_record['Etag'])
+        else:
+            self._count('fresh')
+        return info_from_record(cached_record, self.platform)
+
+    def revalidate(self, playlist_id: str) -> Union[PlaylistInfo, None]:
+        '''
+        Fetches the upstream `PlaylistInfo` and marks the cached playlist as validated if its
+        etag is unchanged. Evicts the playlist if it no longer exists. A changed playlist is
+        not fetched, as the caller is expected to pass the returned info to `playlist()`
+
+        Returns
+        ------
+        The upstream `PlaylistInfo`, or `None` if not found
+        '''
+        playlist_info = self.upstream_playlist_info(playlist_id)
+        if playlist_info is None:
+            self.evict(playlist_id)
+            return None
+
+        etag = playlist_info.get('etag')
+        if etag is not None:
+            res = self.colls['Playlist'].mark_validated(self._record(playlist_id), etag, time.time())
+            if not res.ok:
+                print_red(f'[CachedPlatformApi] Error validating cached playlist {playlist_id}: {res.err()}')
+        return playlist_info
+
+    def revalidate_in_background(self, playlist_id: str, etag: str):
+        '''
+        Revalidates the cached playlist on a background thread, refreshing the playlist only if
+        its upstream etag is no longer `etag`. Does nothing if the playlist is already being
+        revalidated
+
+        Params
+        ------
+        `etag`
+        - The etag of the cached playlist
+        '''
+        with self._stats_lock:
+            if playlist_id in self._revalidating:
+                return
+            self._revalidating.add(playlist_id)
+
+        def revalidate():
+            try:
+                # marks the cached playlist as validated if the etag is unchanged
+                playlist_info = self.revalidate(playlist_id)
+                if playlist_info is not None and playlist_info.get('etag') != etag:
+                    self.refresh(playlist_id, playlist_info)
+            except Exception as err:
+                print_red(f'[CachedPlatformApi] Error revalidating playlist {playlist_id}: {err}')
+            finally:
+                with self._stats_lock:
+                    self._revalidating.discard(playlist_id)
+
+        self._revalidator.submit(revalidate)
+
+    def playlist(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None
+    ) -> Union[Playlist, None]:
+        '''
+        Returns the playlist from the first tier whose etag matches the upstream etag in
+        `playlist_info`, fetching the playlist from the wrapped API if neither does. If the
+        playlist no longer exists, it is removed from the cache.
+
+        Params
+        ------
+        `playlist_info`
+        - The upstream `PlaylistInfo`. Fetched from the wrapped API if `None`
+
+        Returns
+        ------
+        The `Playlist`, or `None` if not found. The `tracks` of a playlist too large for L1
+        are streamed from L2 as an iterator, so they can only be iterated over once
+        '''
+        if playlist_info is None:
+            playlist_info = self.revalidate(playlist_id)
+        if playlist_info is None:
+            return None
+
+        etag = playlist_info.get('etag')
+        if etag is not None:
+            playlist = self._cached_playlist(playlist_id, playlist_info)
+            if playlist is not None:
+                return playlist
+
+        # etag is None or different etag means playlist contents have changed
+        return self.refresh(playlist_id, playlist_info)
+
+    def _cached_playlist(self, playlist_id: str, playlist_info: PlaylistInfo) -> Union[Playlist, None]:
+        etag = playlist_info['etag']
+        key = (self.platform, playlist_id)
+
+        # L1
+        entry = self.l1.get(key)
+        if entry is not None and entry[0] == etag:
+            self._count('l1_hits')
+            print_blue(f'[CachedPlatformApi] Matching etags: {etag}. Using L1 cache')
+            return entry[1]
+        self._count('l1_misses')
+
+        # L2
+        res = self.cached_info(playlist_id)
+        if not res.ok:
+            print_red(f'[CachedPlatformApi] Error fetching cached playlist\'s etag. {res.err()}')
+            self._count('l2_misses')
+            return None
+
+        cached_record = res.value
+        # Length is the number of cached tracks
+        if (
+            cached_record is None
+            or cached_record['Etag'] != etag
+            or cached_record['Length'] == 0 and playlist_info['length'] != 0
+        ):
+            self._count('l2_misses')
+            return None
+
+        res = self.colls['PlaylistTracks'].iter_find(self._record(playlist_id))
+        if not res.ok:
+            print_red(f'[CachedPlatformApi] Error fetching cached playlist. {res.err()}')
+            self._count('l2_misses')
+            return None
+
+        self._count('l2_hits')
+        print_blue(f'[CachedPlatformApi] Matching etags: {etag}. Using L2 cache')
+        cached_info = info_from_record(cached_record, self.platform)
+        tracks = map(track_from_record, res.value)
+
+        # ~200 bytes per track in a TrackTable. Stream playlists too large for L1 instead of
+        # loading them into memory
+        if cached_record['Length'] * 200 > self.l1.max_entry_bytes:
+            return Playlist(**cached_info, tracks=tracks)
+
+        playlist = Playlist(**cached_info, tracks=TrackTable(self.platform, tracks))
+        self.l1.put(key, (etag, playlist), playlist_nbytes(playlist))
+        return playlist
+
+    def refresh(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None,
+    ) -> Union[Playlist, None]:
+        '''
+        Fetches the playlist from the wrapped API and replaces the cached playlist with it.
+        Concurrent calls for the same playlist wait for one fetch and share the `Playlist`
+
+        Params
+        ------
+        `playlist_id`
+        - The resolved playlist ID
+        `playlist_info`
+        - The already fetched `PlaylistInfo` of the playlist, if any
+
+        Returns
+        ------
+        The fetched `Playlist`, or `None` if the playlist was not found
+        '''
+        def fetch():
+            self._count('upstream_playlist')
+            print_blue(f'[CachedPlatformApi] ({self.platform}) Fetching playlist(playlist_id={playlist_id})')
+            playlist = self.api.playlist(playlist_id, playlist_info)
+            if playlist is None:
+                return None
+
+            if not isinstance(playlist['tracks'], TrackTable):
+                playlist['tracks'] = TrackTable(self.platform, playlist['tracks'])
+
+            self._store(playlist)
+            return playlist
+
+        playlist, shared = self._flight.do(('playlist', playlist_id), fetch)
+        if shared:
+            self._count('shared_playlist')
+        return playlist
+
+    def iter_track_pages(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None,
+        page_size: int = 500,
+    ) -> Union[Iterator[Sequence[Track]], None]:
+        '''
+        Gets the tracks of the playlist one page at a time. A cached playlist whose etag
+        matches `playlist_info` is paged from the cache. Otherwise the pages are fetched from
+        the wrapped API and written to the cache as they arrive (see `_store_pages`).
+
+        Unlike `refresh`, concurrent calls are not coalesced, as the pages can only be iterated
+        over once
+
+        Params
+        ------
+        `playlist_info`
+        - The upstream `PlaylistInfo`. Fetched from the wrapped API if `None`
+        `page_size`
+        - The number of tracks in each page of a cached playlist
+        '''
+        if playlist_info is None:
+            playlist_info = self.revalidate(playlist_id)
+        if playlist_info is None:
+            return None
+
+        if playlist_info.get('etag') is not None:
+            playlist = self._cached_playlist(playlist_id, playlist_info)
+            if playlist is not None:
+                return iter_chunks(playlist['tracks'], page_size)
+
+        self._count('upstream_playlist')
+        print_blue(f'[CachedPlatformApi] ({self.platform}) Fetching iter_track_pages(playlist_id={playlist_id})')
+        pages = self.api.iter_track_pages(playlist_id, playlist_info)
+        if pages is None:
+            return None
+        return self._store_pages(playlist_id, playlist_info, pages)
+
+    def _store_pages(
+        self,
+        playlist_id: str,
+        playlist_info: PlaylistInfo,
+        pages: Iterator[Sequence[Track]],
+    ) -> Iterator[Sequence[Track]]:
+        '''
+        Yields the `pages`, writing each page to L2 before it is yielded. The cached playlist
+        has no etag until the last page is written, so if the pages are not iterated to the end
+        (or a page fails to be fetched), the partially cached playlist is fetched again on the
+        next request
+        '''
+        playlist_record = {
+            'PlaylistID': playlist_id,
+            'Title': playlist_info['title'],
+            'Owner': playlist_info['owner'],
+            'Description': playlist_info['description'],
+            'Thumbnail': playlist_info['thumbnail'],
+            'Etag': playlist_info['etag'],
+            'Platform': self.platform,
+        }
+        key = (self.platform, playlist_id)
+        # the playlist is about to be partially overwritten
+        self.l1.discard(key)
+        tracks = TrackTable(self.platform)
+        # once a page fails to be written, the cached playlist is left without an etag (or as it
+        # was, if the first page failed) so it is fetched again on the next request
+        write_failed = False
+
+        for page in pages:
+            if not write_failed:
+                res = self.colls['PlaylistTracks'].write_page(
+                    playlist_record,
+                    [track_record_from(track, self.platform) for track in page],
+                    len(tracks),
+                )
+                if not res.ok:
+                    write_failed = True
+                    print_red(
+                        '[CachedPlatformApi] Error caching page of playlist '
+                        f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res}')
+            tracks.extend(page)
+            yield page
+
+        if write_failed:
+            return
+
+        res = self.colls['PlaylistTracks'].finish_pages(
+            {**playlist_record, 'ValidatedAt': time.time()}, len(tracks))
+        if not res.ok:
+            print_red(
+                '[CachedPlatformApi] Error caching playlist '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res}')
+            return
+
+        print_green(
+            '[CachedPlatformApi] Successfully cached playlist page by page '
+            f'(PlaylistID = {playlist_id}, Platform = {self.platform}, Length = {len(tracks)})')
+        if playlist_info['etag'] is not None:
+            playlist = Playlist(**playlist_info, tracks=tracks)
+            playlist['length'] = len(tracks)
+            self.l1.put(key, (playlist_info['etag'], playlist), playlist_nbytes(playlist))
+
+    def _store(self, playlist: Playlist):
+        '''Replaces the L2 and L1 cache of the playlist with the fetched `playlist`'''
+        playlist_id = playlist['playlist_id']
+        tracks_to_insert = [track_record_from(track, self.platform) for track in playlist['tracks']]
+
+        # replace the old cache with the new playlist in a single transaction
+        res = self.colls['PlaylistTracks'].replace_playlist(
+            {
+                'PlaylistID': playlist_id,
+                'Title': playlist['title'],
+                'Owner': playlist['owner'],
+                'Description': playlist['description'],
+                'Thumbnail': playlist['thumbnail'],
+                'Etag': playlist['etag'],
+                'Platform': self.platform,
+                'ValidatedAt': time.time(),
+            },
+            tracks_to_insert,
+        )
+        if not res.ok:
+            print_red(
+                '[CachedPlatformApi] Error replacing cached playlist '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res}')
+        else:
+            print_green(
+                '[CachedPlatformApi] Successfully replaced cached playlist '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res.value}')
+
+        key = (self.platform, playlist_id)
+        if playlist['etag'] is None:
+            self.l1.discard(key)
+        else:
+            self.l1.put(key, (playlist['etag'], playlist), playlist_nbytes(playlist))
+
+    def cached_payload(self, playlist_id: str, etag: Optional[str]) -> Optional[bytes]:
+        '''
+        Returns
+        ------
+        The gzip compressed JSON response body of the playlist cached for `etag`, from L1 or
+        else L2, or `None` if no body is cached for `etag`
+        '''
+        if etag is None:
+            return None
+
+        key = (self.platform, playlist_id, 'payload')
+        entry = self.l1.get(key)
+        if entry is not None and entry[0] == etag:
+            self._count('payload_hits')
+            return entry[1]
+
+        res = self.colls['PlaylistPayload'].find({
+            'PlaylistID': playlist_id,
+            'Platform': self.platform,
+            'Etag': etag,
+        })
+        if not res.ok:
+            print_red(f'[CachedPlatformApi] Error fetching cached payload of playlist {playlist_id}: {res.err()}')
+        if not res.ok or len(res.value) == 0 or res.value[0]['Encoding'] != 'gzip':
+            self._count('payload_misses')
+            return None
+
+        self._count('payload_hits')
+        body = bytes(res.value[0]['Body'])
+        self.l1.put(key, (etag, body), len(body))
+        return body
+
+    def store_payload(self, playlist_id: str, etag: Optional[str], body: bytes):
+        '''
+        Caches the gzip compressed JSON response `body` of the playlist with `etag` in L1 and
+        L2. Not cached if `etag` is `None` or the playlist is not cached (in L2)
+        '''
+        if etag is None:
+            return
+
+        self.l1.put((self.platform, playlist_id, 'payload'), (etag, body), len(body))
+        res = self.colls['PlaylistPayload'].insert({
+            'PlaylistID': playlist_id,
+            'Platform': self.platform,
+            'Etag': etag,
+            'Encoding': 'gzip',
+            'Body': body,
+        })
+        if not res.ok:
+            print_red(
+                '[CachedPlatformApi] Error caching payload '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res}')
+
+    def cached_record(self, playlist_id: str) -> Result:
+        '''
+        Finds the cached Playlist record of the playlist. The cached playlist is revalidated
+        according to the `policy` (see `playlist_info`), and is fetched and cached from the
+        wrapped API if it is not cached, only partially cached, or changed upstream.
+
+        Returns
+        ------
+        - `Ok(record: sqlite3.Row)` with the Playlist record
+        - `Ok(None)` if the playlist was not found
+        - `Err(error)` if the cache could not be read
+        '''
+        playlist_info = self.playlist_info(playlist_id)
+        if playlist_info is None:
+            return Ok(None)
+
+        res = self.cached_info(playlist_id)
+        if not res.ok:
+            return res
+        cached_record = res.value
+        # a playlist cached page by page has no etag until its last page is written
+        if (
+            cached_record is not None
+            and cached_record['Etag'] is not None
+            and cached_record['Etag'] == playlist_info['etag']
+        ):
+            return res
+
+        # cache miss
+        playlist = self.refresh(playlist_id, playlist_info)
+        if playlist is None:
+            return Ok(None)
+
+        res = self.cached_info(playlist_id)
+        if res.ok and res.value is None:
+            return Err(f'Playlist {playlist_id} was fetched but could not be cached')
+        return res
+
+    def evict(self, playlist_id: str):
+        '''Removes the playlist from every cache tier, e.g. if it became private or was deleted'''
+        self.l1.discard((self.platform, playlist_id))
+        self.l1.discard((self.platform, playlist_id, 'payload'))
+        record = self._record(playlist_id)
+
+        try:
+            with self.colls['Playlist'].transaction():
+                res = self.colls['PlaylistPayload'].delete(record)
+                if res.ok:
+                    res = self.colls['PlaylistTracks'].delete(record)
+                if res.ok:
+                    res = self.colls['Playlist'].delete(record)
+        except sqlite3.Error as err:
+            res = Err(err)
+
+        if not res.ok:
+            print_red(
+                '[CachedPlatformApi] Error deleting from cache '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform}): {res}')
+        else:
+            print_green(
+                '[CachedPlatformApi] Successfully deleted from cache '
+                f'(PlaylistID = {playlist_id}, Platform = {self.platform})')
+
+    def cache_stats(self) -> Dict[str, int]:
+        '''Returns a copy of the `stats`'''
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+def cache_all(
+    apis: Dict[str, PlatformApi],
+    colls: CollectionDict,
+    l1: Optional[LruCache] = None,
+    policies: Optional[Dict[str, FreshnessPolicy]] = None,
+) -> Dict[str, CachedPlatformApi]:
+    '''
+    Wraps each of the `apis` in a `CachedPlatformApi` sharing one L1 cache
+
+    Params
+    ------
+    `apis`
+    - The platform APIs by platform name
+    `l1`
+    - The shared L1 cache. A 64 MiB `LruCache` if `None`
+    `policies`
+    - The `FreshnessPolicy` of each platform. `FRESHNESS_POLICIES` if `None`
+    '''
+    if l1 is None:
+        l1 = LruCache()
+    if policies is None:
+        policies = FRESHNESS_POLICIES
+    return {
+        platform: CachedPlatformApi(api, colls, l1, policies.get(platform, DEFAULT_FRESHNESS_POLICY))
+        for platform, api in apis.items()
+    }
+
@@ -0,0 +1,341 @@
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Union
+from debug_utils import print_red
+
+
+class StorageProfile:
+    '''
+    Attributes
+    ------
+    `name`
+      - The name of the profile
+    `journal_mode`
+      - `PRAGMA journal_mode`. `WAL` lets readers run concurrently with a writer
+    `synchronous`
+      - `PRAGMA synchronous`. How often SQLite waits for writes to reach the disk
+    `mmap_size`
+      - `PRAGMA mmap_size`. The number of bytes of the database file to memory-map
+    `cache_size`
+      - `PRAGMA cache_size`. Negative values are the page cache size in KiB
+    `temp_store`
+      - `PRAGMA temp_store`. Where temporary tables and indices are kept
+    `busy_timeout_ms`
+      - `PRAGMA busy_timeout`. How long to wait for a lock before failing with
+        `database is locked`
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        journal_mode: str = 'WAL',
+        synchronous: str = 'NORMAL',
+        mmap_size: int = 0,
+        cache_size: int = -2000,
+        temp_store: str = 'DEFAULT',
+        busy_timeout_ms: int = 5000,
+    ) -> None:
+        self.name = name
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.temp_store = temp_store
+        self.busy_timeout_ms = busy_timeout_ms
+
+    def apply(self, conn: sqlite3.Connection):
+        '''Configures the connection `conn` with the profile's pragmas'''
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)};')
+        try:
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode};')
+        except sqlite3.OperationalError as err:
+            # the journal mode is persisted in the database file, so another connection
+            # holding a lock only means this connection keeps the current mode
+            print_red(f'[StorageProfile] Could not set journal_mode = {self.journal_mode}: {err}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous};')
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)};')
+        conn.execute(f'PRAGMA cache_size = {int(self.cache_size)};')
+        conn.execute(f'PRAGMA temp_store = {self.temp_store};')
+
+    def __repr__(self) -> str:
+        return (
+            f'StorageProfile({self.name}, journal_mode={self.journal_mode}, '
+            f'synchronous={self.synchronous}, mmap_size={self.mmap_size}, '
+            f'cache_size={self.cache_size}, temp_store={self.temp_store}, '
+            f'busy_timeout_ms={self.busy_timeout_ms})'
+        )
+
+
+STORAGE_PROFILES: Dict[str, StorageProfile] = {
+    # survives power loss: every commit waits for the WAL to be synced
+    'durable': StorageProfile(
+        'durable',
+        synchronous='FULL',
+        cache_size=-8000,
+        busy_timeout_ms=10000,
+    ),
+    # the last commits may be lost on power loss, but never corrupts the database
+    'balanced': StorageProfile(
+        'balanced',
+        synchronous='NORMAL',
+        mmap_size=64 * 1024 * 1024,
+        cache_size=-16000,
+        temp_store='MEMORY',
+        busy_timeout_ms=5000,
+    ),
+    # the cache can be rebuilt from the platform APIs, so never wait for the disk
+    'fast': StorageProfile(
+        'fast',
+        synchronous='OFF',
+        mmap_size=256 * 1024 * 1024,
+        cache_size=-64000,
+        temp_store='MEMORY',
+        busy_timeout_ms=2000,
+    ),
+}
+DEFAULT_PROFILE = 'balanced'
+
+
+def get_profile(profile: Union[StorageProfile, str]) -> StorageProfile:
+    '''
+    Returns
+    ------
+    The `StorageProfile` named `profile`, or `profile` itself if it is a `StorageProfile`.
+    Raises a `ValueError` if there is no profile with that name
+    '''
+    if isinstance(profile, StorageProfile):
+        return profile
+
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(
+            f'Unknown storage profile {profile}. Expected one of {", ".join(STORAGE_PROFILES)}')
+    return STORAGE_PROFILES[profile]
+
+
+class ConnectionPool:
+    '''
+    A thread-aware pool of SQLite connections to a single database file. Each thread that
+    requests a connection gets its own long-lived connection, which is reused for every
+    query that thread executes instead of reconnecting each time. When a thread exits, its
+    connection is returned to the pool to be reused by the next new thread.
+
+    Attributes
+    ------
+    `db_path`
+      - The path to the database
+    `cached_statements`
+      - The size of each connection's prepared statement cache
+    `health_check_secs`
+      - A reused connection is checked with `SELECT 1` if it has not been checked for
+        this many seconds. Broken connections are replaced with a new connection
+    `max_idle`
+      - The maximum number of connections of exited threads kept open for reuse
+    `profile`
+      - The `StorageProfile` applied to each connection when it is opened
+    '''
+
+    def __init__(
+        self,
+        db_path: str,
+        cached_statements: int = 256,
+        health_check_secs: float = 30,
+        max_idle: int = 8,
+        profile: Union[StorageProfile, str] = DEFAULT_PROFILE,
+    ) -> None:
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.health_check_secs = health_check_secs
+        self.max_idle = max_idle
+        self.profile = get_profile(profile)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._idle: List[sqlite3.Connection] = []
+
+    def _open(self) -> sqlite3.Connection:
+        # connections are only used by one thread at a time, but are handed to a new
+        # thread once their thread exits and may be closed by `close_all()`
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            timeout=self.profile.busy_timeout_ms / 1000,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON;')
+        self.profile.apply(conn)
+
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        '''Called once the thread owning `conn` has exited'''
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if conn in self._connections and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def _discard(self, conn: sqlite3.Connection):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            if conn in self._idle:
+                self._idle.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _is_healthy(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1;').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        '''
+        Returns
+        ------
+        The calling thread's connection, opening a new one if the thread has none or if its
+        connection failed the health check
+        '''
+        conn = getattr(self._local, 'conn', None)
+        now = time.monotonic()
+
+        if conn is not None and now - self._local.checked_at >= self.health_check_secs:
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+            self._local.checked_at = now
+
+        while conn is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+
+            if conn is None:
+                conn = self._open()
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                conn = None
+                continue
+
+            self._local.conn = conn
+            self._local.checked_at = now
+            # hand the connection back to the pool when this thread exits
+            weakref.finalize(threading.current_thread(), self._release, conn)
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        '''
+        Context manager yielding the calling thread's connection. Rolls back any uncommitted
+        changes if an exception is raised, unless inside a `transaction()`, which decides
+        whether to roll back itself
+        '''
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+
+    def in_transaction(self) -> bool:
+        '''
+        Returns
+        ------
+        `True` if the calling thread is inside a `transaction()`, `False` otherwise
+        '''
+        return getattr(self._local, 'transaction_depth', 0) > 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        '''
+        Context manager yielding the calling thread's connection inside a single write
+        transaction, committed once the outermost `transaction()` exits and rolled back if
+        an exception is raised. Nested calls join the enclosing transaction
+        '''
+        conn = self.acquire()
+        if self.in_transaction():
+            self._local.transaction_depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.transaction_depth -= 1
+            return
+
+        # finish any implicit transaction left open by a `commit=False` statement
+        if conn.in_transaction:
+            conn.commit()
+        # take the write lock up front so the transaction cannot fail halfway through
+        # because another writer got there first
+        conn.execute('BEGIN IMMEDIATE;')
+        self._local.transaction_depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        finally:
+            self._local.transaction_depth = 0
+
+    def set_profile(self, profile: Union[StorageProfile, str]):
+        '''
+        Sets the `StorageProfile` of the pool. Open connections are closed so that every
+        connection is reopened with the new profile
+        '''
+        self.profile = get_profile(profile)
+        self.close_all()
+
+    def close_all(self):
+        '''Closes the connections of every thread. Threads reconnect on their next query'''
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+            self._idle = []
+
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        # forget every thread's connection so each thread reconnects on its next query
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return (
+            f'ConnectionPool({self.db_path}, connections={len(self._connections)}, '
+            f'idle={len(self._idle)}, profile={self.profile.name})'
+        )
+
+
+__pools: Dict[str, ConnectionPool] = {}
+__pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str) -> ConnectionPool:
+    '''
+    Returns
+    ------
+    The `ConnectionPool` shared by every collection using the database `db_path`
+    '''
+    with __pools_lock:
+        pool = __pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            __pools[db_path] = pool
+        return pool
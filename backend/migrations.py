@@ -0,0 +1,126 @@
+'''
+Versioned schema migrations for the cache database.
+
+The schema version of a database is stored in `PRAGMA user_version`. `migrate()` applies every
+migration newer than that version, in order, each in its own transaction. To change the schema,
+append a new `Migration` to `MIGRATIONS` instead of editing an existing one, so that existing
+`music_cache.db` files are evolved in place.
+'''
+import sqlite3
+from contextlib import closing
+from typing import List, Optional
+from .storage import SCHEMA_PATH
+from debug_utils import print_blue
+
+
+class Migration:
+    '''
+    Attributes
+    ------
+    `version`
+      - The schema version after the migration is applied. Versions start at 1 and increase by 1
+    `description`
+      - What the migration changes
+    `sql`
+      - The SQL script of the migration
+    '''
+
+    def __init__(self, version: int, description: str, sql: str) -> None:
+        self.version = version
+        self.description = description
+        self.sql = sql
+
+    def __repr__(self) -> str:
+        return f'Migration({self.version}, {self.description})'
+
+
+def _read_schema() -> str:
+    with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+MIGRATIONS: List[Migration] = [
+    # tables are created with IF NOT EXISTS, so databases created before migrations existed
+    # (user_version 0) are brought up to version 1 without changes
+    Migration(1, 'Create the tables from schema.sql', _read_schema()),
+    Migration(
+        2,
+        'Index PlaylistTracks by playlist and position',
+        '''
+        -- covers PlaylistTracksCollection.find, which filters by playlist and joins Track in
+        -- order of Position, so it no longer needs a temporary b-tree to sort the tracks
+        CREATE INDEX IF NOT EXISTS PlaylistTracksByPosition
+        ON PlaylistTracks (PlaylistID, Platform, Position, TrackID);
+        ''',
+    ),
+    Migration(
+        3,
+        'Store the compressed response body of each cached playlist',
+        '''
+        CREATE TABLE IF NOT EXISTS PlaylistPayload (
+            PlaylistID TEXT,
+            Platform TEXT,
+            Etag TEXT,       -- the etag of the playlist the body was serialized from
+            Encoding TEXT,   -- the Content-Encoding of Body e.g. gzip
+            Body BLOB,
+            PRIMARY KEY (PlaylistID, Platform),
+            FOREIGN KEY (PlaylistID, Platform) REFERENCES Playlist(PlaylistID, Platform)
+                ON DELETE CASCADE
+        );
+        ''',
+    ),
+    Migration(
+        4,
+        'Record when each cached playlist was last validated',
+        '''
+        -- the unix time the cached Etag was last checked against the platform's etag. NULL
+        -- for playlists cached before this migration, which are revalidated on the next read
+        ALTER TABLE Playlist ADD COLUMN ValidatedAt REAL;
+        ''',
+    ),
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    '''Returns the schema version of the database connected to by `conn`'''
+    return conn.execute('PRAGMA user_version;').fetchone()[0]
+
+
+def migrate(db_path: str, target_version: Optional[int] = None) -> int:
+    '''
+    Applies every migration newer than the database's schema version
+
+    Params
+    ------
+    `db_path`
+    - The path to the database
+    `target_version`
+    - The version to migrate up to. The latest version by default
+
+    Returns
+    ------
+    The schema version of the database after migrating
+    '''
+    if target_version is None:
+        target_version = MIGRATIONS[-1].version
+
+    # the connection's context manager only commits, so it is closed explicitly
+    with closing(sqlite3.connect(db_path)) as conn:
+        version = schema_version(conn)
+
+        for migration in MIGRATIONS:
+            if migration.version <= version or migration.version > target_version:
+                continue
+
+            print_blue(f'[migrate] Migrating {db_path} to version {migration.version}: {migration.description}')
+            # PRAGMA user_version is part of the transaction, so a failed migration leaves
+            # the database at the previous version
+            conn.executescript(f'''
+                BEGIN;
+                {migration.sql}
+                PRAGMA user_version = {int(migration.version)};
+                COMMIT;
+            ''')
+            version = migration.version
+
+    return version
@@ -0,0 +1,115 @@
+from typing import List, Sequence
+
+
+class PlaylistDiff:
+    '''
+    The changes needed to turn a cached playlist's track sequence into a newly fetched one.
+    Tracks in the common prefix and suffix of both sequences are kept. Only the tracks
+    between them are deleted and inserted, and the suffix is shifted by `shift` positions if
+    the playlist changed length.
+
+    Attributes
+    ------
+    `start`
+    - The position of the first track that differs (the length of the common prefix)
+    `old_end`
+    - The position (in the cached sequence) where the common suffix starts
+    `new_end`
+    - The position (in the new sequence) where the common suffix starts
+    `suffix_length`
+    - The number of tracks in the common suffix
+    `inserted_track_ids`
+    - The track IDs to insert at positions `start` to `new_end`
+    '''
+
+    def __init__(
+        self,
+        start: int,
+        old_end: int,
+        new_end: int,
+        suffix_length: int,
+        inserted_track_ids: List[str],
+    ) -> None:
+        self.start = start
+        self.old_end = old_end
+        self.new_end = new_end
+        self.suffix_length = suffix_length
+        self.inserted_track_ids = inserted_track_ids
+
+    @property
+    def shift(self) -> int:
+        '''The number of positions the common suffix moves by'''
+        return self.new_end - self.old_end
+
+    @property
+    def deleted(self) -> int:
+        '''The number of PlaylistTracks rows deleted'''
+        return self.old_end - self.start
+
+    @property
+    def inserted(self) -> int:
+        '''The number of PlaylistTracks rows inserted'''
+        return self.new_end - self.start
+
+    @property
+    def shifted(self) -> int:
+        '''The number of PlaylistTracks rows whose position changes'''
+        return self.suffix_length if self.shift != 0 else 0
+
+    @property
+    def rows_touched(self) -> int:
+        '''The number of PlaylistTracks rows written'''
+        return self.deleted + self.inserted + self.shifted
+
+    def is_empty(self) -> bool:
+        '''`True` if both sequences are the same'''
+        return self.rows_touched == 0
+
+    def __repr__(self) -> str:
+        return (
+            f'PlaylistDiff(deleted={self.deleted}, inserted={self.inserted}, '
+            f'shifted={self.shifted}, rows_touched={self.rows_touched})'
+        )
+
+
+def diff_track_ids(old_track_ids: Sequence[str], new_track_ids: Sequence[str]) -> PlaylistDiff:
+    '''
+    Params
+    ------
+    `old_track_ids`
+    - The cached track IDs, in order of position
+    `new_track_ids`
+    - The fetched track IDs, in order of position
+
+    Returns
+    ------
+    The `PlaylistDiff` from `old_track_ids` to `new_track_ids`. Tracks added to or removed
+    from the start or end of a playlist, or edited in one place, touch only the rows that
+    changed. Tracks moved from one end of the playlist to the other rewrite every row in
+    between.
+    '''
+    old_len = len(old_track_ids)
+    new_len = len(new_track_ids)
+    max_common = min(old_len, new_len)
+
+    start = 0
+    while start < max_common and old_track_ids[start] == new_track_ids[start]:
+        start += 1
+
+    # the suffix cannot overlap the prefix
+    suffix_length = 0
+    while (
+        suffix_length < max_common - start
+        and old_track_ids[old_len - suffix_length - 1] == new_track_ids[new_len - suffix_length - 1]
+    ):
+        suffix_length += 1
+
+    old_end = old_len - suffix_length
+    new_end = new_len - suffix_length
+    return PlaylistDiff(
+        start=start,
+        old_end=old_end,
+        new_end=new_end,
+        suffix_length=suffix_length,
+        inserted_track_ids=list(new_track_ids[start:new_end]),
+    )
@@ -0,0 +1,167 @@
+'''
+Server-side shuffling of playlists without storing a shuffled copy of the playlist.
+
+A `FeistelPermutation` maps every index in `[0, length)` to a unique shuffled index in
+`[0, length)` computed on demand from a seed, so a shuffle session only needs to store its
+seed and how far through the permutation it is.
+'''
+import bisect
+import hashlib
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+class FeistelPermutation:
+    '''
+    A pseudo-random bijection over `[0, length)`, determined by `seed`.
+
+    A balanced Feistel network permutes the smallest power of 4 that is at least `length`.
+    Indices outside `[0, length)` are fed back through the network ("cycle walking") until they
+    land inside it, which takes fewer than 4 rounds on average.
+    '''
+
+    def __init__(self, length: int, seed: int, rounds: int = 4) -> None:
+        self.length = length
+        self.seed = seed
+        self.rounds = rounds
+        half_bits = 1
+        while 1 << (2 * half_bits) < length:
+            half_bits += 1
+        self._half_bits = half_bits
+        self._half_mask = (1 << half_bits) - 1
+        self._key = seed.to_bytes(16, 'big', signed=True)
+
+    def _round(self, round_number: int, value: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(8, 'big'),
+            digest_size=8,
+            key=self._key,
+            salt=round_number.to_bytes(16, 'big'),
+        ).digest()
+        return int.from_bytes(digest, 'big') & self._half_mask
+
+    def _encrypt(self, index: int) -> int:
+        left = index >> self._half_bits
+        right = index & self._half_mask
+        for round_number in range(self.rounds):
+            left, right = right, left ^ self._round(round_number, right)
+        return (left << self._half_bits) | right
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.length:
+            raise IndexError(f'index {index} out of range for length {self.length}')
+
+        shuffled = self._encrypt(index)
+        while shuffled >= self.length:
+            shuffled = self._encrypt(shuffled)
+        return shuffled
+
+    def __len__(self) -> int:
+        return self.length
+
+
+class ShuffleSession:
+    '''
+    A shuffled cursor over the tracks of one or more playlists. The playlists are treated as
+    one sequence of `length` tracks, and the session stores only its `seed` and `offset` into
+    the shuffled sequence.
+
+    Attributes
+    ------
+    `playlists`
+    - The `(platform, playlist_id, length)` of each playlist, when the session was created
+    `seed`
+    - The seed of the permutation
+    `offset`
+    - The number of tracks already returned
+    '''
+
+    def __init__(self, playlists: List[Tuple[str, str, int]], seed: int, offset: int = 0) -> None:
+        self.playlists = playlists
+        self.seed = seed
+        self.offset = offset
+        self._starts = []
+        length = 0
+        for _, _, playlist_length in playlists:
+            self._starts.append(length)
+            length += playlist_length
+        self.length = length
+        self._permutation = FeistelPermutation(length, seed)
+        self._lock = threading.Lock()
+
+    def next(self, n: int) -> List[Tuple[str, str, int]]:
+        '''
+        Advances the cursor by up to `n` tracks
+
+        Returns
+        ------
+        The `(platform, playlist_id, position)` of each of the next tracks. Empty once every
+        track has been returned
+        '''
+        with self._lock:
+            start = self.offset
+            end = min(start + n, self.length)
+            self.offset = end
+
+        tracks = []
+        for index in range(start, end):
+            shuffled = self._permutation[index]
+            # the playlist containing the shuffled index
+            i = bisect.bisect_right(self._starts, shuffled) - 1
+            platform, playlist_id, _ = self.playlists[i]
+            tracks.append((platform, playlist_id, shuffled - self._starts[i]))
+        return tracks
+
+    def is_done(self) -> bool:
+        '''`True` if every track has been returned'''
+        return self.offset >= self.length
+
+    def __repr__(self) -> str:
+        return f'ShuffleSession(seed={self.seed}, offset={self.offset}, length={self.length})'
+
+
+class ShuffleSessionStore:
+    '''
+    Thread-safe store of `ShuffleSession`s by session ID. The least recently used sessions are
+    dropped once there are more than `max_sessions`
+    '''
+
+    def __init__(self, max_sessions: int = 10000) -> None:
+        self.max_sessions = max_sessions
+        self._sessions: 'OrderedDict[str, ShuffleSession]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, playlists: List[Tuple[str, str, int]], seed: Optional[int] = None) -> Tuple[str, ShuffleSession]:
+        '''
+        Params
+        ------
+        `playlists`
+        - The `(platform, playlist_id, length)` of each playlist to shuffle
+        `seed`
+        - The seed of the shuffle. Random if `None`
+
+        Returns
+        ------
+        The new session's ID and the `ShuffleSession`
+        '''
+        if seed is None:
+            seed = random.getrandbits(63)
+
+        session = ShuffleSession(playlists, seed)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id, session
+
+    def get(self, session_id: str) -> Optional[ShuffleSession]:
+        '''Returns the session with ID `session_id`, or `None` if it does not exist'''
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
@@ -0,0 +1,97 @@
+'''
+Coalesces concurrent calls for the same key into one call.
+
+While a call for a key is in flight, other callers with the same key wait for it to finish and
+share its result instead of making the same (e.g. upstream API) call again.
+'''
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    '''A call in flight. Followers wait on `done` for the leader's `result` or `error`'''
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    '''
+    Thread-safe keyed call coalescing
+
+    ```
+    flight = SingleFlight()
+    # concurrent calls with the same key make only one fetch_playlist call
+    playlist, shared = flight.do(('YOUTUBE', playlist_id), lambda: fetch_playlist(playlist_id))
+    ```
+
+    Attributes
+    ------
+    `stats`
+    - `calls`: the number of calls made by leaders
+    - `shared`: the number of followers which shared a leader's result, i.e. calls saved
+    '''
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, int] = {'calls': 0, 'shared': 0}
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        '''
+        Calls `fn`, unless a call for `key` is already in flight, in which case waits for that
+        call to finish instead
+
+        Params
+        ------
+        `key`
+        - Identifies the call e.g. `(platform, playlist_id)`
+        `fn`
+        - Makes the call. Exceptions raised by `fn` are raised to the leader and every follower
+
+        Returns
+        ------
+        The result of the call, and whether the result came from another caller's call (`True`
+        for followers, so each `True` is a call saved)
+        '''
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats['shared'] += 1
+                is_leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.stats['calls'] += 1
+                is_leader = True
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            # later callers make a new call rather than reusing this result
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        '''The number of calls in flight'''
+        with self._lock:
+            return len(self._calls)
+
+    def flight_stats(self) -> Dict[str, int]:
+        '''Returns a copy of the `stats`'''
+        with self._lock:
+            return dict(self.stats)
@@ -1,7 +1,11 @@
 import os as __os
+import json
 import sqlite3
-from typing import Any, List, Optional, Union, Callable
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple, Union, Callable
 from .storage_result import Ok, Err, Result
+from .connection import ConnectionPool, get_pool
+from .playlist_diff import PlaylistDiff, diff_track_ids
 
 
 BACKEND_FOLDER = __os.path.dirname(__os.path.realpath(__file__))
@@ -9,6 +13,22 @@ DB_PATH = __os.path.join(BACKEND_FOLDER, 'music_cache.db')
 SCHEMA_PATH = __os.path.join(BACKEND_FOLDER, 'schema.sql')
 
 
+# inserts a Playlist record, or updates it if the playlist is already cached
+UPSERT_PLAYLIST_SQL = '''
+    INSERT INTO Playlist (PlaylistID, Title, Owner, Description, Thumbnail, Length, Etag, Platform, ValidatedAt)
+    VALUES (:PlaylistID, :Title, :Owner, :Description, :Thumbnail, :Length, :Etag, :Platform, :ValidatedAt)
+    ON CONFLICT (PlaylistID, Platform) DO UPDATE
+    SET
+        Title = excluded.Title,
+        Owner = excluded.Owner,
+        Description = excluded.Description,
+        Thumbnail = excluded.Thumbnail,
+        Length = excluded.Length,
+        Etag = excluded.Etag,
+        ValidatedAt = excluded.ValidatedAt;
+'''
+
+
 class Column:
     '''
     Attributes
@@ -33,6 +53,21 @@ class Column:
         return self.column_name
 
 
+def iter_cursor(cur: sqlite3.Cursor, batch_size: int = 500) -> Iterator[sqlite3.Row]:
+    '''
+    Yields the rows of the cursor `cur`, fetching `batch_size` rows at a time. Closes the
+    cursor once every row has been yielded or the generator is closed
+    '''
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if len(rows) == 0:
+                break
+            yield from rows
+    finally:
+        cur.close()
+
+
 class Collection:
     '''
     Attributes
@@ -41,11 +76,15 @@ class Collection:
       - Class attribute. Specifies the table's `Column`s
     `db_path`
       - The path to database. `DB_PATH` by default.
+    `pool`
+      - The `ConnectionPool` to execute queries with. Collections using the same `db_path`
+        share the same pool
     '''
     columns: List[Column] = []
 
     def __init__(self, db_path: str = DB_PATH) -> None:
         self.db_path = db_path
+        self.pool: ConnectionPool = get_pool(db_path)
 
     @classmethod
     def validate(cls, record: dict) -> Result:
@@ -96,17 +135,16 @@ class Collection:
         `values`
           - The parameterised values as a `list` or `dict`
         `commit`
-          - Default `True`. Whether to commit the transaction
+          - Default `True`. Whether to commit the transaction. Inside a `transaction()`, the
+            commit is left to the end of the transaction
         `cursor_callback`
           - The callback funcion to decide what to be returned from the cursor
         '''
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.pool.connection() as conn:
                 cur = conn.cursor()
-                cur.execute('PRAGMA foreign_keys = ON;')
                 cur.execute(sql, values)
-                if commit:
+                if commit and not self.pool.in_transaction():
                     conn.commit()
 
                 if cursor_callback is not None:
@@ -124,12 +162,10 @@ class Collection:
         cursor_callback: Optional[Callable[[sqlite3.Cursor], Any]] = None,
     ) -> Result:
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.pool.connection() as conn:
                 cur = conn.cursor()
-                cur.execute('PRAGMA foreign_keys = ON;')
                 cur.executemany(sql, seq_of_values)
-                if commit:
+                if commit and not self.pool.in_transaction():
                     conn.commit()
 
                 if cursor_callback is not None:
@@ -139,6 +175,22 @@ class Collection:
             return Err(err)
         return Ok()
 
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        '''
+        Groups every statement executed by any collection sharing this collection's database
+        (on the calling thread) into one transaction with a single commit. Rolled back if an
+        exception is raised.
+
+        ```
+        with colls['Playlist'].transaction():
+            colls['Playlist'].delete(...)
+            colls['PlaylistTracks'].insertmany(...)
+        ```
+        '''
+        with self.pool.transaction() as conn:
+            yield conn
+
     def insert(self, record: dict) -> Result:
         '''
         Params
@@ -188,6 +240,8 @@ class PlaylistCollection(Collection):
         Column('Length'),
         Column('Etag', is_required=False),
         Column('Platform'),
+        # the unix time the cached Etag was last checked against the platform's etag
+        Column('ValidatedAt', is_required=False),
     ]
 
     def insert(self, record: dict) -> Result:
@@ -196,7 +250,7 @@ class PlaylistCollection(Collection):
         ------
         `record`
         - The record to insert. Must have exactly the `columns`:
-            - PlaylistID, Title, Owner, Description, Thumbnail, Length, Etag, Platform
+            - PlaylistID, Title, Owner, Description, Thumbnail, Length, Etag, Platform, ValidatedAt
 
         Returns
         ------
@@ -210,11 +264,42 @@ class PlaylistCollection(Collection):
             return validation_result
 
         result = self.try_execute('''
-            INSERT INTO Playlist (PlaylistID, Title, Owner, Description, Thumbnail, Length, Etag, Platform)
-            VALUES (:PlaylistID, :Title, :Owner, :Description, :Thumbnail, :Length, :Etag, :Platform)
+            INSERT INTO Playlist (PlaylistID, Title, Owner, Description, Thumbnail, Length, Etag, Platform, ValidatedAt)
+            VALUES (:PlaylistID, :Title, :Owner, :Description, :Thumbnail, :Length, :Etag, :Platform, :ValidatedAt)
         ''', record)
         return result
 
+    def mark_validated(self, record: dict, etag: str, validated_at: float) -> Result:
+        '''
+        Sets the ValidatedAt of the cached playlist, if its Etag is still `etag`
+
+        Params
+        ------
+        `record`
+          - The playlist to update. Only columns PlaylistID and Platform are used and must be
+            provided
+        `etag`
+          - The etag the playlist was validated against
+        `validated_at`
+          - The unix time the etag was validated
+
+        Returns
+        ------
+        - `Err(...)` if the record is invalid or the update fails
+        - `Ok(updated: bool)`, `False` if the playlist is not cached or its etag changed
+        '''
+        playlist_id = record.get('PlaylistID')
+        platform = record.get('Platform')
+        if playlist_id is None or platform is None:
+            return Err('Invalid filter (record). Both PlaylistID and Platform columns are required')
+
+        result = self.try_execute('''
+            UPDATE Playlist
+            SET ValidatedAt = ?
+            WHERE PlaylistID = ? AND Platform = ? AND Etag = ?;
+        ''', (validated_at, playlist_id, platform, etag), cursor_callback=lambda cur: cur.rowcount > 0)
+        return result
+
     def delete(self, record: Union[dict, str]) -> Result:
         '''
         Params
@@ -460,6 +545,32 @@ class TrackCollection(Collection):
         ''', (track_id, platform), commit=False, cursor_callback=lambda cur: cur.fetchall())
         return result
 
+    def find_many(self, keys: List[Tuple[str, str]]) -> Result:
+        '''
+        Params
+        ------
+        `keys`
+          - The `(TrackID, Platform)` of each track to find
+
+        Returns
+        ------
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(records)` with the record of each of the tracks found, in no particular order.
+          Tracks not found are ignored
+        '''
+        if len(keys) == 0:
+            return Ok([])
+
+        # the keys are passed as one JSON array parameter so any number of them can be looked up
+        # in one query, each by the primary key
+        result = self.try_execute('''
+            SELECT Track.* FROM json_each(?) AS Key
+            JOIN Track ON
+                Track.TrackID = json_extract(Key.value, '$[0]') AND
+                Track.Platform = json_extract(Key.value, '$[1]');
+        ''', (json.dumps(keys),), commit=False, cursor_callback=lambda cur: cur.fetchall())
+        return result
+
     def update(self, old_record: Union[dict, str], new_record: dict) -> Result:
         return super().update(old_record, new_record)
 
@@ -476,6 +587,31 @@ class PlaylistTracksCollection(Collection):
         Column('Position'),
     ]
 
+    # PlaylistTracks joined with its Playlist and Track. Filtered by the WHERE clause appended
+    # by each query
+    joined_select_sql = '''
+        SELECT
+            PlaylistTracks.Position,
+
+            Playlist.PlaylistID,                           Playlist.Platform AS "Platform",
+            Playlist.Title AS "PlaylistTitle",             Playlist.Owner AS "PlaylistOwner",
+            Playlist.Description AS "PlaylistDescription", Playlist.Thumbnail AS "PlaylistThumbnail",
+            Playlist.Length,                               Playlist.Etag,
+
+            Track.TrackID,                                 Track.Platform AS "TrackPlatform",
+            Track.Title AS "TrackTitle",                   Track.Owner AS "TrackOwner",
+            Track.Thumbnail AS "TrackThumbnail",           Track.DurationSeconds
+        FROM PlaylistTracks
+        INNER JOIN Playlist
+        ON
+            Playlist.PlaylistID = PlaylistTracks.PlaylistID
+            AND Playlist.Platform = PlaylistTracks.Platform
+        INNER JOIN Track
+        ON
+            Track.TrackID = PlaylistTracks.TrackID
+            AND Track.Platform = PlaylistTracks.Platform
+    '''
+
     def insert(self, record: dict):
         '''
         Params
@@ -523,6 +659,195 @@ class PlaylistTracksCollection(Collection):
         ''', {'PlaylistID': playlist_id, 'Platform': platform})
         return result
 
+    def replace_playlist(self, playlist_record: dict, track_records: List[dict]) -> Result:
+        '''
+        Replaces the cached playlist and all of its tracks in a single transaction, so readers
+        see either the old or the new playlist but never a partially written one. Only the
+        PlaylistTracks rows that differ from the cached playlist are written (see
+        `diff_track_ids`).
+
+        Params
+        ------
+        `playlist_record`
+        - The record to insert into the Playlist table, with the `columns` of
+          `PlaylistCollection`. `Length` is set to the number of `track_records`
+        `track_records`
+        - The records to insert into the Track table, with the `columns` of `TrackCollection`,
+          in order of their position in the playlist
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if `playlist_record` is invalid
+        - `Err(sqlite3.Error)` if the replacement fails. Nothing is replaced
+        - `Ok(PlaylistDiff)` if the replacement is successful, with the rows touched
+        '''
+        playlist_record = {**playlist_record, 'Length': len(track_records)}
+        validation_result = PlaylistCollection.validate(playlist_record)
+        if not validation_result.ok:
+            return validation_result
+
+        playlist_id = playlist_record['PlaylistID']
+        platform = playlist_record['Platform']
+        new_track_ids = [track_record['TrackID'] for track_record in track_records]
+
+        try:
+            with self.transaction() as conn:
+                cur = conn.execute('''
+                    SELECT Position, TrackID FROM PlaylistTracks
+                    WHERE PlaylistID = ? AND Platform = ?
+                    ORDER BY Position ASC;
+                ''', (playlist_id, platform))
+                cached_rows = cur.fetchall()
+                old_track_ids = [row['TrackID'] for row in cached_rows]
+
+                # positions are expected to be 0..n-1. Otherwise rewrite the whole playlist
+                if len(cached_rows) > 0 and cached_rows[-1]['Position'] != len(cached_rows) - 1:
+                    conn.execute('''
+                        DELETE FROM PlaylistTracks
+                        WHERE PlaylistID = ? AND Platform = ?;
+                    ''', (playlist_id, platform))
+                    old_track_ids = []
+
+                diff = diff_track_ids(old_track_ids, new_track_ids)
+
+                conn.execute(UPSERT_PLAYLIST_SQL, playlist_record)
+
+                if diff.deleted > 0:
+                    conn.execute('''
+                        DELETE FROM PlaylistTracks
+                        WHERE
+                            PlaylistID = ? AND Platform = ? AND
+                            Position >= ? AND Position < ?;
+                    ''', (playlist_id, platform, diff.start, diff.old_end))
+
+                if diff.shifted > 0:
+                    # shift through negative positions so that no row collides with a row that
+                    # has not been shifted yet
+                    conn.execute('''
+                        UPDATE PlaylistTracks
+                        SET Position = -1 - (Position + ?)
+                        WHERE PlaylistID = ? AND Platform = ? AND Position >= ?;
+                    ''', (diff.shift, playlist_id, platform, diff.old_end))
+                    conn.execute('''
+                        UPDATE PlaylistTracks
+                        SET Position = -1 - Position
+                        WHERE PlaylistID = ? AND Platform = ? AND Position < 0;
+                    ''', (playlist_id, platform))
+
+                if diff.inserted > 0:
+                    conn.executemany('''
+                        INSERT OR IGNORE INTO Track (TrackID, Platform, Title, Owner, Thumbnail, DurationSeconds)
+                        VALUES (:TrackID, :Platform, :Title, :Owner, :Thumbnail, :DurationSeconds)
+                    ''', track_records[diff.start:diff.new_end])
+                    conn.executemany('''
+                        INSERT INTO PlaylistTracks (PlaylistID, TrackID, Platform, Position)
+                        VALUES (?, ?, ?, ?)
+                    ''', (
+                        (playlist_id, track_id, platform, diff.start + i)
+                        for i, track_id in enumerate(diff.inserted_track_ids)
+                    ))
+        except sqlite3.Error as err:
+            return Err(err)
+        return Ok(diff)
+
+    def write_page(self, playlist_record: dict, track_records: List[dict], start_position: int) -> Result:
+        '''
+        Writes one page of a playlist being fetched page by page, replacing the cached tracks
+        at positions `start_position` to `start_position + len(track_records) - 1`. The
+        Playlist record is written without an `Etag` until `finish_pages()`, so a partially
+        written playlist is never served as up to date.
+
+        Params
+        ------
+        `playlist_record`
+        - The record to insert into the Playlist table, with the `columns` of
+          `PlaylistCollection`. `Etag` and `ValidatedAt` are ignored and `Length` is set to the
+          number of tracks written so far
+        `track_records`
+        - The records to insert into the Track table, with the `columns` of `TrackCollection`,
+          in order of their position in the page
+        `start_position`
+        - The position of the first track of the page in the playlist
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if `playlist_record` is invalid
+        - `Err(sqlite3.Error)` if the page could not be written. Nothing is written
+        - `Ok(None)` if the page was written
+        '''
+        end_position = start_position + len(track_records)
+        playlist_record = {
+            **playlist_record,
+            'Length': end_position,
+            'Etag': None,
+            'ValidatedAt': None,
+        }
+        validation_result = PlaylistCollection.validate(playlist_record)
+        if not validation_result.ok:
+            return validation_result
+
+        playlist_id = playlist_record['PlaylistID']
+        platform = playlist_record['Platform']
+
+        try:
+            with self.transaction() as conn:
+                conn.execute(UPSERT_PLAYLIST_SQL, playlist_record)
+                conn.execute('''
+                    DELETE FROM PlaylistTracks
+                    WHERE
+                        PlaylistID = ? AND Platform = ? AND
+                        Position >= ? AND Position < ?;
+                ''', (playlist_id, platform, start_position, end_position))
+                conn.executemany('''
+                    INSERT OR IGNORE INTO Track (TrackID, Platform, Title, Owner, Thumbnail, DurationSeconds)
+                    VALUES (:TrackID, :Platform, :Title, :Owner, :Thumbnail, :DurationSeconds)
+                ''', track_records)
+                conn.executemany('''
+                    INSERT INTO PlaylistTracks (PlaylistID, TrackID, Platform, Position)
+                    VALUES (?, ?, ?, ?)
+                ''', (
+                    (playlist_id, track_record['TrackID'], platform, start_position + i)
+                    for i, track_record in enumerate(track_records)
+                ))
+        except sqlite3.Error as err:
+            return Err(err)
+        return Ok()
+
+    def finish_pages(self, playlist_record: dict, length: int) -> Result:
+        '''
+        Completes a playlist written with `write_page()`: removes the cached tracks after the
+        last page and writes the Playlist record with its `Etag`
+
+        Params
+        ------
+        `playlist_record`
+        - The record to insert into the Playlist table, with the `columns` of
+          `PlaylistCollection`. `Length` is set to `length`
+        `length`
+        - The number of tracks written
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if `playlist_record` is invalid
+        - `Err(sqlite3.Error)` if the playlist could not be completed
+        - `Ok(None)` if the playlist was completed
+        '''
+        playlist_record = {**playlist_record, 'Length': length}
+        validation_result = PlaylistCollection.validate(playlist_record)
+        if not validation_result.ok:
+            return validation_result
+
+        try:
+            with self.transaction() as conn:
+                conn.execute('''
+                    DELETE FROM PlaylistTracks
+                    WHERE PlaylistID = ? AND Platform = ? AND Position >= ?;
+                ''', (playlist_record['PlaylistID'], playlist_record['Platform'], length))
+                conn.execute(UPSERT_PLAYLIST_SQL, playlist_record)
+        except sqlite3.Error as err:
+            return Err(err)
+        return Ok()
+
     def delete(self, record: Union[dict, str]) -> Result:
         '''
         Params
@@ -576,6 +901,225 @@ class PlaylistTracksCollection(Collection):
                 'SELECT * FROM PlaylistTracks;', (), commit=False, cursor_callback=lambda cur: cur.fetchall())
             return result
 
+        filter_result = self._playlist_filter(record)
+        if not filter_result.ok:
+            return filter_result
+
+        result = self.try_execute(
+            self.joined_select_sql + '''
+            WHERE PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ?
+            ORDER BY Position ASC;
+        ''', filter_result.value, commit=False, cursor_callback=lambda cur: cur.fetchall())
+        return result
+
+    def iter_find(self, record: dict, batch_size: int = 500) -> Result:
+        '''
+        Like `find`, but streams the records from the open cursor `batch_size` rows at a time
+        instead of fetching them all into a list, so memory use does not grow with the length
+        of the playlist.
+
+        Params
+        ------
+        `record`
+          - The filter to match by. PlaylistID and Platform must be provided
+        `batch_size`
+          - The number of rows fetched from the cursor at a time
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(records: Iterator[sqlite3.Row])` with the same fields as `find`. Iterating may
+          raise `sqlite3.Error`
+        '''
+        filter_result = self._playlist_filter(record)
+        if not filter_result.ok:
+            return filter_result
+
+        result = self.try_execute(
+            self.joined_select_sql + '''
+            WHERE PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ?
+            ORDER BY Position ASC;
+        ''', filter_result.value, commit=False, cursor_callback=lambda cur: iter_cursor(cur, batch_size))
+        return result
+
+    def find_range(self, record: dict, after_position: int = -1, limit: int = 100) -> Result:
+        '''
+        Finds a page of the playlist's tracks by their position. Pages are keyed by position
+        rather than an offset, so every page is a single index range scan.
+
+        Params
+        ------
+        `record`
+          - The filter to match by. PlaylistID and Platform must be provided
+        `after_position`
+          - Only tracks after this position are found. `-1` to start from the first track
+        `limit`
+          - The maximum number of tracks to find
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(records: List[sqlite3.Row])` with the same fields as `find`, in order of position
+        '''
+        filter_result = self._playlist_filter(record)
+        if not filter_result.ok:
+            return filter_result
+
+        playlist_id, platform = filter_result.value
+        result = self.try_execute(
+            self.joined_select_sql + '''
+            WHERE
+                PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ? AND
+                PlaylistTracks.Position > ?
+            ORDER BY Position ASC
+            LIMIT ?;
+        ''', (playlist_id, platform, after_position, limit), commit=False, cursor_callback=lambda cur: cur.fetchall())
+        return result
+
+    def find_by_position(self, record: dict, position: int) -> Result:
+        '''
+        Params
+        ------
+        `record`
+          - The filter to match by. PlaylistID and Platform must be provided
+        `position`
+          - The position of the track in the playlist
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(record: sqlite3.Row)` with the same fields as `find`, or `Ok(None)` if there is
+          no track at `position`
+        '''
+        filter_result = self._playlist_filter(record)
+        if not filter_result.ok:
+            return filter_result
+
+        playlist_id, platform = filter_result.value
+        result = self.try_execute(
+            self.joined_select_sql + '''
+            WHERE
+                PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ? AND
+                PlaylistTracks.Position = ?;
+        ''', (playlist_id, platform, position), commit=False, cursor_callback=lambda cur: cur.fetchone())
+        return result
+
+    def find_positions(self, record: dict, track_ids: List[str]) -> Result:
+        '''
+        Params
+        ------
+        `record`
+          - The filter to match by. PlaylistID and Platform must be provided
+        `track_ids`
+          - The IDs of the tracks to find the positions of
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(positions: List[int])` with every position of the tracks in the playlist, in
+          ascending order. Tracks not in the playlist are ignored
+        '''
+        filter_result = self._playlist_filter(record)
+        if not filter_result.ok:
+            return filter_result
+
+        playlist_id, platform = filter_result.value
+        # the track IDs are passed as one JSON array parameter so any number of them can be
+        # looked up in one query
+        result = self.try_execute('''
+            SELECT Position FROM PlaylistTracks
+            WHERE
+                PlaylistID = ? AND Platform = ? AND
+                TrackID IN (SELECT value FROM json_each(?))
+            ORDER BY Position ASC;
+        ''', (playlist_id, platform, json.dumps(track_ids)), commit=False,
+            cursor_callback=lambda cur: [row['Position'] for row in cur.fetchall()])
+        return result
+
+    @staticmethod
+    def _playlist_filter(record: dict) -> Result:
+        '''
+        Returns
+        ------
+        - `Ok((playlist_id, platform))` if the filter `record` has exactly the PlaylistID and
+          Platform columns, `Err(validation_err_msg)` otherwise
+        '''
+        playlist_id = record.get('PlaylistID')
+        platform = record.get('Platform')
+        if playlist_id is None or platform is None:
+            return Err('Invalid filter (record). Both PlaylistID and Platform columns are required')
+
+        # record contains both PlaylistID, Platform but also other invalid columns
+        if len(record) > 2:
+            return Err('Invalid filter (record). Too many keys')
+
+        return Ok((playlist_id, platform))
+
+    def update(self, old_record: Union[dict, str], new_record: dict) -> Result:
+        return super().update(old_record, new_record)
+
+
+class PlaylistPayloadCollection(Collection):
+    '''
+    Interface for the PlaylistPayload table, which stores the compressed JSON response body of
+    each cached playlist so it can be served without being serialized again.
+    '''
+
+    columns = [
+        Column('PlaylistID'),
+        Column('Platform'),
+        Column('Etag'),
+        Column('Encoding'),
+        Column('Body'),
+    ]
+
+    def insert(self, record: dict) -> Result:
+        '''
+        Params
+        ------
+        `record`
+        - The record to insert, replacing the playlist's stored payload. Must have exactly the
+          `columns`:
+            - PlaylistID, Platform, Etag, Encoding, Body
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if record insertion fails (e.g. the playlist is not cached)
+        - `Ok(None)` if insertion is successful
+        '''
+        validation_result = self.validate(record)
+        if not validation_result.ok:
+            return validation_result
+
+        result = self.try_execute('''
+            INSERT INTO PlaylistPayload (PlaylistID, Platform, Etag, Encoding, Body)
+            VALUES (:PlaylistID, :Platform, :Etag, :Encoding, :Body)
+            ON CONFLICT (PlaylistID, Platform) DO UPDATE
+            SET
+                Etag = excluded.Etag,
+                Encoding = excluded.Encoding,
+                Body = excluded.Body;
+        ''', record)
+        return result
+
+    def delete(self, record: Union[dict, str]) -> Result:
+        '''
+        Params
+        ------
+        `record`
+          - filters the columns to delete. Only allow deletion of rows by PlaylistID and
+            Platform columns. If record = '*', deletes everything from PlaylistPayload table
+        '''
+
+        if record == '*':
+            result = self.try_execute('DELETE FROM PlaylistPayload;', ())
+            return result
+
         playlist_id = record.get('PlaylistID')
         platform = record.get('Platform')
         if playlist_id is None or platform is None:
@@ -586,29 +1130,39 @@ class PlaylistTracksCollection(Collection):
             return Err('Invalid filter (record). Too many keys')
 
         result = self.try_execute('''
-            SELECT
-                PlaylistTracks.Position,
-
-                Playlist.PlaylistID,                           Playlist.Platform AS "Platform",
-                Playlist.Title AS "PlaylistTitle",             Playlist.Owner AS "PlaylistOwner",
-                Playlist.Description AS "PlaylistDescription", Playlist.Thumbnail AS "PlaylistThumbnail",
-                Playlist.Length,                               Playlist.Etag,
-
-                Track.TrackID,                                 Track.Platform AS "TrackPlatform",
-                Track.Title AS "TrackTitle",                   Track.Owner AS "TrackOwner",
-                Track.Thumbnail AS "TrackThumbnail",           Track.DurationSeconds
-            FROM PlaylistTracks
-            INNER JOIN Playlist
-            ON
-                Playlist.PlaylistID = PlaylistTracks.PlaylistID
-                AND Playlist.Platform = PlaylistTracks.Platform
-            INNER JOIN Track
-            ON
-                Track.TrackID = PlaylistTracks.TrackID
-                AND Track.Platform = PlaylistTracks.Platform
-            WHERE Playlist.PlaylistID = ? AND Playlist.Platform = ?
-            ORDER BY Position ASC;
-        ''', (playlist_id, platform), commit=False, cursor_callback=lambda cur: cur.fetchall())
+            DELETE FROM PlaylistPayload
+            WHERE PlaylistID = ? AND Platform = ?;
+        ''', (playlist_id, platform))
+        return result
+
+    def find(self, record: dict):
+        '''
+        Params
+        ------
+        `record`
+          - The filter to match by. Only columns PlaylistID, Platform and Etag will be used as
+            the filter and must be provided
+
+        Returns
+        ------
+        - `Err(validation_err_msg)` if record is invalid
+        - `Err(sqlite3.Error)` if the query fails
+        - `Ok(records: List[sqlite3.Row])` with the payload stored for that etag, if any
+        '''
+        playlist_id = record.get('PlaylistID')
+        platform = record.get('Platform')
+        etag = record.get('Etag')
+        if playlist_id is None or platform is None or etag is None:
+            return Err('Invalid filter (record). PlaylistID, Platform and Etag columns are required')
+
+        # record contains PlaylistID, Platform, Etag but also other invalid columns
+        if len(record) > 3:
+            return Err('Invalid filter (record). Too many keys')
+
+        result = self.try_execute('''
+            SELECT * FROM PlaylistPayload
+            WHERE PlaylistID = ? AND Platform = ? AND Etag = ?;
+        ''', (playlist_id, platform, etag), commit=False, cursor_callback=lambda cur: cur.fetchall())
         return result
 
     def update(self, old_record: Union[dict, str], new_record: dict) -> Result:
@@ -0,0 +1,88 @@
+'''
+Per-query latency of concurrent primary key lookups through the `ConnectionPool` (user-001)
+against opening a new connection for every query, as the collections did before.
+
+Run with `python benchmarks/bench_connection_pool.py`. Uses a temporary database.
+'''
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from backend import TrackCollection, get_pool, migrate  # noqa: E402
+
+TRACKS = 10000
+QUERIES_PER_THREAD = 2000
+THREAD_COUNTS = (1, 4, 16)
+FIND_SQL = 'SELECT * FROM Track WHERE TrackID = ? AND Platform = ?'
+
+
+def find_pooled(db_path: str, track_id: str):
+    with get_pool(db_path).connection() as conn:
+        return conn.execute(FIND_SQL, (track_id, 'YOUTUBE')).fetchone()
+
+
+def find_reconnecting(db_path: str, track_id: str):
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA foreign_keys = ON;')
+        return conn.execute(FIND_SQL, (track_id, 'YOUTUBE')).fetchone()
+
+
+def run(find, db_path: str, threads: int) -> tuple:
+    '''The p50 and p99 latency, in µs, of every query made by `threads` threads at once'''
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def worker(i: int):
+        barrier.wait()
+        for q in range(QUERIES_PER_THREAD):
+            track_id = f'track-{(i * 7919 + q * 31) % TRACKS}'
+            start = time.perf_counter()
+            find(db_path, track_id)
+            latencies[i].append((time.perf_counter() - start) * 1e6)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    times = sorted(latency for thread_latencies in latencies for latency in thread_latencies)
+    return times[len(times) // 2], times[int(len(times) * 0.99) - 1]
+
+
+def main():
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        migrate(db_path)
+        TrackCollection(db_path).insertmany([
+            {
+                'TrackID': f'track-{i}',
+                'Platform': 'YOUTUBE',
+                'Title': f'Track {i}',
+                'Owner': 'owner',
+                'Thumbnail': 'thumbnail',
+                'DurationSeconds': i,
+            } for i in range(TRACKS)
+        ])
+
+        print('threads | pooled p50/p99 µs | reconnecting p50/p99 µs')
+        for threads in THREAD_COUNTS:
+            pooled = run(find_pooled, db_path, threads)
+            reconnecting = run(find_reconnecting, db_path, threads)
+            print(f'{threads} | {pooled[0]:.1f}/{pooled[1]:.1f} | {reconnecting[0]:.1f}/{reconnecting[1]:.1f}')
+    finally:
+        get_pool(db_path).close_all()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+'''
+Reader latency and writer throughput while one thread writes and others read, with the WAL
+journal of the storage profiles (user-002) against SQLite's default rollback journal
+(`DELETE`), in which a writer blocks every reader while it commits.
+
+Run with `python benchmarks/bench_journal_mode.py`. Uses a temporary database.
+'''
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from backend.connection import ConnectionPool, STORAGE_PROFILES, StorageProfile  # noqa: E402
+from backend.migrations import migrate  # noqa: E402
+
+TRACKS = 10000
+READERS = 4
+DURATION_SECS = 5
+# the tracks replaced by each write transaction
+WRITE_BATCH = 500
+FIND_SQL = 'SELECT * FROM Track WHERE TrackID = ? AND Platform = ?'
+UPSERT_SQL = '''
+    INSERT INTO Track (TrackID, Platform, Title, Owner, Thumbnail, DurationSeconds)
+    VALUES (?, 'YOUTUBE', ?, 'owner', 'thumbnail', ?)
+    ON CONFLICT (TrackID, Platform) DO UPDATE SET Title = excluded.Title
+'''
+
+
+def profile_with_journal(journal_mode: str) -> StorageProfile:
+    balanced = STORAGE_PROFILES['balanced']
+    return StorageProfile(
+        f'balanced-{journal_mode.lower()}',
+        journal_mode=journal_mode,
+        synchronous=balanced.synchronous,
+        mmap_size=balanced.mmap_size,
+        cache_size=balanced.cache_size,
+        temp_store=balanced.temp_store,
+        busy_timeout_ms=balanced.busy_timeout_ms,
+    )
+
+
+def run(journal_mode: str) -> dict:
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    pool = ConnectionPool(db_path, profile=profile_with_journal(journal_mode))
+    try:
+        migrate(db_path)
+        with pool.transaction() as conn:
+            conn.executemany(UPSERT_SQL, [(f'track-{i}', f'Track {i}', i) for i in range(TRACKS)])
+
+        stop = threading.Event()
+        latencies = [[] for _ in range(READERS)]
+        commits = [0]
+
+        def reader(i: int):
+            q = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                with pool.connection() as conn:
+                    conn.execute(FIND_SQL, (f'track-{(i * 7919 + q * 31) % TRACKS}', 'YOUTUBE')).fetchone()
+                latencies[i].append((time.perf_counter() - start) * 1e6)
+                q += 1
+
+        def writer():
+            batch = 0
+            while not stop.is_set():
+                start = batch * WRITE_BATCH % TRACKS
+                rows = [(f'track-{i}', f'Track {i} v{batch}', i) for i in range(start, start + WRITE_BATCH)]
+                with pool.transaction() as conn:
+                    conn.executemany(UPSERT_SQL, rows)
+                commits[0] += 1
+                batch += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(READERS)]
+        threads.append(threading.Thread(target=writer))
+        for thread in threads:
+            thread.start()
+        time.sleep(DURATION_SECS)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        times = sorted(latency for reader_latencies in latencies for latency in reader_latencies)
+        return {
+            'reads': len(times) / DURATION_SECS,
+            'p50': times[len(times) // 2],
+            'p99': times[int(len(times) * 0.99) - 1],
+            'max': times[-1],
+            'commits': commits[0] / DURATION_SECS,
+        }
+    finally:
+        pool.close_all()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+def main():
+    results = [(journal_mode, run(journal_mode)) for journal_mode in ('DELETE', 'WAL')]
+
+    print(f'{READERS} readers, 1 writer of {WRITE_BATCH} tracks per commit, {DURATION_SECS} s')
+    print('journal_mode | reads/s | read p50/p99/max µs | commits/s')
+    for journal_mode, stats in results:
+        print(
+            f'{journal_mode} | {stats["reads"]:.0f} | '
+            f'{stats["p50"]:.1f}/{stats["p99"]:.1f}/{stats["max"]:.1f} | {stats["commits"]:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+'''
+Latency of /api/playlist served from the cached payload (user-012) against rebuilding the
+JSON of the cached playlist on every request, with and without gzip.
+
+Run with `python benchmarks/bench_playlist_payload.py`. Uses a temporary database and a stub
+platform API, so nothing is fetched from the network.
+'''
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'tests'))
+from support import load_server, make_playlist, stub_api  # noqa: E402
+
+SIZES = ((1000, 300), (10000, 200), (50000, 100))
+
+
+def percentiles(client, url: str, headers: dict, requests: int) -> tuple:
+    '''The p50 and p99 latency, in ms, of `requests` GETs of `url`'''
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client.get(url, headers=headers).get_data()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99) - 1]
+
+
+def main():
+    server = load_server()
+    client = server.app.test_client()
+    api = server.cached_platform_apis['YOUTUBE']
+    cached_payload = api.cached_payload
+
+    print('tracks | encoding | payload p50/p99 ms | rebuilt p50/p99 ms')
+    for n, requests in SIZES:
+        playlist_id = f'bench{n}'
+        stub_api('YOUTUBE').playlists[playlist_id] = make_playlist(playlist_id, n)
+        url = f'/api/playlist/youtube?id={playlist_id}'
+
+        # the cache logs every request
+        with redirect_stdout(io.StringIO()):
+            # caches the playlist, then its payload
+            client.get(url).get_data()
+            client.get(url).get_data()
+
+            rows = []
+            for name, headers in (('gzip', {'Accept-Encoding': 'gzip'}), ('identity', {})):
+                payload = percentiles(client, url, headers, requests)
+                api.cached_payload = lambda *args, **kwargs: None
+                rebuilt = percentiles(client, url, headers, requests)
+                api.cached_payload = cached_payload
+                rows.append((name, payload, rebuilt))
+
+        for name, payload, rebuilt in rows:
+            print(f'{n} | {name} | {payload[0]:.2f}/{payload[1]:.2f} | {rebuilt[0]:.2f}/{rebuilt[1]:.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+'''
+Content-Encoding negotiation for API responses and precompressed static files.
+
+brotli is used if the optional `brotli` package is installed, otherwise gzip.
+'''
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+from werkzeug.datastructures import Accept
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# responses smaller than this are not worth the CPU time (or the added headers) to compress
+MIN_COMPRESS_BYTES = 1024
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson')
+# the extension of the precompressed sibling of a static file, by Content-Encoding
+PRECOMPRESSED_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def supported_encodings() -> tuple:
+    '''The Content-Encodings supported, in order of preference'''
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings: Accept, encodings: Optional[Iterable[str]] = None) -> Optional[str]:
+    '''
+    Params
+    ------
+    `accept_encodings`
+    - The request's `Accept-Encoding` e.g. `request.accept_encodings`
+    `encodings`
+    - The encodings to choose from, in order of preference. `supported_encodings()` if `None`
+
+    Returns
+    ------
+    The first of the `encodings` accepted by the client, or `None` if none are accepted
+    '''
+    if encodings is None:
+        encodings = supported_encodings()
+    for encoding in encodings:
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    '''Compresses the `data` with the Content-Encoding `encoding` (`br` or `gzip`)'''
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compress(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    '''
+    Compresses the `chunks` of a streamed body with the Content-Encoding `encoding`. Each
+    chunk is flushed, so the client can decompress it as soon as it arrives (e.g. each page
+    of a streamed playlist)
+    '''
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def compress_response(response: Response, accept_encodings: Accept) -> Response:
+    '''
+    Compresses JSON responses of at least `MIN_COMPRESS_BYTES`, and streamed JSON responses,
+    with the best encoding accepted by the client. Responses which are already encoded or are
+    file responses are returned as is
+    '''
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+
+    # the body depends on Accept-Encoding, even if it is not compressed
+    response.vary.add('Accept-Encoding')
+
+    if not response.is_streamed and response.content_length is not None \
+            and response.content_length < MIN_COMPRESS_BYTES:
+        return response
+
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = iter_compress(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def precompressed_path(path: str, accept_encodings: Accept) -> Optional[tuple]:
+    '''
+    Returns
+    ------
+    The `(path, encoding)` of the precompressed sibling of the file at `path` (e.g.
+    `index.html.br`) with the best encoding accepted by the client, or `None` if there is none
+    '''
+    accepted = [encoding for encoding in PRECOMPRESSED_EXTENSIONS if accept_encodings[encoding] > 0]
+    for encoding in accepted:
+        compressed_path = path + PRECOMPRESSED_EXTENSIONS[encoding]
+        if os.path.isfile(compressed_path):
+            return compressed_path, encoding
+    return None
@@ -1,6 +1,7 @@
 import {
     isErrorResponse,
     type ErrorResponse,
+    type MixResponse,
     type PlaylistInfoResponse,
     type PlaylistResponse,
     type Track
@@ -14,6 +15,8 @@ function playlistInfoEndpoint(platform: string, id: string): string {
     return `/api/playlist_info/${platform}?id=${id}`;
 }
 
+const mixEndpoint = '/api/mix';
+
 /**
  *
  * @param platform
@@ -111,22 +114,41 @@ async function getPlaylistInfo(
 }
 
 /**
- * Get list of all tracks from all specified playlists.
+ * Get the tracks of all specified playlists in one request. The server fetches the playlists
+ * concurrently and merges their tracks, without duplicates.
+ *
+ * @param shuffle
+ * Whether the server should shuffle the merged tracks
  */
-async function getManyPlaylists(
+async function getMix(
     playlists: { id: string; platform: string }[],
-): Promise<PlaylistResponse[]> {
-    let responses = await Promise.all(
-        playlists.map(({ platform, id }) => getPlaylist(platform.toLowerCase(), id))
-    );
-
-    let playlistResponses = responses
-        .filter((res): res is PlaylistResponse => {
-            let isErr = isErrorResponse(res);
-            if (isErr) console.error('Response error:', res);
-            return !isErr;
-        })
-    return playlistResponses;
+    shuffle: boolean = false,
+): Promise<MixResponse | ErrorResponse> {
+    let response = await fetch(mixEndpoint, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            playlists: playlists.map(({ platform, id }) => ({ platform: platform.toLowerCase(), id })),
+            shuffle,
+        }),
+    });
+    let result: MixResponse | ErrorResponse;
+
+    try {
+        result = await response.json();
+    } catch (e) {
+        return { error: 'The API returned a non-json response' };
+    }
+
+    if (isErrorResponse(result)) {
+        return { error: `(${response.status}: ${response.statusText}) ${result.error}` };
+    }
+    if (!response.ok) {
+        return { error: `${response.status}: ${response.statusText}` };
+    }
+
+    result.errors.forEach((err) => console.error('Response error:', err));
+    return result;
 }
 
-export { getPlaylist, getPlaylistInfo, getManyPlaylists };
+export { getPlaylist, getPlaylistInfo, getMix };
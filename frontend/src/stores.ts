@@ -1,6 +1,6 @@
 import { writable, type Writable } from 'svelte/store';
 import { findSavedMix } from './library';
-import { getManyPlaylists, getPlaylist } from './requests';
+import { getMix, getPlaylist } from './requests';
 import { isErrorResponse, type PlaylistResponse, type Track } from './types/PlaylistTracks';
 import { type SoundCloudPlayer, scGet } from './types/SoundCloudPlayer';
 import type SpotifyPlayer from './types/SpotifyPlayer';
@@ -139,10 +139,12 @@ namespace CacheManager {
             return null;
         }
 
-        let playlistResponses = await getManyPlaylists(savedMixInfo.playlists);
-        let tracklist = playlistResponses
-            .map((playlist) => playlist.tracks)
-            .reduce((flat, toFlatten) => flat.concat(toFlatten));
+        let mixResponse = await getMix(savedMixInfo.playlists);
+        if (isErrorResponse(mixResponse)) {
+            return null;
+        }
+
+        let tracklist = mixResponse.tracks;
         position = getCachedTrackPosition(tracklist, cachedTrackInfo) || 0;
         return { position, tracklist, id, platform };
     }
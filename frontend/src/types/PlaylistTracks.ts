@@ -37,7 +37,19 @@ export type ErrorResponse = {
     error: string;
 };
 
-export function isErrorResponse(obj: PlaylistResponse | PlaylistInfoResponse | ErrorResponse): obj is ErrorResponse {
+export type MixResponse = {
+    /** The playlists found, in the order requested */
+    playlists: PlaylistInfoResponse[];
+    /** The playlists which could not be fetched */
+    errors: { platform: string; id: string; error: string }[];
+    /** The seed of the shuffle, or `null` if not shuffled */
+    seed: number | null;
+    length: number;
+    /** The tracks of every playlist, without duplicates */
+    tracks: Track[];
+};
+
+export function isErrorResponse(obj: PlaylistResponse | PlaylistInfoResponse | MixResponse | ErrorResponse): obj is ErrorResponse {
     return (obj as ErrorResponse).error !== undefined;
 }
 
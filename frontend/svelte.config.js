@@ -12,6 +12,8 @@ const config = {
 		adapter: adapter({
 			out: './build',
 			// fallback: 'index.html',
+			// also write .br and .gz files, served by the flask server to clients accepting them
+			precompress: true,
 		}),
 		trailingSlash: 'always',
 	}
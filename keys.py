@@ -14,6 +14,8 @@ dotenv.load_dotenv('.env', verbose=True)
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 SPOTIFY_CLIENT_ID = os.getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET = os.getenv('SPOTIFY_CLIENT_SECRET')
+# optional. One of "durable", "balanced" or "fast"
+STORAGE_PROFILE = os.getenv('STORAGE_PROFILE', 'balanced')
 
 
 if YOUTUBE_API_KEY is None:
@@ -0,0 +1,128 @@
+'''
+Serializes API responses to JSON incrementally, so large playlists can be streamed to the
+client without building the whole response in memory
+'''
+import json
+import zlib
+from typing import Callable, Iterable, Iterator, Sequence
+from backend.api import IncompletePlaylistError
+
+# zlib window bits for the gzip container (instead of a raw zlib stream)
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def iter_playlist_json(
+    playlist_info: dict,
+    tracks: Iterable[dict],
+    batch_size: int = 500,
+) -> Iterator[str]:
+    '''
+    Yields the JSON of the `Playlist` made of the `playlist_info` and its `tracks` in chunks.
+    Only `batch_size` tracks are serialized at a time.
+
+    Params
+    ------
+    `playlist_info`
+    - The `PlaylistInfo` of the playlist. Must not contain the `tracks` key
+    `tracks`
+    - The playlist's `Track`s, in order. May be a generator
+    '''
+    # the serialized info without its closing brace
+    info_json = json.dumps(playlist_info)[:-1]
+    if len(playlist_info) > 0:
+        info_json += ', '
+    yield info_json + '"tracks": ['
+
+    batch = []
+    is_first_batch = True
+    for track in tracks:
+        batch.append(json.dumps(track))
+        if len(batch) >= batch_size:
+            yield ('' if is_first_batch else ', ') + ', '.join(batch)
+            is_first_batch = False
+            batch = []
+
+    if len(batch) > 0:
+        yield ('' if is_first_batch else ', ') + ', '.join(batch)
+    yield ']}'
+
+
+def iter_playlist_ndjson(playlist_info: dict, pages: Iterable[Sequence[dict]]) -> Iterator[str]:
+    '''
+    Yields the playlist as newline delimited JSON: the `playlist_info` on the first line, then
+    one `Track` per line. Each page of tracks is yielded as one chunk as soon as it is
+    available. If a page cannot be fetched, the last line is `{"error": ...}` instead.
+
+    Params
+    ------
+    `playlist_info`
+    - The `PlaylistInfo` of the playlist
+    `pages`
+    - The pages of the playlist's `Track`s, in order, e.g. from `PlatformApi.iter_track_pages`
+    '''
+    yield json.dumps(playlist_info) + '\n'
+    try:
+        for page in pages:
+            if len(page) > 0:
+                yield ''.join(json.dumps(track) + '\n' for track in page)
+    except IncompletePlaylistError as err:
+        yield json.dumps({'error': str(err)}) + '\n'
+
+
+def iter_gzip_tee(
+    chunks: Iterable[str],
+    on_complete: Callable[[bytes], None],
+    level: int = 6,
+    yield_compressed: bool = False,
+) -> Iterator[bytes]:
+    '''
+    Yields each of the `chunks` encoded as UTF-8 while gzip compressing them. Once every chunk
+    has been yielded, calls `on_complete` with the gzip compressed body. `on_complete` is not
+    called if the iterator is not consumed to the end (e.g. the client disconnected).
+
+    Params
+    ------
+    `chunks`
+    - The chunks of the body e.g. from `iter_playlist_json`
+    `on_complete`
+    - Called with the compressed body
+    `level`
+    - The gzip compression level, from 1 (fastest) to 9 (smallest)
+    `yield_compressed`
+    - If `True`, yields the compressed body instead, each chunk flushed so the client can
+      decompress it as soon as it arrives. The body is then only compressed once
+    '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    compressed = []
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        if yield_compressed:
+            data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            compressed.append(data)
+            if data:
+                yield data
+        else:
+            compressed.append(compressor.compress(data))
+            yield data
+    data = compressor.flush()
+    compressed.append(data)
+    if yield_compressed:
+        yield data
+    on_complete(b''.join(compressed))
+
+
+def iter_gunzip(body: bytes, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    '''
+    Yields the decompressed gzip `body` in chunks of at most `chunk_size` bytes, for clients
+    that do not accept gzip
+    '''
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    data = body
+    while data:
+        chunk = decompressor.decompress(data, chunk_size)
+        if chunk:
+            yield chunk
+        data = decompressor.unconsumed_tail
+    chunk = decompressor.flush()
+    if chunk:
+        yield chunk
@@ -1,31 +1,160 @@
 '''
 The flask server for the music shuffler web app
 '''
-from flask import Flask, request, send_from_directory
+import hashlib
+import mimetypes
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence, Tuple
+from flask import Flask, Response, jsonify, request, send_file
 from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
 from backend import (
     create_database,
     colls
 )
-from backend.api import Playlist, PlaylistInfo, Track
-from apis import platform_apis, ALL_PLATFORMS
-from debug_utils import print_blue, print_green, print_red
+from backend.api import Playlist, TrackTable
+from backend.cached_api import track_from_record
+from backend.shuffle import ShuffleSessionStore
+from apis import cached_platform_apis, ALL_PLATFORMS
+import keys
+from compression import compress_response, precompressed_path
+from serialization import iter_playlist_json, iter_playlist_ndjson, iter_gzip_tee, iter_gunzip
 
 BUILD_DIR = './frontend/build'
+# hashed by the svelte build, so their contents never change
+IMMUTABLE_DIR = '_app/immutable/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MAX_MIX_PLAYLISTS = 100
 app = Flask(__name__)
-
-
-@app.route('/', defaults={'path': 'index.html'})
+shuffle_sessions = ShuffleSessionStore()
+# fetches the playlists of a mix concurrently, bounding the upstream calls made at once
+mix_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='mix')
+
+
+def build_file_path(path: str) -> Optional[str]:
+    '''
+    Returns
+    ------
+    The path of the file in `BUILD_DIR` served at `path`, or `None` if there is none.
+    Directories are served by their `index.html`
+    '''
+    file_path = safe_join(BUILD_DIR, path)
+    if file_path is None:
+        return None
+    if os.path.isfile(file_path):
+        return file_path
+
+    file_path = os.path.join(file_path, 'index.html')
+    if os.path.isfile(file_path):
+        return file_path
+    return None
+
+
+@app.route('/', defaults={'path': ''})
 @app.route('/<path:path>', methods=['GET'])
 def index(path: str):
-    '''Serves all files from frontend/build to /'''
-    try:
-        print(f'path = {path}')
-        return send_from_directory(BUILD_DIR, path)
-    except NotFound as _err:
-        if not path.endswith('/'):
-            path += '/'
-        return send_from_directory(BUILD_DIR, path + 'index.html')
+    '''
+    Serves all files from frontend/build to /. If the client accepts it, a file's
+    precompressed `.br` or `.gz` sibling (generated by the build) is served instead
+    '''
+    file_path = build_file_path(path)
+    if file_path is None:
+        raise NotFound()
+
+    mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+    max_age = IMMUTABLE_MAX_AGE if path.startswith(IMMUTABLE_DIR) else None
+
+    precompressed = precompressed_path(file_path, request.accept_encodings)
+    if precompressed is None:
+        response = send_file(file_path, mimetype=mimetype, max_age=max_age)
+    else:
+        compressed_path, encoding = precompressed
+        response = send_file(compressed_path, mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+
+    if max_age is not None:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    return response
+
+
+@app.after_request
+def compress_api_response(response: Response) -> Response:
+    '''Compresses large JSON responses with the best encoding the client accepts'''
+    return compress_response(response, request.accept_encodings)
+
+
+def playlist_response(playlist: Playlist, on_payload: Optional[Callable[[bytes], None]] = None) -> Response:
+    '''
+    Serializes the `Playlist` into a streamed JSON response
+
+    Params
+    ------
+    `on_payload`
+    - If given, called with the gzip compressed response body once it has been streamed. If
+      the client accepts gzip, that compressed body is what is streamed, so it is not
+      compressed again by `compress_api_response`
+    '''
+    playlist_info = {key: value for key, value in playlist.items() if key != 'tracks'}
+    chunks = iter_playlist_json(playlist_info, playlist['tracks'])
+    if on_payload is None:
+        return Response(chunks, mimetype='application/json')
+
+    if 'gzip' in request.accept_encodings:
+        response = Response(iter_gzip_tee(chunks, on_payload, yield_compressed=True), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(iter_gzip_tee(chunks, on_payload), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def payload_response(body: bytes) -> Response:
+    '''
+    Returns the gzip compressed JSON `body` as is if the client accepts gzip, otherwise
+    decompresses it as it is streamed
+    '''
+    if 'gzip' in request.accept_encodings:
+        response = Response(body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(iter_gunzip(body), mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def response_etag(platform: str, playlist_id: str, etag: Optional[str]) -> Optional[str]:
+    '''
+    Returns the ETag of a response for the playlist with the upstream `etag`, or `None` if the
+    playlist has no etag
+    '''
+    if etag is None:
+        return None
+    return hashlib.blake2b(f'{platform}:{playlist_id}:{etag}'.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def not_modified_response(etag: Optional[str]) -> Optional[Response]:
+    '''
+    Returns a `304 Not Modified` response if the request's `If-None-Match` matches `etag`,
+    otherwise `None`
+    '''
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    return with_cache_headers(Response(status=304), etag)
+
+
+def with_cache_headers(response: Response, etag: Optional[str]) -> Response:
+    '''
+    Sets the `ETag` of the `response` and makes clients revalidate it before reusing it. The
+    ETag is weak as the body may be sent compressed or uncompressed
+    '''
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+        response.cache_control.no_cache = True
+    return response
 
 
 # API routes
@@ -42,66 +171,36 @@ def api_playlist_info(platform: str):
         return {'error': 'No playlist ID provided'}, 404
 
     platform = platform.upper()
-    api = platform_apis[platform]
+    api = cached_platform_apis[platform]
 
     # resolve playlist_id to standardised playlist id (specifically for soundcloud)
     playlist_id = api.resolve_playlist_id(playlist_id)
 
-    # check cache
-    res = colls['Playlist'].find({
-        'Platform': platform,
-        'PlaylistID': playlist_id,
-    })
-
-    # found in cache
-    if res.ok and len(res.value) == 1:
-        playlist_info = res.value[0]
-        print_blue(
-            f'Found Playlist {playlist_info["Title"]} with PlaylistID {playlist_id} in cache')
-
-        return PlaylistInfo(
-            platform=platform,
-            playlist_id=playlist_id,
-            title=playlist_info['Title'],
-            owner=playlist_info['Owner'],
-            description=playlist_info['Description'],
-            thumbnail=playlist_info['Thumbnail'],
-            etag=playlist_info['Etag'],
-            length=playlist_info['Length'],
-        ), 200
-
-    # not found in cache, fetch from API and replace cache
     playlist_info = api.playlist_info(playlist_id)
     if playlist_info is None:
         return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
 
-    res = colls['Playlist'].update(
-        {
-            'Platform': platform,
-            'PlaylistID': playlist_id,
-        },
-        {
-            'PlaylistID': playlist_info['playlist_id'],
-            'Title': playlist_info['title'],
-            'Owner': playlist_info['owner'],
-            'Description': playlist_info['description'],
-            'Thumbnail': playlist_info['thumbnail'],
-            'Length': playlist_info['length'],
-            'Etag': playlist_info['etag'],
-            'Platform': platform,
-        }
-    )
-    if res.ok:
-        print_blue(f'Inserted {playlist_id} into Playlist cache')
-    else:
-        print_red(f'Failed to insert {playlist_id} into Playlist cache: {res.err()}')
+    etag = response_etag(platform, playlist_id, playlist_info.get('etag'))
+    response = not_modified_response(etag)
+    if response is not None:
+        return response
 
-    return playlist_info, 200
+    return with_cache_headers(jsonify(playlist_info), etag)
 
 
 @app.route('/api/playlist/<platform>', methods=['GET'])
 def api_full_playlist(platform: str):
-    '''API endpoint for fetching playlist data'''
+    '''
+    API endpoint for fetching playlist data
+
+    Query params
+    ------
+    `id`
+    - The playlist ID
+    `stream`
+    - If `1`, the playlist is streamed as newline delimited JSON as it is fetched: the
+      `PlaylistInfo` on the first line, then one track per line
+    '''
     if platform not in ALL_PLATFORMS:
         return {'error': f'Unsupported Platform {platform}'}, 404
 
@@ -111,205 +210,435 @@ def api_full_playlist(platform: str):
         return {'error': 'No playlist ID provided'}, 404
 
     platform = platform.upper()
-    api = platform_apis[platform]
+    api = cached_platform_apis[platform]
     playlist_id = api.resolve_playlist_id(playlist_id)
 
-    # request API endpoint for playlist etag
-    print_blue(
-        f'({platform}) Fetching playlist_info(playlist_id={playlist_id})')
+    # the cached info if fresh, otherwise revalidated against the playlist's upstream etag
     playlist_info = api.playlist_info(playlist_id)
-
-    # playlist does not exist
     if playlist_info is None:
-        # delete the old cache e.g. if playlist became private/deleted
-        res = colls['PlaylistTracks'].delete({
-            'PlaylistID': playlist_id,
-            'Platform': platform,
-        })
-        if not res.ok:
-            print_red(
-                'Error deleting from PlaylistTracks '
-                f'(PlaylistID = {playlist_id}, Platform = {platform}): {res}')
-        else:
-            print_green(
-                'Successfully deleted from PlaylistTracks '
-                f'(PlaylistID = {playlist_id}, Platform = {platform})')
-
-        res = colls['Playlist'].delete({
-            'PlaylistID': playlist_id,
-            'Platform': platform,
-        })
-        if not res.ok:
-            print_red(
-                'Error deleting from Playlist '
-                f'(PlaylistID = {playlist_id}, Platform = {platform}): {res}')
-        else:
-            print_green(
-                'Successfully deleted from Playlist '
-                f'(PlaylistID = {playlist_id}, Platform = {platform})')
-
         return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
 
-    etag = playlist_info.get('etag')
+    # the client already has this version of the playlist
+    response = not_modified_response(response_etag(platform, playlist_id, playlist_info.get('etag')))
+    if response is not None:
+        return response
+
+    if request.args.get('stream') == '1':
+        pages = api.iter_track_pages(playlist_id, playlist_info)
+        if pages is None:
+            return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
+        return Response(iter_playlist_ndjson(playlist_info, pages), mimetype='application/x-ndjson')
+
+    # the response body is already serialized for this etag
+    payload = api.cached_payload(playlist_id, playlist_info.get('etag'))
+    if payload is not None:
+        etag = response_etag(platform, playlist_id, playlist_info.get('etag'))
+        return with_cache_headers(payload_response(payload), etag)
 
-    # compare with cache etag
-    if etag is not None:
-        playlist_coll = colls['Playlist']
-        record = {
-            'PlaylistID': playlist_id,
-            'Platform': platform
-        }
-        result = playlist_coll.find(record)
-        if not result.ok:
-            return {'error': f'Error fetching cached playlist\'s etag. {result.err()}'}, 500
-
-        if len(result.value) == 0:
-            cached_record = None
-            cached_etag = None
-            use_cache = False
-        else:
-            cached_record = result.value[0]
-            cached_etag = cached_record['Etag']
-            playlist_tracks_coll = colls['PlaylistTracks']
-            result = playlist_tracks_coll.find(record)
-            if not result.ok or len(result.value) == 0 and playlist_info['length'] != 0:
-                use_cache = False
-            else:
-                # same etag means playlist contents are unchanged
-                use_cache = etag == cached_etag
-
-        # get playlist contents from cache
-        if use_cache:
-            print_blue(f'Matching etags: {etag}. Using cache')
-            playlist_tracks_coll = colls['PlaylistTracks']
-            result = playlist_tracks_coll.find(record)
-            if not result.ok:
-                return {'error': f'Error fetching cached playlist. {result.err()}'}
-
-            records = result.value
-            playlist = Playlist(
-                platform=platform,
-                playlist_id=cached_record['PlaylistID'],
-                title=cached_record['Title'],
-                owner=cached_record['Owner'],
-                description=cached_record['Description'],
-                thumbnail=cached_record['Thumbnail'],
-                length=cached_record['Length'],
-                etag=etag,
-                tracks=[],
-            )
-
-            for record in records:
-                # PlaylistID, TrackID, Platform, Position
-                track = Track(
-                    track_id=record['TrackID'],
-                    platform=record['TrackPlatform'],
-                    title=record['TrackTitle'],
-                    owner=record['TrackOwner'],
-                    thumbnail=record['TrackThumbnail'],
-                    duration_seconds=record['DurationSeconds'],
-                )
-                playlist['tracks'].append(track)
-            return playlist
-
-    # etag is None or different etag means playlist contents have changed
-    # request for new playlist contents
-    print_blue(f'({platform}) Fetching playlist(playlist_id={playlist_id})')
     playlist = api.playlist(playlist_id, playlist_info)
     if playlist is None:
         return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
 
-    # cache the new playlist
-    playlist_coll = colls['Playlist']
-    track_coll = colls['Track']
-    playlist_tracks_coll = colls['PlaylistTracks']
+    # return playlist contents as JSON, caching the body for the next request
+    etag = playlist['etag']
+    response = playlist_response(playlist, lambda body: api.store_payload(playlist_id, etag, body))
+    return with_cache_headers(response, response_etag(platform, playlist_id, etag))
+
+
+@app.route('/api/playlist/<platform>/tracks', methods=['GET'])
+def api_playlist_tracks(platform: str):
+    '''
+    Returns a page of the cached playlist's tracks as a JSON response. Tracks are paged by
+    position: pass the `next_after_position` of a response as the `after_position` of the
+    request for the next page. If the `etag` of a page differs from the previous page's, the
+    playlist changed while paging and should be paged through again.
+
+    Query params
+    ------
+    `id`
+    - The playlist ID
+    `after_position`
+    - Only tracks after this position are returned. `-1` by default (start of the playlist)
+    `limit`
+    - The maximum number of tracks in the page (`1` to `1000`, `100` by default)
+    '''
+    if platform not in ALL_PLATFORMS:
+        return {'error': f'Unsupported Platform {platform}'}, 404
 
-    # delete the old cache
-    res = playlist_tracks_coll.delete({
-        'PlaylistID': playlist['playlist_id'],
-        'Platform': platform,
-    })
-    if not res.ok:
-        print_red(
-            'Error deleting from PlaylistTracks '
-            f'(PlaylistID = {playlist_id}, Platform = {platform}): {res}')
-    else:
-        print_green(
-            'Successfully deleted from PlaylistTracks '
-            f'(PlaylistID = {playlist_id}, Platform = {platform})')
-
-    res = playlist_coll.delete({
-        'PlaylistID': playlist['playlist_id'],
-        'Platform': platform,
-    })
+    playlist_id = request.args.get('id')
+    if playlist_id is None:
+        return {'error': 'No playlist ID provided'}, 404
+
+    after_position = request.args.get('after_position', -1, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    limit = max(1, min(limit, 1000))
+
+    platform = platform.upper()
+    api = cached_platform_apis[platform]
+    playlist_id = api.resolve_playlist_id(playlist_id)
+
+    res = api.cached_record(playlist_id)
     if not res.ok:
-        print_red(
-            'Error deleting from Playlist '
-            f'(PlaylistID = {playlist_id}, Platform = {platform}): {res}')
-    else:
-        print_green(
-            'Successfully deleted from Playlist '
-            f'(PlaylistID = {playlist_id}, Platform = {platform})')
-
-    # insert the new cache
-    res = playlist_coll.insert({
-        'PlaylistID': playlist['playlist_id'],
-        'Title': playlist['title'],
-        'Owner': playlist['owner'],
-        'Description': playlist['description'],
-        'Thumbnail': playlist['thumbnail'],
-        'Length': playlist['length'],
-        'Etag': etag,
-        'Platform': platform,
-    })
+        return {'error': f'Error fetching cached playlist. {res.err()}'}, 500
+    cached_record = res.value
+    if cached_record is None:
+        return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
+
+    res = colls['PlaylistTracks'].find_range(
+        {'PlaylistID': playlist_id, 'Platform': platform}, after_position, limit)
     if not res.ok:
-        print_red(
-            'Error inserting into Playlist '
-            f'(PlaylistID = {playlist_id}, Platform = {platform}): {res}')
+        return {'error': f'Error fetching cached tracks. {res.err()}'}, 500
+
+    records = res.value
+    tracks = []
+    for record in records:
+        track = track_from_record(record)
+        track['position'] = record['Position']
+        tracks.append(track)
+
+    # a short page is the last page
+    if len(records) < limit:
+        next_after_position = None
     else:
-        print_green(
-            'Successfully inserted into Playlist '
-            f'(PlaylistID = {playlist_id}, Platform = {platform})')
-
-    tracks_to_insert = []
-    playlist_tracks_to_insert = []
-    for i, track in enumerate(playlist['tracks']):
-        track_record = {
-            'TrackID': track['track_id'],
-            'Platform': platform,
-            'Title': track['title'],
-            'Owner': track['owner'],
-            'Thumbnail': track['thumbnail'],
-            'DurationSeconds': track['duration_seconds']
-        }
-        tracks_to_insert.append(track_record)
-
-        playlist_track_record = {
-            'PlaylistID': playlist['playlist_id'],
-            'TrackID': track['track_id'],
-            'Platform': track['platform'],
-            'Position': i,
-        }
-        playlist_tracks_to_insert.append(playlist_track_record)
-
-    res = track_coll.insertmany(tracks_to_insert)
+        next_after_position = records[-1]['Position']
+
+    return {
+        'platform': platform,
+        'playlist_id': playlist_id,
+        'etag': cached_record['Etag'],
+        'length': cached_record['Length'],
+        'tracks': tracks,
+        'next_after_position': next_after_position,
+    }, 200
+
+
+@app.route('/api/random_track', methods=['GET'])
+def api_random_track():
+    '''
+    Returns a uniformly random track of the cached playlist as a JSON response, without
+    loading the rest of the playlist.
+
+    Query params
+    ------
+    `platform`
+    - The platform of the playlist
+    `id`
+    - The playlist ID
+    `exclude`
+    - Optional comma separated IDs of tracks (e.g. recently played) not to return. Ignored if
+      every track of the playlist is excluded
+    '''
+    platform = request.args.get('platform', '')
+    if platform not in ALL_PLATFORMS:
+        return {'error': f'Unsupported Platform {platform}'}, 404
+
+    playlist_id = request.args.get('id')
+    if playlist_id is None:
+        return {'error': 'No playlist ID provided'}, 404
+
+    excluded_track_ids = [
+        track_id
+        for excluded in request.args.getlist('exclude')
+        for track_id in excluded.split(',')
+        if track_id
+    ]
+
+    platform = platform.upper()
+    api = cached_platform_apis[platform]
+    playlist_id = api.resolve_playlist_id(playlist_id)
+
+    res = api.cached_record(playlist_id)
     if not res.ok:
-        print_red(f'Error inserting many into Track: {res}')
-    else:
-        print_green('Successfully inserted many into Track')
+        return {'error': f'Error fetching cached playlist. {res.err()}'}, 500
+    cached_record = res.value
+    if cached_record is None:
+        return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
+
+    length = cached_record['Length']
+    if length == 0:
+        return {'error': f'Playlist with Playlist ID {playlist_id} has no tracks'}, 404
 
-    res = playlist_tracks_coll.insertmany(playlist_tracks_to_insert)
+    record = {'PlaylistID': playlist_id, 'Platform': platform}
+    excluded_positions = []
+    if len(excluded_track_ids) > 0:
+        res = colls['PlaylistTracks'].find_positions(record, excluded_track_ids)
+        if not res.ok:
+            return {'error': f'Error fetching cached tracks. {res.err()}'}, 500
+        excluded_positions = [position for position in res.value if position < length]
+        if len(excluded_positions) >= length:
+            excluded_positions = []
+
+    # choose uniformly from the positions that are not excluded: pick the n-th allowed
+    # position, stepping over each excluded position at or before it
+    position = random.randrange(length - len(excluded_positions))
+    for excluded_position in excluded_positions:
+        if excluded_position > position:
+            break
+        position += 1
+
+    res = colls['PlaylistTracks'].find_by_position(record, position)
     if not res.ok:
-        print_red(
-            f'Error inserting many into PlaylistTracks (PlaylistID = {playlist_id}): {res}')
-    else:
-        print_green(
-            f'Successfully inserted many into PlaylistTracks (PlaylistID = {playlist_id})')
+        return {'error': f'Error fetching cached track. {res.err()}'}, 500
+    if res.value is None:
+        # the playlist was replaced after its length was read
+        return {'error': f'Track at position {position} not found. Please retry'}, 503
+
+    return {
+        'platform': platform,
+        'playlist_id': playlist_id,
+        'etag': cached_record['Etag'],
+        'length': length,
+        'position': position,
+        'track': track_from_record(res.value),
+    }, 200
+
+
+def fetch_mix_playlist(platform: str, playlist_id: str) -> Tuple[Optional[Playlist], Optional[str]]:
+    '''
+    Fetches the playlist of a mix, from the cache if it is fresh
+
+    Returns
+    ------
+    The `Playlist` with its `tracks` in a `Sequence`, or `None` and the error message
+    '''
+    api = cached_platform_apis[platform]
+    playlist_id = api.resolve_playlist_id(playlist_id)
+    playlist_info = api.playlist_info(playlist_id)
+    if playlist_info is None:
+        return None, f'Playlist with Playlist ID {playlist_id} not found'
 
-    # return playlist contents as JSON
-    return playlist
+    playlist = api.playlist(playlist_id, playlist_info)
+    if playlist is None:
+        return None, f'Playlist with Playlist ID {playlist_id} not found'
+
+    # large playlists are streamed from the cache by a cursor of this thread's connection
+    if not isinstance(playlist['tracks'], Sequence):
+        playlist['tracks'] = TrackTable(platform, playlist['tracks'])
+    return playlist, None
+
+
+@app.route('/api/mix', methods=['POST'])
+def api_mix():
+    '''
+    Fetches many playlists concurrently and returns their tracks merged into one list, as a
+    JSON response. Tracks in more than one playlist are only included once, in the position of
+    their first occurrence.
+
+    JSON body
+    ------
+    ```
+    {
+        'playlists': [{'platform': str, 'id': str}, ...],
+        'shuffle': bool,  // optional. false by default
+        'seed': int,  // optional. The seed of the shuffle
+    }
+    ```
+
+    Response
+    ------
+    ```
+    {
+        'playlists': [PlaylistInfo, ...],  // the playlists found, in order
+        'errors': [{'platform': str, 'id': str, 'error': str}, ...],
+        'seed': int | null,
+        'length': int,
+        'tracks': [Track, ...],
+    }
+    ```
+    '''
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('playlists'), list):
+        return {'error': 'Expected a JSON body with a list of playlists'}, 400
+    if len(body['playlists']) > MAX_MIX_PLAYLISTS:
+        return {'error': f'A mix can have at most {MAX_MIX_PLAYLISTS} playlists'}, 400
+
+    seed = body.get('seed')
+    if seed is not None and not isinstance(seed, int):
+        return {'error': f'Invalid seed {seed}'}, 400
+
+    requested: List[Tuple[str, str]] = []
+    for playlist in body['playlists']:
+        if not isinstance(playlist, dict) or not isinstance(playlist.get('id'), str):
+            return {'error': f'Invalid playlist {playlist}'}, 400
+
+        platform = playlist.get('platform', '')
+        if not isinstance(platform, str) or platform.lower() not in ALL_PLATFORMS:
+            return {'error': f'Unsupported Platform {platform}'}, 404
+
+        key = (platform.upper(), playlist['id'].strip())
+        # the same playlist may be in the mix more than once
+        if key not in requested:
+            requested.append(key)
+
+    futures = [
+        mix_executor.submit(fetch_mix_playlist, platform, playlist_id)
+        for platform, playlist_id in requested
+    ]
+
+    playlist_infos = []
+    errors = []
+    tracks = []
+    seen = set()
+    for (platform, playlist_id), future in zip(requested, futures):
+        try:
+            playlist, error = future.result()
+        except Exception as err:  # pylint: disable=broad-except
+            playlist, error = None, f'Error fetching playlist: {err}'
+        if playlist is None:
+            errors.append({'platform': platform, 'id': playlist_id, 'error': error})
+            continue
+
+        playlist_infos.append({key: value for key, value in playlist.items() if key != 'tracks'})
+        for track in playlist['tracks']:
+            track_key = (track['platform'], track['track_id'])
+            if track_key not in seen:
+                seen.add(track_key)
+                tracks.append(track)
+
+    if body.get('shuffle'):
+        if seed is None:
+            seed = random.getrandbits(63)
+        random.Random(seed).shuffle(tracks)
+    else:
+        seed = None
+
+    mix_info = {
+        'playlists': playlist_infos,
+        'errors': errors,
+        'seed': seed,
+        'length': len(tracks),
+    }
+    return Response(iter_playlist_json(mix_info, tracks), mimetype='application/json')
+
+
+@app.route('/api/shuffle', methods=['POST'])
+def api_create_shuffle():
+    '''
+    Starts a server-side shuffle of one or more playlists, fetching and caching any playlist
+    that is not cached yet. Request the shuffled tracks from `/api/shuffle/<session_id>`.
+
+    JSON body
+    ------
+    ```
+    {
+        'playlists': [{'platform': str, 'id': str}, ...],
+        'seed': int,  // optional. A signed 64 bit integer
+    }
+    ```
+    '''
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('playlists'), list):
+        return {'error': 'Expected a JSON body with a list of playlists'}, 400
+
+    seed = body.get('seed')
+    if seed is not None and (not isinstance(seed, int) or not -2 ** 63 <= seed < 2 ** 63):
+        return {'error': f'Invalid seed {seed}'}, 400
+
+    playlists = []
+    for playlist in body['playlists']:
+        if not isinstance(playlist, dict) or not isinstance(playlist.get('id'), str):
+            return {'error': f'Invalid playlist {playlist}'}, 400
+
+        platform = playlist.get('platform', '')
+        playlist_id = playlist['id']
+        if platform not in ALL_PLATFORMS:
+            return {'error': f'Unsupported Platform {platform}'}, 404
+
+        platform = platform.upper()
+        api = cached_platform_apis[platform]
+        playlist_id = api.resolve_playlist_id(playlist_id)
+        res = api.cached_record(playlist_id)
+        if not res.ok:
+            return {'error': f'Error fetching cached playlist. {res.err()}'}, 500
+        if res.value is None:
+            return {'error': f'Playlist with Playlist ID {playlist_id} not found'}, 404
+
+        playlists.append((platform, playlist_id, res.value['Length']))
+
+    session_id, session = shuffle_sessions.create(playlists, seed)
+    return {
+        'session_id': session_id,
+        'seed': session.seed,
+        'length': session.length,
+    }, 200
+
+
+@app.route('/api/shuffle/<session_id>', methods=['GET'])
+def api_next_shuffled(session_id: str):
+    '''
+    Returns the next tracks of the shuffle session as a JSON response
+
+    Query params
+    ------
+    `n`
+    - The number of tracks to return (`1` to `500`, `10` by default). Fewer tracks are
+      returned once the shuffle reaches the end of the playlists
+    '''
+    session = shuffle_sessions.get(session_id)
+    if session is None:
+        return {'error': f'Shuffle session {session_id} not found'}, 404
+
+    n = request.args.get('n', 10, type=int)
+    n = max(1, min(n, 500))
+
+    tracks = []
+    for platform, playlist_id, position in session.next(n):
+        res = colls['PlaylistTracks'].find_by_position(
+            {'PlaylistID': playlist_id, 'Platform': platform}, position)
+        if not res.ok:
+            return {'error': f'Error fetching cached track. {res.err()}'}, 500
+        # the playlist was replaced by a shorter one after the session started
+        if res.value is None:
+            continue
+
+        track = track_from_record(res.value)
+        track['playlist_id'] = playlist_id
+        track['position'] = position
+        tracks.append(track)
+
+    return {
+        'session_id': session_id,
+        'offset': session.offset,
+        'length': session.length,
+        'done': session.is_done(),
+        'tracks': tracks,
+    }, 200
+
+
+@app.route('/api/metrics', methods=['GET'])
+def api_metrics():
+    '''
+    Returns the cache hit/miss, connection, rate limiting, conditional request and scraped page
+    cache counters of each platform as a JSON response
+    '''
+    return {
+        'cache': {
+            platform: api.cache_stats() for platform, api in cached_platform_apis.items()
+        },
+        'transport': {
+            platform: api.transport.connection_stats() for platform, api in cached_platform_apis.items()
+        },
+        # only platforms whose requests are rate limited, e.g. SoundCloud api-v2
+        'limiter': {
+            platform: api.api.limiter.limiter_stats()
+            for platform, api in cached_platform_apis.items()
+            if getattr(api.api, 'limiter', None) is not None
+        },
+        # only platforms revalidating their upstream responses with If-None-Match, e.g. YouTube
+        'conditional': {
+            platform: api.api.conditional_cache.cache_stats()
+            for platform, api in cached_platform_apis.items()
+            if getattr(api.api, 'conditional_cache', None) is not None
+        },
+        # only platforms caching the pages they scrape, e.g. SoundCloud
+        'hydration': {
+            platform: api.api.hydration_cache.cache_stats()
+            for platform, api in cached_platform_apis.items()
+            if getattr(api.api, 'hydration_cache', None) is not None
+        },
+    }, 200
 
 
 if __name__ == '__main__':
-    create_database()
+    create_database(profile=keys.STORAGE_PROFILE)
     app.run(debug=True)
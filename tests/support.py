@@ -0,0 +1,139 @@
+'''
+Shared fixtures of the tests: a temporary migrated database and a stub `PlatformApi`.
+
+`load_server()` imports the Flask app with every collection on a temporary database, and
+without the network calls made when the platform APIs are created.
+'''
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional, Union
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend import CollectionDict, migrate  # noqa: E402
+from backend.api import PlatformApi, Playlist, PlaylistInfo, Track  # noqa: E402
+from backend.storage import (  # noqa: E402
+    PlaylistCollection,
+    PlaylistPayloadCollection,
+    PlaylistTracksCollection,
+    TrackCollection,
+)
+
+
+def temp_db_path() -> str:
+    '''Creates an empty, migrated database in a temporary file and returns its path'''
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    migrate(db_path)
+    return db_path
+
+
+def make_colls(db_path: str) -> CollectionDict:
+    return {
+        'Playlist': PlaylistCollection(db_path),
+        'PlaylistTracks': PlaylistTracksCollection(db_path),
+        'Track': TrackCollection(db_path),
+        'PlaylistPayload': PlaylistPayloadCollection(db_path),
+    }
+
+
+def make_tracks(prefix: str, n: int, platform: str = 'YOUTUBE') -> List[Track]:
+    return [
+        Track(
+            track_id=f'{prefix}-{i}',
+            platform=platform,
+            title=f'Track {i}',
+            owner='owner',
+            thumbnail='thumbnail',
+            duration_seconds=i,
+        ) for i in range(n)
+    ]
+
+
+def make_playlist(
+    playlist_id: str,
+    tracks: Union[int, List[Track]],
+    etag: Optional[str] = 'e1',
+    platform: str = 'YOUTUBE',
+) -> Playlist:
+    if isinstance(tracks, int):
+        tracks = make_tracks(playlist_id, tracks, platform)
+    return Playlist(
+        platform=platform,
+        playlist_id=playlist_id,
+        title=f'Playlist {playlist_id}',
+        owner='owner',
+        description='description',
+        thumbnail='thumbnail',
+        etag=etag,
+        length=len(tracks),
+        tracks=tracks,
+    )
+
+
+class StubApi(PlatformApi):
+    '''
+    A `PlatformApi` serving the `playlists` set by the test, counting the calls made to it
+    '''
+
+    def __init__(self, platform: str = 'YOUTUBE') -> None:
+        super().__init__(platform=platform)
+        self.playlists: Dict[str, Playlist] = {}
+        self.calls: Dict[str, int] = {'playlist_info': 0, 'playlist': 0}
+
+    def playlist_info(self, playlist_id: str) -> Union[PlaylistInfo, None]:
+        self.calls['playlist_info'] += 1
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            return None
+        return PlaylistInfo(**{key: value for key, value in playlist.items() if key != 'tracks'})
+
+    def playlist(
+        self,
+        playlist_id: str,
+        playlist_info: Optional[PlaylistInfo] = None
+    ) -> Union[Playlist, None]:
+        self.calls['playlist'] += 1
+        playlist = self.playlists.get(playlist_id)
+        if playlist is None:
+            return None
+        return Playlist(**{**playlist, 'tracks': list(playlist['tracks'])})
+
+
+_server = None
+
+
+def load_server():
+    '''
+    Imports and returns the `server` module, with every collection on a temporary database
+    and each platform's API replaced by a `StubApi` (see `stub_api`)
+    '''
+    global _server
+    if _server is not None:
+        return _server
+
+    for key in ('YOUTUBE_API_KEY', 'SPOTIFY_CLIENT_ID', 'SPOTIFY_CLIENT_SECRET'):
+        os.environ.setdefault(key, 'test')
+
+    import backend
+    backend.colls.update(make_colls(temp_db_path()))
+
+    from backend.api.soundcloud import SoundCloudApi
+    with mock.patch.object(SoundCloudApi, 'get_client_id', return_value='test'):
+        import apis
+        import server
+
+    for platform, api in apis.cached_platform_apis.items():
+        api.api = StubApi(platform)
+    _server = server
+    return server
+
+
+def stub_api(platform: str) -> StubApi:
+    '''The `StubApi` of the `platform` (e.g. `"YOUTUBE"`) of the server loaded by `load_server`'''
+    import apis
+    return apis.cached_platform_apis[platform].api
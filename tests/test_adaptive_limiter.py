@@ -0,0 +1,121 @@
+'''
+AdaptiveLimiter backs off when throttled and recovers additively (user-023)
+'''
+import threading
+import time
+import unittest
+
+from backend.api.adaptive_limiter import AdaptiveLimiter
+
+
+def limiter(**kwargs) -> AdaptiveLimiter:
+    options = dict(rate=1000, burst=100, initial_concurrency=8, max_concurrency=16,
+                   base_delay_secs=0.01, max_delay_secs=0.02, cooldown_secs=60)
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def request(self, limiter: AdaptiveLimiter, **release_kwargs):
+        limiter.acquire()
+        limiter.release(**release_kwargs)
+
+    def test_additive_increase(self):
+        aimd = limiter()
+        for _ in range(8):
+            self.request(aimd)
+        # ~1 per round of 8 requests
+        self.assertAlmostEqual(aimd.limiter_stats()['concurrency'], 9, delta=0.1)
+
+        for _ in range(500):
+            self.request(aimd)
+        self.assertEqual(aimd.limiter_stats()['concurrency'], 16)
+
+    def test_multiplicative_decrease_once_per_cooldown(self):
+        aimd = limiter()
+        # requests in flight together, all throttled
+        for _ in range(4):
+            aimd.acquire()
+        for _ in range(4):
+            aimd.release(throttled=True)
+
+        stats = aimd.limiter_stats()
+        self.assertEqual(stats['concurrency'], 4)
+        self.assertEqual((stats['throttled'], stats['decreases']), (4, 1))
+        self.assertGreater(stats['paused_secs'], 0)
+
+    def test_decreases_to_min(self):
+        aimd = limiter(cooldown_secs=0, min_concurrency=1)
+        for _ in range(10):
+            self.request(aimd, throttled=True)
+        self.assertEqual(aimd.limiter_stats()['concurrency'], 1)
+
+    def test_recovery(self):
+        aimd = limiter(cooldown_secs=0)
+        self.request(aimd, throttled=True)
+        self.assertEqual(aimd.limiter_stats()['concurrency'], 4)
+
+        expected = 4
+        for _ in range(22):
+            self.request(aimd)
+            expected += 1 / expected
+        self.assertAlmostEqual(aimd.limiter_stats()['concurrency'], expected, places=2)
+        self.assertGreater(expected, 7.5)
+
+    def test_failed_requests_change_nothing(self):
+        aimd = limiter()
+        for _ in range(5):
+            self.request(aimd, failed=True)
+
+        stats = aimd.limiter_stats()
+        self.assertEqual(stats['concurrency'], 8)
+        self.assertEqual((stats['failed'], stats['throttled'], stats['paused_secs']), (5, 0, 0))
+
+    def test_pauses_every_thread(self):
+        aimd = limiter(base_delay_secs=0.2, max_delay_secs=0.2)
+        self.request(aimd, throttled=True)
+
+        start = time.monotonic()
+        self.request(aimd)
+        # at least the retry_delay of the first throttle, 0.1 to 0.2 s
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(aimd.limiter_stats()['waits'], 1)
+
+    def test_concurrency_limit(self):
+        aimd = limiter(initial_concurrency=2)
+        aimd.acquire()
+        aimd.acquire()
+
+        acquired = threading.Event()
+
+        def third():
+            aimd.acquire()
+            acquired.set()
+
+        thread = threading.Thread(target=third)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+
+        aimd.release()
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(aimd.limiter_stats()['in_flight'], 2)
+
+    def test_rate(self):
+        aimd = limiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(6):
+            self.request(aimd)
+        # the burst, then 5 tokens at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_retry_delay_is_jittered_exponential_backoff(self):
+        aimd = AdaptiveLimiter(base_delay_secs=0.5, max_delay_secs=30)
+        for attempt, cap in ((0, 0.5), (1, 0.5), (2, 1), (3, 2), (7, 30), (20, 30)):
+            delays = [aimd.retry_delay(attempt) for _ in range(50)]
+            self.assertTrue(all(cap / 2 <= delay <= cap for delay in delays), (attempt, delays))
+            self.assertGreater(len(set(delays)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
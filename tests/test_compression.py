@@ -0,0 +1,145 @@
+'''
+API responses are compressed with the best Content-Encoding the client accepts (user-018)
+'''
+import gzip
+import json
+import os
+import tempfile
+import unittest
+import zlib
+
+from flask import Response
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import compression
+from compression import choose_encoding, compress_response, iter_compress, precompressed_path
+
+from support import load_server, make_playlist, stub_api
+
+LARGE_JSON = json.dumps({'tracks': [{'title': f'Track {i}'} for i in range(200)]})
+
+
+def accept(value: str) -> Accept:
+    return parse_accept_header(value, Accept)
+
+
+def json_response(body: str = LARGE_JSON, **kwargs) -> Response:
+    return Response(body, mimetype='application/json', **kwargs)
+
+
+class ChooseEncodingTest(unittest.TestCase):
+    def test_preference_order(self):
+        self.assertEqual(choose_encoding(accept('gzip, br'), ('br', 'gzip')), 'br')
+        self.assertEqual(choose_encoding(accept('gzip, br;q=0'), ('br', 'gzip')), 'gzip')
+        self.assertEqual(choose_encoding(accept('*'), ('br', 'gzip')), 'br')
+        self.assertIsNone(choose_encoding(accept('identity'), ('br', 'gzip')))
+        self.assertIsNone(choose_encoding(accept(''), ('br', 'gzip')))
+
+    def test_supported_encodings(self):
+        expected = ('gzip',) if compression.brotli is None else ('br', 'gzip')
+        self.assertEqual(compression.supported_encodings(), expected)
+
+
+class CompressResponseTest(unittest.TestCase):
+    def test_large_json_is_gzipped(self):
+        response = compress_response(json_response(), accept('gzip'))
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(gzip.decompress(response.get_data()).decode(), LARGE_JSON)
+        self.assertEqual(response.content_length, len(response.get_data()))
+
+    @unittest.skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = compress_response(json_response(), accept('gzip, br'))
+
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.get_data()).decode(), LARGE_JSON)
+
+    def test_not_accepted(self):
+        for value in ('', 'identity', 'gzip;q=0, br;q=0'):
+            response = compress_response(json_response(), accept(value))
+            self.assertNotIn('Content-Encoding', response.headers, value)
+            self.assertIn('Accept-Encoding', response.vary)
+            self.assertEqual(response.get_data(as_text=True), LARGE_JSON)
+
+    def test_small_json_is_not_compressed(self):
+        body = json.dumps({'ok': True})
+        response = compress_response(json_response(body), accept('gzip'))
+
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(response.get_data(as_text=True), body)
+
+    def test_left_as_is(self):
+        responses = {
+            'html': Response(LARGE_JSON, mimetype='text/html'),
+            'not modified': json_response(status=304),
+            'already encoded': json_response(headers={'Content-Encoding': 'gzip'}),
+            'file': json_response(direct_passthrough=True),
+        }
+        for name, response in responses.items():
+            with self.subTest(name):
+                headers = dict(response.headers)
+                response = compress_response(response, accept('gzip'))
+                self.assertEqual(dict(response.headers), headers)
+
+    def test_streamed_json_is_compressed(self):
+        chunks = ['{"tracks": [', '1, 2', ', 3', ']}']
+        response = compress_response(
+            Response(iter(chunks), mimetype='application/x-ndjson'), accept('gzip'))
+
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        self.assertEqual(gzip.decompress(response.get_data()).decode(), ''.join(chunks))
+
+
+class IterCompressTest(unittest.TestCase):
+    def test_each_chunk_can_be_decompressed_as_it_arrives(self):
+        chunks = [f'{{"page": {i}}}\n'.encode() for i in range(5)]
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        compressed = iter_compress(iter(chunks), 'gzip')
+        for chunk in chunks:
+            self.assertEqual(decompressor.decompress(next(compressed)), chunk)
+        for rest in compressed:
+            decompressor.decompress(rest)
+        self.assertTrue(decompressor.eof)
+
+
+class PrecompressedPathTest(unittest.TestCase):
+    def test_precompressed_sibling(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            path = os.path.join(build_dir, 'app.js')
+            for file_path in (path, path + '.gz'):
+                with open(file_path, 'wb') as file:
+                    file.write(b'')
+
+            self.assertEqual(precompressed_path(path, accept('gzip, br')), (path + '.gz', 'gzip'))
+            self.assertIsNone(precompressed_path(path, accept('identity')))
+
+            with open(path + '.br', 'wb') as file:
+                file.write(b'')
+            self.assertEqual(precompressed_path(path, accept('gzip, br')), (path + '.br', 'br'))
+            self.assertEqual(precompressed_path(path, accept('gzip')), (path + '.gz', 'gzip'))
+
+
+class CompressApiResponseTest(unittest.TestCase):
+    def test_hook(self):
+        client = load_server().app.test_client()
+        stub_api('YOUTUBE').playlists['compressed'] = make_playlist('compressed', 50)
+        url = '/api/playlist/youtube/tracks?id=compressed'
+        body = client.get(url).get_json()
+
+        res = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', res.vary)
+        self.assertEqual(json.loads(gzip.decompress(res.get_data())), body)
+
+        res = client.get(url, headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(res.get_json(), body)
+
+if __name__ == '__main__':
+    unittest.main()
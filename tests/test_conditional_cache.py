@@ -0,0 +1,92 @@
+'''
+YouTube responses are revalidated with If-None-Match (user-015)
+'''
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from support import load_server
+
+from backend.api import YouTubeApi
+from backend.api.youtube import ConditionalCache
+
+
+def response(url: str, status_code: int, body=None, etag=None) -> requests.Response:
+    res = requests.Response()
+    res.status_code = status_code
+    res.url = url
+    res._content = b'' if body is None else json.dumps(body).encode()
+    if etag is not None:
+        res.headers['ETag'] = etag
+    return res
+
+
+class StubTransport:
+    '''Responds `304` to requests with the current `etag`, otherwise `200` with the `body`'''
+
+    def __init__(self, body: dict, etag: str) -> None:
+        self.body = body
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        self.requests.append(kwargs)
+        if kwargs.get('headers', {}).get('If-None-Match') == self.etag:
+            return response(url, 304)
+        return response(url, 200, self.body, self.etag)
+
+
+class ConditionalCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = ConditionalCache(max_entries=2)
+        self.transport = StubTransport({'items': [1, 2]}, '"v1"')
+        self.parse = mock.Mock(side_effect=lambda result: result['items'])
+
+    def test_not_modified_reuses_parsed_value(self):
+        first, res = self.cache.get(self.transport, 'https://example.com/a', self.parse)
+        self.assertEqual((first, res.status_code), ([1, 2], 200))
+
+        second, res = self.cache.get(self.transport, 'https://example.com/a', self.parse)
+        self.assertEqual((second, res.status_code), ([1, 2], 304))
+        self.assertEqual(self.transport.requests[1]['headers'], {'If-None-Match': '"v1"'})
+        self.assertEqual(self.parse.call_count, 1)
+        self.assertEqual(self.cache.cache_stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+    def test_modified_is_parsed_again(self):
+        self.cache.get(self.transport, 'https://example.com/a', self.parse)
+        self.transport.body, self.transport.etag = {'items': [3]}, '"v2"'
+
+        value, res = self.cache.get(self.transport, 'https://example.com/a', self.parse)
+        self.assertEqual((value, res.status_code), ([3], 200))
+        self.assertEqual(self.cache.cache_stats()['misses'], 2)
+
+    def test_uses_transport_timeout(self):
+        self.cache.get(self.transport, 'https://example.com/a', self.parse)
+        self.assertNotIn('timeout', self.transport.requests[0])
+
+    def test_drops_least_recently_used(self):
+        for url in ('a', 'b', 'a', 'c'):
+            self.cache.get(self.transport, f'https://example.com/{url}', self.parse)
+
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get(self.transport, 'https://example.com/b', self.parse)
+        # b was dropped, so it is requested without its etag
+        self.assertEqual(self.transport.requests[-1]['headers'], {})
+
+
+class ConditionalMetricsTest(unittest.TestCase):
+    def test_metrics(self):
+        server = load_server()
+        youtube = YouTubeApi('key')
+        youtube.conditional_cache.stats['hits'] = 3
+
+        with mock.patch.object(server.cached_platform_apis['YOUTUBE'], 'api', youtube):
+            metrics = server.app.test_client().get('/api/metrics').get_json()
+
+        self.assertEqual(metrics['conditional'], {'YOUTUBE': {'hits': 3, 'misses': 0, 'entries': 0}})
+
+
+if __name__ == '__main__':
+    unittest.main()
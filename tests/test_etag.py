@@ -0,0 +1,77 @@
+'''
+Playlist responses have an ETag, and requests with a matching If-None-Match get a
+`304 Not Modified` (user-016)
+'''
+import unittest
+
+from support import load_server, make_playlist, stub_api
+
+URLS = ('/api/playlist/youtube?id={}', '/api/playlist_info/youtube?id={}')
+
+
+class ETagTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = load_server()
+        cls.client = cls.server.app.test_client()
+        cls.api = cls.server.cached_platform_apis['YOUTUBE']
+
+    def add_playlist(self, playlist_id: str, etag='e1'):
+        stub_api('YOUTUBE').playlists[playlist_id] = make_playlist(playlist_id, 20, etag=etag)
+
+    def test_not_modified(self):
+        self.add_playlist('etag-304')
+        for url in URLS:
+            url = url.format('etag-304')
+            with self.subTest(url):
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, 200)
+                etag, is_weak = res.get_etag()
+                self.assertTrue(is_weak)
+                self.assertTrue(res.cache_control.no_cache)
+
+                res = self.client.get(url, headers={'If-None-Match': f'W/"{etag}"'})
+                self.assertEqual(res.status_code, 304)
+                self.assertEqual(res.get_data(), b'')
+                self.assertEqual(res.get_etag(), (etag, True))
+
+                # the strong form matches too, as the comparison is weak
+                res = self.client.get(url, headers={'If-None-Match': f'"other", "{etag}"'})
+                self.assertEqual(res.status_code, 304)
+
+    def test_same_etag_for_playlist_and_info(self):
+        self.add_playlist('etag-same')
+        etags = {self.client.get(url.format('etag-same')).get_etag() for url in URLS}
+        self.assertEqual(len(etags), 1)
+
+    def test_changed_playlist(self):
+        self.add_playlist('etag-changed')
+        url = URLS[0].format('etag-changed')
+        etag, _ = self.client.get(url).get_etag()
+
+        self.add_playlist('etag-changed', etag='e2')
+        # otherwise the cached playlist is fresh for the policy's ttl_secs
+        self.api.evict('etag-changed')
+        res = self.client.get(url, headers={'If-None-Match': f'W/"{etag}"'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.get_etag()[0], etag)
+
+    def test_no_etag_without_upstream_etag(self):
+        self.add_playlist('etag-none', etag=None)
+        res = self.client.get(URLS[0].format('etag-none'), headers={'If-None-Match': '*'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_etag(), (None, None))
+
+    def test_etag_is_per_playlist(self):
+        etag = self.server.response_etag('YOUTUBE', 'a', 'e1')
+        self.assertEqual(etag, self.server.response_etag('YOUTUBE', 'a', 'e1'))
+        self.assertNotEqual(etag, self.server.response_etag('YOUTUBE', 'b', 'e1'))
+        self.assertNotEqual(etag, self.server.response_etag('SPOTIFY', 'a', 'e1'))
+        self.assertNotEqual(etag, self.server.response_etag('YOUTUBE', 'a', 'e2'))
+        self.assertIsNone(self.server.response_etag('YOUTUBE', 'a', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
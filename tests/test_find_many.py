@@ -0,0 +1,144 @@
+'''
+Known tracks are looked up in one query, and SoundCloud only fetches the tracks which are
+neither prerendered nor known (user-024)
+'''
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from support import make_colls, make_tracks, temp_db_path
+
+from backend.api import SoundCloudApi, Track
+from backend.api import soundcloud
+from backend.cached_api import track_lookup, track_record_from
+from backend.storage import TrackCollection
+
+PLAYLIST_DATA = {
+    'url': '/owner/sets/mix',
+    'title': 'Mix',
+    'artwork_url': 'https://example.com/artwork.jpg',
+    'last_modified': '2026-10-01T00:00:00Z',
+    'track_count': 4,
+    'description': '',
+    'user': {'username': 'owner'},
+    'tracks': [
+        # prerendered
+        {'id': 1, 'title': 'One', 'user': {'username': 'owner'}, 'duration': 60000},
+        # ids only: known, unknown, and unknown but not found by api-v2
+        {'id': 2},
+        {'id': 3},
+        {'id': 4},
+    ],
+}
+
+
+class FindManyTest(unittest.TestCase):
+    def setUp(self):
+        db_path = temp_db_path()
+        self.addCleanup(os.remove, db_path)
+        self.colls = make_colls(db_path)
+        for coll in self.colls.values():
+            self.addCleanup(coll.pool.close_all)
+
+        for platform in ('YOUTUBE', 'SPOTIFY'):
+            for track in make_tracks('t', 3, platform):
+                self.assertTrue(self.colls['Track'].insert(track_record_from(track, platform)).ok)
+
+    def test_find_many(self):
+        result = self.colls['Track'].find_many(
+            [('t-0', 'YOUTUBE'), ('t-2', 'YOUTUBE'), ('missing', 'YOUTUBE'), ('t-1', 'SPOTIFY')])
+
+        self.assertTrue(result.ok)
+        keys = {(record['TrackID'], record['Platform']) for record in result.value}
+        self.assertEqual(keys, {('t-0', 'YOUTUBE'), ('t-2', 'YOUTUBE'), ('t-1', 'SPOTIFY')})
+
+    def test_find_many_of_none(self):
+        self.assertEqual(self.colls['Track'].find_many([]).value, [])
+
+    def test_many_keys_in_one_query(self):
+        # more keys than SQLite allows parameters
+        keys = [(f'missing-{i}', 'YOUTUBE') for i in range(50000)] + [('t-1', 'YOUTUBE')]
+        result = self.colls['Track'].find_many(keys)
+
+        self.assertEqual([record['TrackID'] for record in result.value], ['t-1'])
+
+    def test_track_lookup(self):
+        lookup = track_lookup(self.colls, 'SPOTIFY')
+        tracks = make_tracks('t', 3, 'SPOTIFY')
+
+        self.assertEqual(lookup(['t-0', 't-2', 'missing']), {'t-0': tracks[0], 't-2': tracks[2]})
+        self.assertEqual(lookup([]), {})
+
+    def test_track_lookup_error(self):
+        # a database without the Track table
+        fd, db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.remove, db_path)
+        coll = TrackCollection(db_path)
+        self.addCleanup(coll.pool.close_all)
+
+        self.assertFalse(coll.find_many([('t-0', 'YOUTUBE')]).ok)
+        self.assertEqual(track_lookup({'Track': coll}, 'YOUTUBE')(['t-0']), {})
+
+
+def soundcloud_track(track_id: str, title: str) -> Track:
+    return Track(
+        track_id=track_id,
+        platform='SOUNDCLOUD',
+        title=title,
+        owner='owner',
+        thumbnail='',
+        duration_seconds=1,
+    )
+
+
+class SoundCloudKnownTracksTest(unittest.TestCase):
+    def setUp(self):
+        self.lookups = []
+
+        def lookup(track_ids):
+            self.lookups.append(track_ids)
+            return {'2': soundcloud_track('2', 'Two (known)')}
+
+        with mock.patch.object(SoundCloudApi, 'get_client_id', return_value='client_id'):
+            self.api = SoundCloudApi(track_lookup=lookup)
+        self.api._playlist_data = mock.Mock(return_value=PLAYLIST_DATA)
+
+    def playlist(self):
+        fetched = [soundcloud_track('3', 'Three (fetched)')]
+        with mock.patch.object(soundcloud, 'fetch_tracks_parallel', return_value=fetched) as fetch, \
+                mock.patch.object(SoundCloudApi, 'get_client_id', return_value='client_id'):
+            playlist = self.api.playlist('/owner/sets/mix')
+        return playlist, fetch
+
+    def test_only_unknown_tracks_are_fetched(self):
+        playlist, fetch = self.playlist()
+
+        # the prerendered track is neither looked up nor fetched
+        self.assertEqual(self.lookups, [['2', '3', '4']])
+        fetch.assert_called_once()
+        self.assertEqual(fetch.call_args.args[0], ['3', '4'])
+
+        # in playlist order, without the track which could not be fetched
+        self.assertEqual(
+            [(track['track_id'], track['title']) for track in playlist['tracks']],
+            [('1', 'One'), ('2', 'Two (known)'), ('3', 'Three (fetched)')])
+
+    def test_every_track_is_fetched_without_lookup(self):
+        self.api.track_lookup = None
+        _, fetch = self.playlist()
+
+        self.assertEqual(fetch.call_args.args[0], ['2', '3', '4'])
+
+    def test_nothing_fetched_when_every_track_is_known(self):
+        self.api.track_lookup = lambda track_ids: {
+            track_id: soundcloud_track(track_id, 'known') for track_id in track_ids}
+        playlist, fetch = self.playlist()
+
+        fetch.assert_not_called()
+        self.assertEqual(len(playlist['tracks']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
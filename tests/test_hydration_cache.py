@@ -0,0 +1,95 @@
+'''
+A SoundCloud playlist page is downloaded once per `ttl_secs` (user-025)
+'''
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from support import load_server
+
+from backend.api import SoundCloudApi
+from backend.api import soundcloud
+
+PLAYLIST_DATA = {
+    'url': '/owner/sets/mix',
+    'title': 'Mix',
+    'artwork_url': 'https://example.com/artwork.jpg',
+    'last_modified': '2026-10-01T00:00:00Z',
+    'track_count': 2,
+    'description': '',
+    'user': {'username': 'owner'},
+    'tracks': [
+        {'id': 1, 'title': 'One', 'user': {'username': 'owner'}, 'duration': 60000},
+        {'id': 2, 'title': 'Two', 'user': {'username': 'owner'}, 'duration': 120000},
+    ],
+}
+
+
+def page_response(url: str, **kwargs) -> requests.Response:
+    hydration = [{'hydratable': 'playlist', 'data': PLAYLIST_DATA}]
+    res = requests.Response()
+    res.status_code = 200
+    res.url = url
+    res._content = f'<script>window.__sc_hydration = {json.dumps(hydration)};</script>\n'.encode()
+    return res
+
+
+class HydrationCacheTest(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(SoundCloudApi, 'get_client_id', return_value='client_id'):
+            self.api = SoundCloudApi()
+        self.api.transport.get = mock.Mock(side_effect=page_response)
+
+    def test_second_resolve_within_ttl_is_not_fetched(self):
+        self.assertEqual(self.api.resolve_playlist_id('owner/sets/mix'), '/owner/sets/mix')
+        self.assertEqual(self.api.resolve_playlist_id('owner/sets/mix'), '/owner/sets/mix')
+
+        self.assertEqual(self.api.transport.get.call_count, 1)
+        self.assertEqual(self.api.hydration_cache.cache_stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+    def test_resolve_info_and_playlist_share_one_download(self):
+        playlist_id = self.api.resolve_playlist_id('owner/sets/mix')
+        info = self.api.playlist_info(playlist_id)
+        playlist = self.api.playlist(playlist_id, info)
+
+        self.assertEqual(self.api.transport.get.call_count, 1)
+        self.assertEqual([track['track_id'] for track in playlist['tracks']], ['1', '2'])
+
+    def test_fetched_again_after_ttl(self):
+        now = 1000.0
+        with mock.patch.object(soundcloud.time, 'monotonic', side_effect=lambda: now):
+            self.api.resolve_playlist_id('owner/sets/mix')
+            now += self.api.hydration_cache.ttl_secs - 1
+            self.api.resolve_playlist_id('owner/sets/mix')
+            self.assertEqual(self.api.transport.get.call_count, 1)
+
+            now += 2
+            self.api.resolve_playlist_id('owner/sets/mix')
+            self.assertEqual(self.api.transport.get.call_count, 2)
+
+    def test_not_found_is_not_cached(self):
+        self.api.transport.get = mock.Mock(return_value=requests.Response())
+        self.api.transport.get.return_value.status_code = 404
+
+        self.assertIsNone(self.api.playlist_info('owner/sets/private'))
+        self.assertIsNone(self.api.playlist_info('owner/sets/private'))
+        self.assertEqual(self.api.transport.get.call_count, 2)
+
+
+class HydrationMetricsTest(unittest.TestCase):
+    def test_metrics(self):
+        server = load_server()
+        with mock.patch.object(SoundCloudApi, 'get_client_id', return_value='client_id'):
+            api = SoundCloudApi()
+        api.hydration_cache.stats['misses'] = 2
+
+        with mock.patch.object(server.cached_platform_apis['SOUNDCLOUD'], 'api', api):
+            metrics = server.app.test_client().get('/api/metrics').get_json()
+
+        self.assertEqual(metrics['hydration'], {'SOUNDCLOUD': {'hits': 0, 'misses': 2, 'entries': 0}})
+
+
+if __name__ == '__main__':
+    unittest.main()
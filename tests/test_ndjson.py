@@ -0,0 +1,115 @@
+'''
+Playlists can be streamed as newline delimited JSON as they are fetched (user-017)
+'''
+import json
+import unittest
+
+from support import StubApi, load_server, make_playlist, make_tracks
+
+from backend.api import IncompletePlaylistError
+from serialization import iter_playlist_json, iter_playlist_ndjson
+
+INFO = {'playlist_id': 'p', 'title': 'Playlist p'}
+
+
+def parse_ndjson(body: str):
+    assert body.endswith('\n')
+    return [json.loads(line) for line in body.splitlines()]
+
+
+class IterPlaylistNdjsonTest(unittest.TestCase):
+    def test_one_track_per_line(self):
+        tracks = make_tracks('t', 5)
+        chunks = list(iter_playlist_ndjson(INFO, [tracks[:2], [], tracks[2:]]))
+
+        # the info, then one chunk per non-empty page
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(parse_ndjson(''.join(chunks)), [INFO] + tracks)
+
+    def test_incomplete_playlist(self):
+        tracks = make_tracks('t', 2)
+
+        def pages():
+            yield tracks
+            raise IncompletePlaylistError('page 2 could not be fetched')
+
+        lines = parse_ndjson(''.join(iter_playlist_ndjson(INFO, pages())))
+        self.assertEqual(lines, [INFO] + tracks + [{'error': 'page 2 could not be fetched'}])
+
+    def test_matches_json(self):
+        tracks = make_tracks('t', 1001)
+        playlist = json.loads(''.join(iter_playlist_json(INFO, iter(tracks), batch_size=100)))
+        lines = parse_ndjson(''.join(iter_playlist_ndjson(INFO, [tracks])))
+
+        self.assertEqual(playlist, {**INFO, 'tracks': tracks})
+        self.assertEqual(lines, [INFO] + tracks)
+
+
+class PagedStubApi(StubApi):
+    '''A `StubApi` returning the tracks in pages of 3, failing at `fail_at_page` if set'''
+
+    def __init__(self, platform: str) -> None:
+        super().__init__(platform)
+        self.fail_at_page = None
+
+    def iter_track_pages(self, playlist_id, playlist_info=None):
+        tracks = self.playlists[playlist_id]['tracks']
+
+        def pages():
+            for i, start in enumerate(range(0, len(tracks), 3)):
+                if i == self.fail_at_page:
+                    raise IncompletePlaylistError(f'Error fetching page {i}')
+                yield tracks[start:start + 3]
+        return pages()
+
+
+class StreamEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = load_server()
+        cls.client = cls.server.app.test_client()
+        cls.api = cls.server.cached_platform_apis['SPOTIFY']
+        cls.stub = PagedStubApi('SPOTIFY')
+        cls.original_api, cls.api.api = cls.api.api, cls.stub
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.api.api = cls.original_api
+
+    def stream(self, playlist_id: str):
+        res = self.client.get(f'/api/playlist/spotify?id={playlist_id}&stream=1')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, 'application/x-ndjson')
+        return parse_ndjson(res.get_data(as_text=True))
+
+    def test_streams_and_caches(self):
+        playlist = make_playlist('ndjson', 10, platform='SPOTIFY')
+        self.stub.playlists['ndjson'] = playlist
+        info = {key: value for key, value in playlist.items() if key != 'tracks'}
+
+        lines = self.stream('ndjson')
+        self.assertEqual(lines, [info] + playlist['tracks'])
+        upstream = self.api.cache_stats()['upstream_playlist']
+
+        # streamed again from the cache
+        self.assertEqual(self.stream('ndjson'), lines)
+        self.assertEqual(self.api.cache_stats()['upstream_playlist'], upstream)
+        self.assertEqual(self.api.cached_info('ndjson').value['Length'], 10)
+
+    def test_incomplete_playlist_ends_with_error(self):
+        self.stub.playlists['ndjson-error'] = make_playlist('ndjson-error', 10, platform='SPOTIFY')
+        self.stub.fail_at_page = 2
+        try:
+            lines = self.stream('ndjson-error')
+        finally:
+            self.stub.fail_at_page = None
+
+        self.assertEqual(len(lines), 1 + 6 + 1)
+        self.assertEqual(lines[-1], {'error': 'Error fetching page 2'})
+        # a partially fetched playlist is not served as up to date
+        cached = self.api.cached_info('ndjson-error').value
+        self.assertTrue(cached is None or cached['Etag'] is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
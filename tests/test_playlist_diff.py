@@ -0,0 +1,146 @@
+'''
+Incremental replacement of a cached playlist's tracks (user-004)
+'''
+import os
+import sqlite3
+import unittest
+from contextlib import closing
+
+from support import make_colls, temp_db_path
+
+from backend.playlist_diff import diff_track_ids
+
+# (name, old track IDs, new track IDs, rows touched)
+CASES = [
+    ('append', ['a', 'b', 'c'], ['a', 'b', 'c', 'd', 'e'], 2),
+    ('prepend', ['a', 'b', 'c'], ['x', 'y', 'a', 'b', 'c'], 5),
+    ('middle insert', ['a', 'b', 'c', 'd'], ['a', 'b', 'x', 'c', 'd'], 3),
+    ('middle delete', ['a', 'b', 'x', 'c', 'd'], ['a', 'b', 'c', 'd'], 3),
+    ('middle edit', ['a', 'b', 'c', 'd'], ['a', 'x', 'c', 'd'], 2),
+    ('full replace', ['a', 'b', 'c'], ['x', 'y'], 5),
+    ('empty to non-empty', [], ['a', 'b'], 2),
+    ('non-empty to empty', ['a', 'b'], [], 2),
+    ('unchanged', ['a', 'b', 'c'], ['a', 'b', 'c'], 0),
+    ('duplicates', ['a', 'b', 'a', 'b'], ['a', 'b', 'a', 'a', 'b'], 2),
+    ('duplicate removed', ['a', 'a', 'a'], ['a', 'a'], 1),
+]
+
+
+def apply_diff(old_track_ids, diff):
+    '''The track IDs after the rows of `diff` are written over `old_track_ids`'''
+    return list(old_track_ids[:diff.start]) + diff.inserted_track_ids + list(old_track_ids[diff.old_end:])
+
+
+def track_record(track_id: str) -> dict:
+    return {
+        'TrackID': track_id,
+        'Platform': 'YOUTUBE',
+        'Title': f'Track {track_id}',
+        'Owner': 'owner',
+        'Thumbnail': 'thumbnail',
+        'DurationSeconds': 1,
+    }
+
+
+class DiffTrackIdsTest(unittest.TestCase):
+    def test_cases(self):
+        for name, old, new, rows_touched in CASES:
+            with self.subTest(name):
+                diff = diff_track_ids(old, new)
+                self.assertEqual(apply_diff(old, diff), new)
+                self.assertEqual(diff.rows_touched, rows_touched)
+                self.assertEqual(diff.is_empty(), old == new)
+
+    def test_prefix_and_suffix_do_not_overlap(self):
+        diff = diff_track_ids(['a', 'a'], ['a', 'a', 'a'])
+        self.assertEqual((diff.start, diff.old_end, diff.new_end), (2, 2, 3))
+        self.assertEqual(diff.suffix_length, 0)
+
+
+class ReplacePlaylistTest(unittest.TestCase):
+    def setUp(self):
+        self.db_path = temp_db_path()
+        self.colls = make_colls(self.db_path)
+
+    def tearDown(self):
+        self.colls['PlaylistTracks'].pool.close_all()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def replace(self, playlist_id: str, track_ids):
+        res = self.colls['PlaylistTracks'].replace_playlist(
+            {
+                'PlaylistID': playlist_id,
+                'Title': 'title',
+                'Owner': 'owner',
+                'Description': '',
+                'Thumbnail': '',
+                'Etag': 'etag',
+                'Platform': 'YOUTUBE',
+            },
+            [track_record(track_id) for track_id in track_ids],
+        )
+        self.assertTrue(res.ok, res)
+        return res.value
+
+    def assert_stored(self, playlist_id: str, track_ids):
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            rows = conn.execute(
+                'SELECT Position, TrackID FROM PlaylistTracks '
+                "WHERE PlaylistID = ? AND Platform = 'YOUTUBE' ORDER BY Position",
+                (playlist_id,),
+            ).fetchall()
+            (length,) = conn.execute(
+                "SELECT Length FROM Playlist WHERE PlaylistID = ? AND Platform = 'YOUTUBE'",
+                (playlist_id,),
+            ).fetchone()
+            (joined,) = conn.execute(
+                'SELECT COUNT(*) FROM PlaylistTracks JOIN Track USING (TrackID, Platform) '
+                "WHERE PlaylistID = ? AND Platform = 'YOUTUBE'",
+                (playlist_id,),
+            ).fetchone()
+
+        self.assertEqual([position for position, _ in rows], list(range(len(track_ids))))
+        self.assertEqual([track_id for _, track_id in rows], list(track_ids))
+        self.assertEqual(length, len(track_ids))
+        self.assertEqual(joined, length)
+
+    def test_cases(self):
+        for i, (name, old, new, rows_touched) in enumerate(CASES):
+            with self.subTest(name):
+                playlist_id = f'playlist-{i}'
+                self.replace(playlist_id, old)
+                self.assert_stored(playlist_id, old)
+
+                diff = self.replace(playlist_id, new)
+                self.assert_stored(playlist_id, new)
+                self.assertEqual(diff.rows_touched, rows_touched)
+
+    def test_sequence_of_replacements(self):
+        versions = [
+            [],
+            ['a', 'b', 'c'],
+            ['a', 'b', 'c', 'd'],
+            ['z', 'a', 'b', 'c', 'd'],
+            ['z', 'a', 'x', 'x', 'd'],
+            ['d', 'z', 'a', 'x', 'x'],
+            ['q'],
+            [],
+        ]
+        for track_ids in versions:
+            self.replace('sequence', track_ids)
+            self.assert_stored('sequence', track_ids)
+
+    def test_rewrites_non_contiguous_positions(self):
+        self.replace('gaps', ['a', 'b', 'c'])
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute("UPDATE PlaylistTracks SET Position = Position * 2 WHERE PlaylistID = 'gaps'")
+            conn.commit()
+
+        self.replace('gaps', ['a', 'b', 'c', 'd'])
+        self.assert_stored('gaps', ['a', 'b', 'c', 'd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
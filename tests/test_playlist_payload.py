@@ -0,0 +1,62 @@
+'''
+/api/playlist caches the serialized body of a playlist and serves it on the next request
+(user-012)
+'''
+import gzip
+import json
+import unittest
+
+from support import load_server, make_playlist, stub_api
+
+
+class PlaylistPayloadTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = load_server()
+        cls.api = cls.server.cached_platform_apis['YOUTUBE']
+
+    def setUp(self):
+        self.client = self.server.app.test_client()
+
+    def add_playlist(self, playlist_id: str, n: int):
+        playlist = make_playlist(playlist_id, n)
+        stub_api('YOUTUBE').playlists[playlist_id] = playlist
+        return playlist
+
+    def test_miss_is_compressed_once(self):
+        playlist = self.add_playlist('payload-miss', 50)
+
+        res = self.client.get('/api/playlist/youtube?id=payload-miss', headers={'Accept-Encoding': 'gzip'})
+
+        self.assertEqual(res.headers['Content-Encoding'], 'gzip')
+        body = res.get_data()
+        self.assertEqual(json.loads(gzip.decompress(body)), playlist)
+        # the streamed body is the cached payload
+        self.assertEqual(self.api.cached_payload('payload-miss', playlist['etag']), body)
+
+    def test_miss_without_gzip(self):
+        playlist = self.add_playlist('payload-identity', 50)
+
+        res = self.client.get('/api/playlist/youtube?id=payload-identity')
+
+        self.assertNotIn('Content-Encoding', res.headers)
+        self.assertEqual(json.loads(res.get_data()), playlist)
+        payload = self.api.cached_payload('payload-identity', playlist['etag'])
+        self.assertEqual(json.loads(gzip.decompress(payload)), playlist)
+
+    def test_hit_matches_miss(self):
+        self.add_playlist('payload-hit', 50)
+        url = '/api/playlist/youtube?id=payload-hit'
+        miss = self.client.get(url, headers={'Accept-Encoding': 'gzip'}).get_data()
+
+        hits = self.api.cache_stats()['payload_hits']
+        gzipped = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        identity = self.client.get(url)
+
+        self.assertEqual(self.api.cache_stats()['payload_hits'], hits + 2)
+        self.assertEqual(gzipped.get_data(), miss)
+        self.assertEqual(identity.get_data(), gzip.decompress(miss))
+
+
+if __name__ == '__main__':
+    unittest.main()
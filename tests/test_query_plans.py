@@ -0,0 +1,58 @@
+'''
+Checks that the hot PlaylistTracks queries use the indexes added by the migrations.
+
+Run with `python -m unittest discover tests`
+'''
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from backend.migrations import migrate
+from backend.storage import PlaylistTracksCollection
+
+
+class PlaylistTracksQueryPlanTest(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        migrate(self.db_path)
+
+    def tearDown(self) -> None:
+        os.remove(self.db_path)
+
+    def query_plan(self, sql: str, params: tuple) -> str:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+        return '\n'.join(row[-1] for row in rows)
+
+    def assert_uses_position_index(self, plan: str):
+        self.assertIn('COVERING INDEX PlaylistTracksByPosition', plan)
+        self.assertNotIn('USE TEMP B-TREE', plan)
+
+    def test_find(self):
+        plan = self.query_plan(
+            PlaylistTracksCollection.joined_select_sql + '''
+            WHERE PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ?
+            ORDER BY Position ASC;
+            ''',
+            ('playlist', 'YOUTUBE'),
+        )
+        self.assert_uses_position_index(plan)
+
+    def test_find_range(self):
+        plan = self.query_plan(
+            PlaylistTracksCollection.joined_select_sql + '''
+            WHERE
+                PlaylistTracks.PlaylistID = ? AND PlaylistTracks.Platform = ? AND
+                PlaylistTracks.Position > ?
+            ORDER BY Position ASC
+            LIMIT ?;
+            ''',
+            ('playlist', 'YOUTUBE', -1, 100),
+        )
+        self.assert_uses_position_index(plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+'''
+/api/random_track picks a uniformly random track of the cached playlist (user-008)
+'''
+import random
+import unittest
+from collections import Counter
+
+from support import load_server, make_playlist, make_tracks, stub_api
+
+DRAWS = 1500
+
+
+class RandomTrackTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = load_server().app.test_client()
+        # track-0 is in the playlist twice, so it should be drawn twice as often
+        tracks = make_tracks('track', 10)
+        tracks.insert(5, tracks[0])
+        stub_api('YOUTUBE').playlists['random'] = make_playlist('random', tracks)
+
+    def setUp(self):
+        random.seed(8)
+
+    def draw(self, exclude: str = '') -> Counter:
+        url = '/api/random_track?platform=youtube&id=random'
+        if exclude:
+            url += f'&exclude={exclude}'
+
+        track_ids = Counter()
+        for _ in range(DRAWS):
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200, res.get_json())
+            body = res.get_json()
+            self.assertEqual(body['length'], 11)
+            track_ids[body['track']['track_id']] += 1
+        return track_ids
+
+    def assert_shares(self, track_ids: Counter, weights: dict):
+        '''Asserts each track's share of the draws is within 25% of its share of the weights'''
+        self.assertEqual(set(track_ids), set(weights))
+        total_weight = sum(weights.values())
+        for track_id, weight in weights.items():
+            expected = DRAWS * weight / total_weight
+            self.assertAlmostEqual(track_ids[track_id], expected, delta=expected * 0.25, msg=track_id)
+
+    def test_share_follows_positions(self):
+        weights = {f'track-{i}': 1 for i in range(10)}
+        weights['track-0'] = 2
+        self.assert_shares(self.draw(), weights)
+
+    def test_excluded_never_drawn(self):
+        track_ids = self.draw('track-0,track-3&exclude=track-9,not-in-playlist')
+
+        # both positions of track-0 are excluded
+        weights = {f'track-{i}': 1 for i in (1, 2, 4, 5, 6, 7, 8)}
+        self.assert_shares(track_ids, weights)
+
+    def test_every_track_excluded(self):
+        exclude = ','.join(f'track-{i}' for i in range(10))
+        track_ids = self.draw(exclude)
+        self.assertEqual(len(track_ids), 10)
+
+    def test_not_found(self):
+        res = self.client.get('/api/random_track?platform=youtube&id=missing')
+        self.assertEqual(res.status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+'''
+Stale cached playlists are revalidated in the background (user-014)
+'''
+import os
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from support import StubApi, make_colls, make_playlist, temp_db_path
+
+from backend.cached_api import CachedPlatformApi, FreshnessPolicy, LruCache
+
+
+class BackgroundRevalidationTest(unittest.TestCase):
+    def setUp(self):
+        self.db_path = temp_db_path()
+        self.stub = StubApi()
+        self.stub.playlists['p'] = make_playlist('p', 5, etag='e1')
+        self.api = CachedPlatformApi(
+            self.stub, make_colls(self.db_path), LruCache(), FreshnessPolicy(ttl_secs=60, max_age_secs=3600))
+        # so the test can wait for the background revalidation
+        self.api._revalidator = ThreadPoolExecutor(max_workers=1)
+
+        self.api.playlist('p')
+        self.assertEqual(self.stub.calls, {'playlist_info': 1, 'playlist': 1})
+
+    def tearDown(self):
+        self.api.colls['Playlist'].pool.close_all()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def make_stale(self):
+        etag = self.api.cached_info('p').value['Etag']
+        res = self.api.colls['Playlist'].mark_validated(self.api._record('p'), etag, time.time() - 120)
+        self.assertTrue(res.value)
+
+    def wait_for_revalidation(self):
+        self.api._revalidator.shutdown(wait=True)
+        self.api._revalidator = ThreadPoolExecutor(max_workers=1)
+
+    def test_fresh(self):
+        info = self.api.playlist_info('p')
+
+        self.assertEqual(info['etag'], 'e1')
+        self.assertEqual(self.api.cache_stats()['fresh'], 1)
+        self.assertEqual(self.stub.calls, {'playlist_info': 1, 'playlist': 1})
+
+    def test_stale_unchanged_is_only_validated(self):
+        self.make_stale()
+        before = self.api.cache_stats()
+
+        info = self.api.playlist_info('p')
+        self.wait_for_revalidation()
+
+        # the stale info is served while revalidating
+        self.assertEqual(info['etag'], 'e1')
+        self.assertEqual(self.api.cache_stats()['stale'], 1)
+        # the playlist is not fetched, nor read from the cache, as its etag is unchanged
+        self.assertEqual(self.stub.calls, {'playlist_info': 2, 'playlist': 1})
+        after = self.api.cache_stats()
+        for stat in ('l1_hits', 'l1_misses', 'l2_misses'):
+            self.assertEqual(after[stat], before[stat], stat)
+
+        self.api.playlist_info('p')
+        self.assertEqual(self.api.cache_stats()['fresh'], 1)
+        self.assertEqual(self.stub.calls['playlist_info'], 2)
+
+    def test_stale_changed_is_refreshed(self):
+        self.make_stale()
+        self.stub.playlists['p'] = make_playlist('p', 7, etag='e2')
+
+        info = self.api.playlist_info('p')
+        self.wait_for_revalidation()
+
+        self.assertEqual(info['etag'], 'e1')
+        self.assertEqual(self.stub.calls, {'playlist_info': 2, 'playlist': 2})
+
+        info = self.api.playlist_info('p')
+        self.assertEqual(info['etag'], 'e2')
+        self.assertEqual(self.api.cache_stats()['fresh'], 1)
+
+        playlist = self.api.playlist('p', info)
+        self.assertEqual(len(playlist['tracks']), 7)
+        self.assertEqual(self.stub.calls['playlist'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
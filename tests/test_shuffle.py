@@ -0,0 +1,102 @@
+'''
+Server-side shuffle sessions (user-009)
+'''
+import unittest
+
+from support import load_server, make_playlist, stub_api
+
+from backend.shuffle import FeistelPermutation, ShuffleSession, ShuffleSessionStore
+
+PLAYLISTS = [('YOUTUBE', 'a', 7), ('SPOTIFY', 'b', 0), ('SOUNDCLOUD', 'c', 12)]
+
+
+class FeistelPermutationTest(unittest.TestCase):
+    def assert_bijection(self, length: int, seed: int):
+        permutation = FeistelPermutation(length, seed)
+        shuffled = [permutation[i] for i in range(length)]
+        self.assertEqual(sorted(shuffled), list(range(length)), f'length {length}, seed {seed}')
+
+    def test_small_lengths(self):
+        for length in range(0, 65):
+            for seed in (0, 1, -1, 2 ** 62):
+                self.assert_bijection(length, seed)
+
+    def test_odd_lengths(self):
+        for length in (3, 5, 17, 63, 65, 255, 257, 1001, 4097):
+            self.assert_bijection(length, 12345)
+
+    def test_out_of_range(self):
+        permutation = FeistelPermutation(5, 0)
+        with self.assertRaises(IndexError):
+            permutation[5]
+        with self.assertRaises(IndexError):
+            permutation[-1]
+
+    def test_seed_changes_order(self):
+        orders = {tuple(FeistelPermutation(100, seed)[i] for i in range(100)) for seed in range(5)}
+        self.assertEqual(len(orders), 5)
+
+
+class ShuffleSessionTest(unittest.TestCase):
+    def drain(self, session: ShuffleSession, n: int):
+        tracks = []
+        while not session.is_done():
+            tracks.extend(session.next(n))
+        return tracks
+
+    def test_stable_for_seed(self):
+        first = self.drain(ShuffleSession(PLAYLISTS, 42), 4)
+        # how the tracks are paged does not change the order
+        second = self.drain(ShuffleSession(PLAYLISTS, 42), 5)
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, self.drain(ShuffleSession(PLAYLISTS, 43), 4))
+
+    def test_every_track_once(self):
+        tracks = self.drain(ShuffleSession(PLAYLISTS, 7), 3)
+
+        expected = [(platform, playlist_id, position)
+                    for platform, playlist_id, length in PLAYLISTS for position in range(length)]
+        self.assertEqual(sorted(tracks), sorted(expected))
+        self.assertEqual(ShuffleSession(PLAYLISTS, 7, offset=19).next(10), [])
+
+    def test_store_resumes_session(self):
+        store = ShuffleSessionStore(max_sessions=2)
+        session_id, session = store.create(PLAYLISTS, seed=1)
+        first = session.next(5)
+
+        self.assertIs(store.get(session_id), session)
+        self.assertEqual(first + self.drain(store.get(session_id), 5), self.drain(ShuffleSession(PLAYLISTS, 1), 5))
+
+        store.create(PLAYLISTS)
+        store.create(PLAYLISTS)
+        self.assertIsNone(store.get(session_id))
+
+
+class ShuffleApiTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = load_server().app.test_client()
+        stub_api('YOUTUBE').playlists['shuffle'] = make_playlist('shuffle', 20)
+
+    def test_invalid_playlist_id(self):
+        for playlist in ({'platform': 'youtube', 'id': 123}, {'platform': 'youtube'}, 'shuffle'):
+            res = self.client.post('/api/shuffle', json={'playlists': [playlist]})
+            self.assertEqual(res.status_code, 400, playlist)
+
+    def test_session_is_stable_for_seed(self):
+        body = {'playlists': [{'platform': 'youtube', 'id': 'shuffle'}], 'seed': 99}
+        orders = []
+        for _ in range(2):
+            res = self.client.post('/api/shuffle', json=body)
+            self.assertEqual(res.status_code, 200, res.get_json())
+            session_id = res.get_json()['session_id']
+            tracks = self.client.get(f'/api/shuffle/{session_id}?n=500').get_json()['tracks']
+            orders.append([track['position'] for track in tracks])
+
+        self.assertEqual(orders[0], orders[1])
+        self.assertEqual(sorted(orders[0]), list(range(20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
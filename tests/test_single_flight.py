@@ -0,0 +1,116 @@
+'''
+Concurrent identical upstream calls are coalesced into one (user-013)
+'''
+import os
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from support import StubApi, make_colls, make_playlist, temp_db_path
+
+from backend.cached_api import CachedPlatformApi, LruCache
+from backend.single_flight import SingleFlight
+
+CALLERS = 8
+
+
+class SlowStubApi(StubApi):
+    '''A `StubApi` whose `playlist` blocks until `release` is set'''
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def playlist(self, playlist_id, playlist_info=None):
+        self.started.set()
+        self.release.wait(5)
+        return super().playlist(playlist_id, playlist_info)
+
+
+def call_concurrently(fn, started: threading.Event, release: threading.Event, followers_waiting):
+    '''
+    Calls `fn` once, then `CALLERS - 1` more times while the first call is blocked. Releases the
+    first call once `followers_waiting()` is `True`
+    '''
+    with ThreadPoolExecutor(max_workers=CALLERS) as executor:
+        leader = executor.submit(fn)
+        started.wait(5)
+        followers = [executor.submit(fn) for _ in range(CALLERS - 1)]
+        while not followers_waiting():
+            threading.Event().wait(0.001)
+        release.set()
+        return [leader.result()] + [follower.result() for follower in followers]
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.flight = SingleFlight()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow_call(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return 'result'
+
+    def followers_waiting(self):
+        return self.flight.flight_stats()['shared'] == CALLERS - 1
+
+    def test_coalesces_concurrent_calls(self):
+        results = call_concurrently(
+            lambda: self.flight.do('key', self.slow_call), self.started, self.release, self.followers_waiting)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [('result', False)] + [('result', True)] * (CALLERS - 1))
+        self.assertEqual(self.flight.flight_stats(), {'calls': 1, 'shared': CALLERS - 1})
+        self.assertEqual(self.flight.in_flight(), 0)
+
+    def test_later_calls_are_not_shared(self):
+        self.release.set()
+        self.flight.do('key', self.slow_call)
+        self.flight.do('key', self.slow_call)
+        self.flight.do('other', self.slow_call)
+        self.assertEqual(self.calls, 3)
+
+    def test_error_is_raised_to_every_caller(self):
+        def failing_call():
+            self.slow_call()
+            raise ValueError('upstream error')
+
+        def call():
+            try:
+                self.flight.do('key', failing_call)
+            except ValueError as err:
+                return str(err)
+
+        results = call_concurrently(call, self.started, self.release, self.followers_waiting)
+        self.assertEqual(results, ['upstream error'] * CALLERS)
+        self.assertEqual(self.calls, 1)
+
+
+class CachedPlaylistFlightTest(unittest.TestCase):
+    def test_concurrent_misses_fetch_once(self):
+        db_path = temp_db_path()
+        self.addCleanup(os.remove, db_path)
+        stub = SlowStubApi()
+        stub.playlists['p'] = make_playlist('p', 5)
+        colls = make_colls(db_path)
+        self.addCleanup(colls['Playlist'].pool.close_all)
+        api = CachedPlatformApi(stub, colls, LruCache())
+        info = stub.playlist_info('p')
+
+        playlists = call_concurrently(
+            lambda: api.playlist('p', info), stub.started, stub.release,
+            lambda: api._flight.flight_stats()['shared'] == CALLERS - 1)
+
+        self.assertEqual(stub.calls['playlist'], 1)
+        self.assertEqual(api.cache_stats()['upstream_playlist'], 1)
+        self.assertEqual(api.cache_stats()['shared_playlist'], CALLERS - 1)
+        self.assertTrue(all(playlist is playlists[0] for playlist in playlists))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+'''
+Spotify playlist items without a playable track are skipped (user-021)
+'''
+import json
+import os
+import sqlite3
+import unittest
+from contextlib import closing
+from unittest import mock
+
+import requests
+
+from support import make_colls, temp_db_path
+
+from backend.api import PlaylistInfo, SpotifyApi
+from backend.cached_api import track_record_from
+
+
+def spotify_track(track_id):
+    return {
+        'id': track_id,
+        'name': f'Track {track_id}',
+        'duration_ms': 180000,
+        'artists': [{'name': 'artist'}],
+        'album': {'images': [{'url': 'https://example.com/cover.jpg'}]},
+    }
+
+
+def json_response(url: str, body: dict) -> requests.Response:
+    res = requests.Response()
+    res.status_code = 200
+    res.url = url
+    res._content = json.dumps(body).encode()
+    return res
+
+
+class SpotifyTracksTest(unittest.TestCase):
+    def setUp(self):
+        self.api = SpotifyApi('client_id', 'client_secret')
+        self.api.credentials.get_token = mock.Mock(return_value='token')
+        self.items = [
+            {'track': spotify_track('a')},
+            # unavailable track
+            {'track': None},
+            # local file
+            {'track': {**spotify_track(None), 'name': 'local.mp3'}},
+            {},
+            {'track': spotify_track('b')},
+        ]
+        self.api.transport.get = mock.Mock(
+            side_effect=lambda url, **kwargs: json_response(
+                url, {'total': len(self.items), 'items': self.items}))
+        self.info = PlaylistInfo(
+            platform='SPOTIFY',
+            playlist_id='abc',
+            title='title',
+            owner='owner',
+            description='',
+            thumbnail='',
+            etag='snapshot',
+            length=len(self.items),
+        )
+
+    def test_skips_items_without_a_track(self):
+        playlist = self.api.playlist('abc', self.info)
+
+        self.assertEqual([track['track_id'] for track in playlist['tracks']], ['a', 'b'])
+        self.assertEqual(self.api.transport.get.call_count, 1)
+
+    def test_skipped_items_are_not_stored(self):
+        playlist = self.api.playlist('abc', self.info)
+        db_path = temp_db_path()
+        self.addCleanup(os.remove, db_path)
+        colls = make_colls(db_path)
+
+        res = colls['PlaylistTracks'].replace_playlist(
+            {
+                'PlaylistID': 'abc',
+                'Title': playlist['title'],
+                'Owner': playlist['owner'],
+                'Description': playlist['description'],
+                'Thumbnail': playlist['thumbnail'],
+                'Etag': playlist['etag'],
+                'Platform': 'SPOTIFY',
+            },
+            [track_record_from(track, 'SPOTIFY') for track in playlist['tracks']],
+        )
+        self.assertTrue(res.ok, res)
+
+        with closing(sqlite3.connect(db_path)) as conn:
+            (length,) = conn.execute(
+                "SELECT Length FROM Playlist WHERE PlaylistID = 'abc' AND Platform = 'SPOTIFY'"
+            ).fetchone()
+            (joined,) = conn.execute(
+                'SELECT COUNT(*) FROM PlaylistTracks JOIN Track USING (TrackID, Platform) '
+                "WHERE PlaylistID = 'abc' AND Platform = 'SPOTIFY'"
+            ).fetchone()
+        self.assertEqual(length, 2)
+        self.assertEqual(joined, length)
+
+
+if __name__ == '__main__':
+    unittest.main()
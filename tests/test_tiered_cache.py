@@ -0,0 +1,112 @@
+'''
+Playlists are served from the L1 (memory) or L2 (SQLite) cache while their etag is unchanged
+(user-011)
+'''
+import os
+import unittest
+
+from support import StubApi, make_colls, make_playlist, temp_db_path
+
+from backend.cached_api import CachedPlatformApi, LruCache
+
+
+class LruCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LruCache(max_bytes=30, max_entry_bytes=30)
+        cache.put('a', 1, 10)
+        cache.put('b', 2, 10)
+        cache.put('c', 3, 10)
+        # a is now the most recently used
+        self.assertEqual(cache.get('a'), 1)
+
+        cache.put('d', 4, 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([cache.get(key) for key in 'acd'], [1, 3, 4])
+        self.assertEqual((cache.nbytes, cache.evictions, len(cache)), (30, 1, 3))
+
+    def test_replace_and_discard(self):
+        cache = LruCache(max_bytes=100)
+        cache.put('a', 1, 10)
+        cache.put('a', 2, 20)
+        self.assertEqual((cache.get('a'), cache.nbytes), (2, 20))
+
+        cache.discard('a')
+        cache.discard('missing')
+        self.assertEqual((cache.get('a'), cache.nbytes, len(cache)), (None, 0, 0))
+
+    def test_rejects_large_entries(self):
+        cache = LruCache(max_bytes=100, max_entry_bytes=10)
+        cache.put('a', 1, 5)
+
+        self.assertFalse(cache.put('a', 2, 11))
+        # the old value is not kept for the key either
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.nbytes, 0)
+
+
+class TieredCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.db_path = temp_db_path()
+        self.stub = StubApi()
+        self.stub.playlists['p'] = make_playlist('p', 5, etag='e1')
+        self.colls = make_colls(self.db_path)
+        self.l1 = LruCache()
+        self.api = CachedPlatformApi(self.stub, self.colls, self.l1)
+
+    def tearDown(self):
+        self.colls['Playlist'].pool.close_all()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def playlist(self):
+        playlist = self.api.playlist('p', self.stub.playlist_info('p'))
+        return playlist, [track['track_id'] for track in playlist['tracks']]
+
+    def test_l1_then_l2_then_upstream(self):
+        _, track_ids = self.playlist()
+        self.assertEqual(self.stub.calls['playlist'], 1)
+
+        # L1
+        self.assertEqual(self.playlist()[1], track_ids)
+        self.assertEqual(self.api.cache_stats()['l1_hits'], 1)
+
+        # L2, shared with another process (an empty L1)
+        other = CachedPlatformApi(self.stub, self.colls, LruCache())
+        playlist = other.playlist('p', self.stub.playlist_info('p'))
+        self.assertEqual([track['track_id'] for track in playlist['tracks']], track_ids)
+        self.assertEqual(other.cache_stats()['l2_hits'], 1)
+        self.assertEqual(self.stub.calls['playlist'], 1)
+
+        # a changed etag misses both tiers
+        before = self.api.cache_stats()
+        self.stub.playlists['p'] = make_playlist('p', 3, etag='e2')
+        _, track_ids = self.playlist()
+        self.assertEqual(len(track_ids), 3)
+        self.assertEqual(self.stub.calls['playlist'], 2)
+        after = self.api.cache_stats()
+        self.assertEqual(after['l1_misses'], before['l1_misses'] + 1)
+        self.assertEqual(after['l2_misses'], before['l2_misses'] + 1)
+
+    def test_large_playlists_are_streamed_from_l2(self):
+        self.stub.playlists['p'] = make_playlist('p', 50, etag='e1')
+        self.playlist()
+
+        small_l1 = LruCache(max_bytes=4000, max_entry_bytes=1000)
+        other = CachedPlatformApi(self.stub, self.colls, small_l1)
+        playlist = other.playlist('p', self.stub.playlist_info('p'))
+
+        self.assertNotIsInstance(playlist['tracks'], list)
+        self.assertEqual(len(list(playlist['tracks'])), 50)
+        self.assertEqual(len(small_l1), 0)
+
+    def test_evict(self):
+        self.playlist()
+        self.api.evict('p')
+
+        self.assertIsNone(self.api.cached_info('p').value)
+        self.assertIsNone(self.l1.get(('YOUTUBE', 'p')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+'''
+The column-oriented TrackTable round-trips Tracks (user-010)
+'''
+import json
+import unittest
+
+from support import make_tracks
+
+from backend.api import Track, TrackTable, tracks_nbytes
+
+
+class TrackTableTest(unittest.TestCase):
+    def setUp(self):
+        self.tracks = make_tracks('t', 5)
+        # a deleted video has no owner and no duration
+        self.tracks.append(Track(
+            track_id='deleted', platform='YOUTUBE', title='Deleted video', owner='',
+            thumbnail='', duration_seconds=None))
+        self.table = TrackTable('YOUTUBE', self.tracks)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.table), len(self.tracks))
+        self.assertEqual(list(self.table), self.tracks)
+        self.assertEqual(self.table.to_list(), self.tracks)
+        self.assertEqual(self.table.track_ids, [track['track_id'] for track in self.tracks])
+        self.assertIsNone(self.table[-1]['duration_seconds'])
+        self.assertEqual(self.table[0]['duration_seconds'], 0)
+        self.assertEqual(json.loads(json.dumps(self.table.to_list())), self.tracks)
+
+    def test_indexing(self):
+        self.assertEqual(self.table[2], self.tracks[2])
+        self.assertEqual(self.table[-2], self.tracks[-2])
+        with self.assertRaises(IndexError):
+            self.table[len(self.tracks)]
+        with self.assertRaises(IndexError):
+            self.table[-len(self.tracks) - 1]
+
+    def test_slices(self):
+        for i in (slice(1, 4), slice(None, None, 2), slice(-3, None), slice(4, 1)):
+            sliced = self.table[i]
+            self.assertIsInstance(sliced, TrackTable)
+            self.assertEqual(list(sliced), self.tracks[i])
+
+    def test_extend(self):
+        table = TrackTable('YOUTUBE', self.table[:2])
+        table.extend(self.table[2:])
+        table.extend(iter(self.tracks[:1]))
+        self.assertEqual(list(table), self.tracks + self.tracks[:1])
+
+    def test_strings_are_shared(self):
+        tracks = [
+            Track(track_id=str(i), platform='SPOTIFY', title=f'Track {i}',
+                  owner=''.join(['art', 'ist']), thumbnail=''.join(['cov', 'er']), duration_seconds=i)
+            for i in range(100)
+        ]
+        table = TrackTable('SPOTIFY', tracks)
+
+        self.assertIs(table[0]['owner'], table[99]['owner'])
+        self.assertIs(table[0]['thumbnail'], table[99]['thumbnail'])
+        self.assertLess(table.nbytes(), tracks_nbytes(tracks))
+        self.assertEqual(tracks_nbytes(table), table.nbytes())
+
+
+if __name__ == '__main__':
+    unittest.main()